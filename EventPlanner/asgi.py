@@ -2,6 +2,9 @@
 ASGI config for EventPlanner project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, e.g. ``uvicorn EventPlanner.asgi:application``;
+the JSON endpoints (publish, complete, delete task, register) are async views
+and run on the event loop without holding a worker thread.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
@@ -0,0 +1,33 @@
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+# Cache settings read from the environment.
+#
+#   CACHE_BACKEND     locmem (default), redis, memcached or database
+#   CACHE_LOCATION    Redis URL, comma separated memcached servers, or the cache table
+#                     of the database backend (created by manage.py createcachetable)
+#
+# The public feed version, the events admin flags and the task form's person
+# choices are invalidated by replacing or deleting cache keys. The locmem cache
+# belongs to one process: with several worker processes, a change only reaches the
+# process that made it and the others serve the old value until it times out. Run
+# more than one worker only with a cache they share.
+
+BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+    'database': ('django.core.cache.backends.db.DatabaseCache', 'events_cache'),
+}
+
+
+def cache_config(environ=os.environ):
+    name = environ.get('CACHE_BACKEND', 'locmem')
+    if name not in BACKENDS:
+        raise ImproperlyConfigured('CACHE_BACKEND must be one of %s, not %r' % (', '.join(BACKENDS), name))
+    backend, location = BACKENDS[name]
+    location = environ.get('CACHE_LOCATION', location)
+    if name == 'memcached':
+        location = [server.strip() for server in location.split(',') if server.strip()]
+    return {'BACKEND': backend, 'LOCATION': location}
@@ -0,0 +1,92 @@
+import os
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Database settings read from the environment.
+#
+#   DATABASE_ENGINE          sqlite (default) or postgresql
+#   DATABASE_NAME            SQLite file or PostgreSQL database name
+#   DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST, DATABASE_PORT
+#   DATABASE_CONN_MAX_AGE    seconds a PostgreSQL connection is kept open between requests
+#   DATABASE_POOL_MAX_SIZE   use a psycopg connection pool of this size (Django 5.1+)
+#   DATABASE_REPLICAS        comma separated read replicas: SQLite files, or PostgreSQL
+#                            hosts that share the primary's other settings
+#   SQLITE_BUSY_TIMEOUT      milliseconds a SQLite writer waits for the lock
+#   SQLITE_MMAP_SIZE         bytes of the SQLite file read through mmap
+
+CONN_MAX_AGE = 60
+SQLITE_BUSY_TIMEOUT = 5000
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+
+def env_int(environ, name, default):
+    try:
+        return int(environ.get(name, default))
+    except ValueError:
+        raise ImproperlyConfigured('%s must be a whole number' % name)
+
+
+def sqlite_pragmas(environ):
+    return {
+        # readers no longer block the writer and the writer no longer blocks readers
+        'journal_mode': 'WAL',
+        # in WAL mode a commit is durable once the WAL is synced at checkpoints
+        'synchronous': 'NORMAL',
+        'busy_timeout': env_int(environ, 'SQLITE_BUSY_TIMEOUT', SQLITE_BUSY_TIMEOUT),
+        'mmap_size': env_int(environ, 'SQLITE_MMAP_SIZE', SQLITE_MMAP_SIZE),
+    }
+
+
+def database_config(base_dir, environ=os.environ):
+    engine = environ.get('DATABASE_ENGINE', 'sqlite')
+    if engine == 'sqlite':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': environ.get('DATABASE_NAME', base_dir / 'db.sqlite3'),
+            # applied to every new connection by configure_sqlite
+            'PRAGMAS': sqlite_pragmas(environ),
+        }
+    if engine == 'postgresql':
+        config = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': environ.get('DATABASE_NAME', 'eventplanner'),
+            'USER': environ.get('DATABASE_USER', ''),
+            'PASSWORD': environ.get('DATABASE_PASSWORD', ''),
+            'HOST': environ.get('DATABASE_HOST', ''),
+            'PORT': environ.get('DATABASE_PORT', ''),
+            # reuse a connection across requests, checked before each request reuses it
+            'CONN_MAX_AGE': env_int(environ, 'DATABASE_CONN_MAX_AGE', CONN_MAX_AGE),
+            'CONN_HEALTH_CHECKS': True,
+        }
+        pool_size = env_int(environ, 'DATABASE_POOL_MAX_SIZE', 0)
+        if pool_size:
+            if django.VERSION < (5, 1):
+                raise ImproperlyConfigured('DATABASE_POOL_MAX_SIZE needs Django 5.1 or later')
+            # the pool keeps the connections, Django must close its own after each request
+            config['CONN_MAX_AGE'] = 0
+            config['OPTIONS'] = {'pool': {'min_size': min(2, pool_size), 'max_size': pool_size}}
+        return config
+    raise ImproperlyConfigured('DATABASE_ENGINE must be sqlite or postgresql, not %r' % engine)
+
+
+def replica_configs(primary, environ=os.environ):
+    # replica1, replica2, ... in the order given, see EventPlanner.routers
+    replicas = {}
+    names = [name.strip() for name in environ.get('DATABASE_REPLICAS', '').split(',') if name.strip()]
+    for number, name in enumerate(names, 1):
+        key = 'NAME' if primary['ENGINE'] == 'django.db.backends.sqlite3' else 'HOST'
+        # tests read the primary's test database through the replica connections
+        replicas['replica%d' % number] = {**primary, key: name, 'TEST': {'MIRROR': 'default'}}
+    return replicas
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in connection.settings_dict.get('PRAGMAS', {}).items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
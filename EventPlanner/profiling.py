@@ -0,0 +1,262 @@
+import bisect
+import heapq
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib import admin
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.shortcuts import redirect
+from django.template.backends.django import DjangoTemplates, Template
+from django.template.response import TemplateResponse
+
+# Per-view query counts and timings for a sample of requests.
+#
+# ProfilingMiddleware profiles PROFILING_SAMPLE_RATE of requests: the number of
+# SQL statements and the time spent in them (on every database, from sync and
+# async code alike), the time spent rendering templates and the total time. A
+# profiled response carries them in a Server-Timing header, which browser dev
+# tools show next to the request, and they are added to per-view histograms
+# shown on the admin metrics page (/admin/metrics/) with the slowest statements
+# seen. Requests that are not sampled only pay for one random() call, and each
+# of their queries for one context variable lookup.
+#
+# Times stop when the view's response is returned; the body of a streaming
+# response is not included. The metrics are kept in memory per process, a
+# deployment with several processes shows those of the process that serves the
+# metrics page.
+
+SLOWEST_STATEMENTS = 5
+STATEMENT_LENGTH = 500
+# histogram bucket upper bounds, milliseconds grow by a quarter each bucket
+MS_BOUNDS = [round(0.1 * 1.25 ** i, 3) for i in range(60)]
+COUNT_BOUNDS = list(range(11)) + [12, 15, 20, 25, 30, 40, 50, 75, 100, 150, 200, 300, 500, 1000]
+PERCENTILES = (50, 90, 95, 99)
+
+_profile = ContextVar('request_profile', default=None)
+_lock = threading.Lock()
+_views = {}
+
+
+class Profile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.render_seconds = 0.0
+        self.rendering = 0
+        # (seconds, sql) of the SLOWEST_STATEMENTS slowest statements, a min-heap so a
+        # request with many statements keeps only these
+        self.statements = []
+
+    def query(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        if len(self.statements) < SLOWEST_STATEMENTS:
+            heapq.heappush(self.statements, (seconds, sql[:STATEMENT_LENGTH]))
+        elif seconds > self.statements[0][0]:
+            heapq.heapreplace(self.statements, (seconds, sql[:STATEMENT_LENGTH]))
+
+    def server_timing(self, total_seconds):
+        return 'db;dur=%.1f;desc="%d queries", render;dur=%.1f, total;dur=%.1f' % (
+            self.sql_seconds * 1000, self.queries, self.render_seconds * 1000, total_seconds * 1000)
+
+
+class Histogram:
+    # counts of values per bucket, the percentiles are bucket upper bounds
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        wanted = self.total * p / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted and count:
+                # the last bucket has no upper bound
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return 0
+
+    def bars(self):
+        # (upper bound, share of the largest bucket) from the first to the last bucket used
+        used = [index for index, count in enumerate(self.counts) if count]
+        if not used:
+            return []
+        top = max(self.counts)
+        return [(self.bounds[index] if index < len(self.bounds) else self.max, self.counts[index] / top)
+            for index in range(used[0], used[-1] + 1)]
+
+
+class ViewMetrics:
+    def __init__(self, name):
+        self.name = name
+        self.total_ms = Histogram(MS_BOUNDS)
+        self.sql_ms = Histogram(MS_BOUNDS)
+        self.render_ms = Histogram(MS_BOUNDS)
+        self.queries = Histogram(COUNT_BOUNDS)
+        # (milliseconds, sql), slowest first
+        self.slowest = []
+
+    def add(self, profile, total_seconds):
+        self.total_ms.add(total_seconds * 1000)
+        self.sql_ms.add(profile.sql_seconds * 1000)
+        self.render_ms.add(profile.render_seconds * 1000)
+        self.queries.add(profile.queries)
+        statements = self.slowest + [(seconds * 1000, sql) for seconds, sql in profile.statements]
+        self.slowest = sorted(statements, reverse=True)[:SLOWEST_STATEMENTS]
+
+
+def record(name, profile, total_seconds):
+    with _lock:
+        metrics = _views.get(name)
+        if metrics is None:
+            metrics = _views[name] = ViewMetrics(name)
+        metrics.add(profile, total_seconds)
+
+
+def metrics():
+    # a snapshot, busiest view first
+    with _lock:
+        return sorted(_views.values(), key=lambda view: -view.total_ms.total)
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+#----------- SQL -----------#
+
+def record_query(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.query(sql, time.perf_counter() - start)
+
+
+def install(connection, **kwargs):
+    # connections belong to a thread, each gets the wrapper when it connects
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install)
+
+
+#----------- TEMPLATES -----------#
+
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        profile = _profile.get()
+        if profile is None:
+            return super().render(context, request)
+        # templates rendered inside another one (render_to_string in a tag) count once
+        profile.rendering += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.rendering -= 1
+            if not profile.rendering:
+                profile.render_seconds += time.perf_counter() - start
+
+
+# The Django template backend, with rendering timed for profiled requests
+class ProfilingTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return ProfiledTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return ProfiledTemplate(super().get_template(template_name).template, self)
+
+
+#----------- MIDDLEWARE -----------#
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # connections opened before the first request
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        profile = Profile()
+        token = _profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _profile.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        profile = Profile()
+        token = _profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _profile.reset(token)
+        return self.finish(request, response, profile)
+
+    def sampled(self):
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def finish(self, request, response, profile):
+        total = time.perf_counter() - profile.started
+        match = request.resolver_match
+        record(match.view_name if match else 'unresolved', profile, total)
+        response['Server-Timing'] = profile.server_timing(total)
+        return response
+
+
+#----------- METRICS PAGE -----------#
+
+def metrics_view(request):
+    if request.method == 'POST':
+        reset()
+        return redirect('profiling_metrics')
+    views = [{
+        'name': view.name,
+        'samples': view.total_ms.total,
+        'total': [view.total_ms.percentile(p) for p in PERCENTILES] + [view.total_ms.max],
+        'sql': [view.sql_ms.percentile(p) for p in PERCENTILES] + [view.sql_ms.max],
+        'render': [view.render_ms.percentile(p) for p in PERCENTILES] + [view.render_ms.max],
+        'queries': [view.queries.percentile(p) for p in PERCENTILES] + [view.queries.max],
+        'histogram': view.total_ms.bars(),
+        'slowest': view.slowest,
+    } for view in metrics()]
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Request metrics',
+        'views': views,
+        'percentiles': PERCENTILES,
+        'sample_rate': settings.PROFILING_SAMPLE_RATE,
+    }
+    return TemplateResponse(request, 'admin/metrics.html', context)
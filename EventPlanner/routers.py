@@ -0,0 +1,81 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Reads go to one of the REPLICA_DATABASES, writes to the primary ('default').
+#
+# Once something has been written, the rest of the request (or script) reads from
+# the primary too, so a view never reads a replica that has not caught up with its
+# own write. ReplicaPinMiddleware carries that over to the user's next requests
+# with a cookie that lasts REPLICA_PIN_SECONDS, longer than the replicas lag.
+
+PIN_COOKIE = 'pin_primary'
+
+_pinned = ContextVar('pinned_to_primary', default=False)
+_written = ContextVar('written_to_primary', default=False)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if not replicas or _pinned.get():
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _pinned.set(True)
+        _written.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # replicas get their schema from the primary
+        return db not in settings.REPLICA_DATABASES
+
+
+class ReplicaPinMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        pinned, written = self.start(request)
+        try:
+            return self.finish(self.get_response(request))
+        finally:
+            _pinned.reset(pinned)
+            _written.reset(written)
+
+    async def __acall__(self, request):
+        pinned, written = self.start(request)
+        try:
+            return self.finish(await self.get_response(request))
+        finally:
+            _pinned.reset(pinned)
+            _written.reset(written)
+
+    def start(self, request):
+        # requests that change data read their own writes, and so does the
+        # next while after a write
+        pinned = _pinned.set(request.method not in ('GET', 'HEAD', 'OPTIONS') or PIN_COOKIE in request.COOKIES)
+        return pinned, _written.set(False)
+
+    def finish(self, response):
+        if _written.get():
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
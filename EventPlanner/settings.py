@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 
+from .caches import cache_config
+from .db import database_config, replica_configs
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,6 +49,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'EventPlanner.profiling.ProfilingMiddleware',
+    'EventPlanner.routers.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -58,7 +63,8 @@ ROOT_URLCONF = 'EventPlanner.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # the Django backend, timing rendering for EventPlanner.profiling
+        'BACKEND': 'EventPlanner.profiling.ProfilingTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -79,10 +85,23 @@ WSGI_APPLICATION = 'EventPlanner.wsgi.application'
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
+}
+DATABASES.update(replica_configs(DATABASES['default']))
+
+# reads go to the replicas, writes and the reads that follow them to the primary
+DATABASE_ROUTERS = ['EventPlanner.routers.PrimaryReplicaRouter']
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+# the default locmem cache is per process, see EventPlanner.caches before running
+# several workers
+CACHES = {
+    'default': cache_config(),
 }
 
 
@@ -142,6 +161,18 @@ STATICFILE_DIRS = [
  BASE_DIR / "events/static"
 ]
 
+# Seconds an event's rendered task list is cached for, keyed on the event version.
+# 0 renders it on every request.
+EVENT_TASKS_CACHE_TIMEOUT = 60 * 10
+
+# Send new contact messages from a background thread in this process. Set to False
+# when the send_outbox command runs as a separate worker.
+CONTACT_OUTBOX_THREAD = True
+
+# Share of requests profiled by EventPlanner.profiling: query count, SQL and template
+# time in a Server-Timing header and on the admin metrics page. 0 turns it off.
+PROFILING_SAMPLE_RATE = 0.01
+
 LOGIN_REDIRECT_URL = "/events/" 
 LOGOUT_REDIRECT_URL = "/"
 
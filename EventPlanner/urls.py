@@ -15,13 +15,16 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import include, path
+from EventPlanner.profiling import metrics_view
 
 urlpatterns = [
     path('', include('home.urls')),
     path('contact/', include('contact.urls')),
     path('events/', include('events.urls')),
+    path('api/v1/', include('events.api_urls')),
     path('accounts/', include('django.contrib.auth.urls')),
     # path('tasks/', include('tasks.urls')),
     # path('agenda/', include('agenda.urls')),
+    path('admin/metrics/', admin.site.admin_view(metrics_view), name='profiling_metrics'),
     path('admin/', admin.site.urls),
 ]
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import OutboxMessage
 
 # Register your models here.
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'from_email', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status',)
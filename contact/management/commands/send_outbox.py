@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from contact.outbox import BATCH_SIZE, deliver, outbox_status
+
+
+# Emails the saved contact messages, once or, with --loop, every --interval seconds.
+#   python manage.py send_outbox --loop --interval 10
+class Command(BaseCommand):
+    help = 'Send the contact messages waiting in the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true')
+        parser.add_argument('--interval', type=float, default=10)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            metrics = deliver(options['batch_size'])
+            status = outbox_status()
+            self.stdout.write('sent %d, retry %d, failed %d in %.3fs; %d pending, %d failed in total' % (
+                metrics['sent'], metrics['retried'], metrics['failed'], metrics['seconds'],
+                status['pending'], status['failed']))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
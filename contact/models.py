@@ -1,3 +1,32 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
+
+# A contact message waiting to be emailed, contact.outbox delivers it
+class OutboxMessage(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    subject = models.TextField()
+    body = models.TextField()
+    from_email = models.EmailField()
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=8, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # pending messages are sent once this has passed, later after each failed attempt
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.subject
+
+    class Meta:
+        indexes = [
+            # the worker reads the pending messages that are due
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
@@ -0,0 +1,157 @@
+import logging
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+# Contact messages are saved by the view and emailed later by deliver(), run by the
+# send_outbox command or, with CONTACT_OUTBOX_THREAD, a background thread after
+# each new message. Batches are sent over one mail connection; a failed message is
+# retried with exponential backoff and given up after MAX_ATTEMPTS, and so are the
+# messages that could not be sent because the connection failed or was lost.
+
+logger = logging.getLogger(__name__)
+
+CONTACT_RECIPIENTS = ['myemail@mydomain.com']
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)
+MAX_RETRY_DELAY = timedelta(hours=1)
+# messages claimed by a worker are left alone by other workers for this long
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='contact-outbox')
+
+
+def email_message(message):
+    return EmailMessage(message.subject, message.body, message.from_email, message.recipients)
+
+
+def enqueue(subject, body, from_email, recipients=CONTACT_RECIPIENTS):
+    message = OutboxMessage(subject=subject, body=body, from_email=from_email, recipients=list(recipients))
+    # raises BadHeaderError now rather than in the worker
+    email_message(message).message()
+    message.save()
+    if settings.CONTACT_OUTBOX_THREAD:
+        transaction.on_commit(lambda: _executor.submit(deliver_in_thread))
+    return message
+
+
+def retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def due(now):
+    return OutboxMessage.objects.filter(status=OutboxMessage.Status.PENDING, next_attempt_at__lte=now)
+
+
+def claim(batch_size):
+    # due messages, hidden from other workers until CLAIM_TIMEOUT has passed
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(due(now).order_by('next_attempt_at', 'pk').select_for_update(skip_locked=True)[:batch_size])
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(next_attempt_at=now + CLAIM_TIMEOUT)
+    return messages
+
+
+def connection_lost(error):
+    # a refused message leaves the mail connection usable, socket errors and disconnects do not
+    return isinstance(error, OSError) and not isinstance(error, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused))
+
+
+def deliver(batch_size=BATCH_SIZE, connection=None):
+    # send every due message, batch by batch, and return what happened
+    metrics = {'sent': 0, 'retried': 0, 'failed': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+    if due(timezone.now()).exists():
+        connection = connection or get_connection(fail_silently=False)
+        # the connection is opened before anything is claimed; when the mail server
+        # cannot be reached, a batch is charged an attempt so it backs off like any
+        # other failure instead of being retried every CLAIM_TIMEOUT
+        try:
+            connection.open()
+        except Exception as error:
+            for message in claim(batch_size):
+                failed(message, error, metrics)
+        else:
+            try:
+                send_batches(connection, batch_size, metrics)
+            finally:
+                connection.close()
+    metrics['seconds'] = time.perf_counter() - start
+    if metrics['sent'] or metrics['retried'] or metrics['failed']:
+        logger.info('contact outbox: %(sent)d sent, %(retried)d to retry, %(failed)d failed in %(seconds).3fs', metrics)
+    return metrics
+
+
+def send_batches(connection, batch_size, metrics):
+    messages = claim(batch_size)
+    while messages:
+        for index, message in enumerate(messages):
+            error = send(connection, message, metrics)
+            if connection_lost(error):
+                # the rest of the batch is not sent over a broken connection, and the
+                # next batches wait for the next run
+                for rest in messages[index + 1:]:
+                    failed(rest, error, metrics)
+                return
+        messages = claim(batch_size)
+
+
+def send(connection, message, metrics):
+    # returns the error of a failed message
+    try:
+        connection.send_messages([email_message(message)])
+    except Exception as error:
+        failed(message, error, metrics)
+        return error
+    message.attempts += 1
+    message.status = OutboxMessage.Status.SENT
+    message.sent_at = timezone.now()
+    metrics['sent'] += 1
+    message.save(update_fields=['attempts', 'status', 'sent_at'])
+    return None
+
+
+def failed(message, error, metrics):
+    # retried with backoff, given up after MAX_ATTEMPTS
+    message.attempts += 1
+    message.last_error = '%s: %s' % (type(error).__name__, error)
+    if message.attempts >= MAX_ATTEMPTS:
+        message.status = OutboxMessage.Status.FAILED
+        metrics['failed'] += 1
+        logger.error('contact outbox: message %d failed after %d attempts: %s', message.pk, message.attempts, message.last_error)
+    else:
+        message.next_attempt_at = timezone.now() + retry_delay(message.attempts)
+        metrics['retried'] += 1
+    message.save(update_fields=['attempts', 'status', 'next_attempt_at', 'last_error'])
+
+
+def deliver_in_thread():
+    try:
+        deliver()
+    except Exception:
+        logger.exception('contact outbox: delivery failed')
+    finally:
+        # the thread's own database connection
+        connections.close_all()
+
+
+def outbox_status():
+    # messages per status and when the oldest pending one was created
+    counts = dict(OutboxMessage.objects.values_list('status').annotate(count=Count('pk')).order_by())
+    oldest = OutboxMessage.objects.filter(status=OutboxMessage.Status.PENDING).aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        'pending': counts.get(OutboxMessage.Status.PENDING, 0),
+        'sent': counts.get(OutboxMessage.Status.SENT, 0),
+        'failed': counts.get(OutboxMessage.Status.FAILED, 0),
+        'oldest_pending': oldest,
+    }
@@ -1,9 +1,42 @@
-from django.test import TestCase
+import smtplib
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from .forms import ContactForm
+from .models import OutboxMessage
+from .outbox import MAX_ATTEMPTS, deliver, enqueue, outbox_status, retry_delay
 from django.core import mail
 
 
+# locmem backend that rejects messages with "bounce" in the subject
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        for message in messages:
+            if 'bounce' in message.subject:
+                raise smtplib.SMTPRecipientsRefused({})
+        return super().send_messages(messages)
+
+
+# locmem backend for a mail server that cannot be reached
+class UnreachableBackend(EmailBackend):
+    def open(self):
+        raise ConnectionRefusedError('Connection refused')
+
+
+# locmem backend whose connection drops on the message with "drop" in the subject
+class DroppingBackend(EmailBackend):
+    def send_messages(self, messages):
+        for message in messages:
+            if 'drop' in message.subject:
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        return super().send_messages(messages)
+
+
 class ContactTests(TestCase):
     def setUp(self):
         return
@@ -98,3 +131,108 @@ class ContactTests(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+#----------- OUTBOX TESTS -----------#
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', CONTACT_OUTBOX_THREAD=False)
+class OutboxTests(TestCase):
+    data = {
+        "name": "Anna",
+        "email": "ac@gmail.com",
+        "subject": "I like your web application!",
+        "message": "Please make more",
+    }
+
+    # Test the view saves the message without emailing it
+    def test_view_saves_message(self):
+        response = self.client.post(reverse('contact'), data=self.data)
+        self.assertRedirects(response, reverse('home'))
+        self.assertEqual(len(mail.outbox), 0)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.subject, 'I like your web application!')
+        self.assertEqual(message.body, 'Anna:\nPlease make more')
+        self.assertEqual(message.recipients, ['myemail@mydomain.com'])
+
+    # Test a subject with a new line is rejected before it is saved
+    def test_view_rejects_bad_header(self):
+        response = self.client.post(reverse('contact'), data={**self.data, "subject": "Hello\nBcc: x@example.com"})
+        self.assertContains(response, 'Invalid header found.')
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    # Test a new message is sent in a background thread once saved
+    @override_settings(CONTACT_OUTBOX_THREAD=True)
+    def test_view_schedules_delivery(self):
+        with mock.patch('contact.outbox._executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('contact'), data=self.data)
+        executor.submit.assert_called_once()
+
+    # Test the worker sends every due message over one connection
+    def test_deliver_uses_one_connection(self):
+        for i in range(3):
+            enqueue('Subject %d' % i, 'Body', 'ac@gmail.com')
+        with mock.patch('contact.outbox.get_connection', wraps=get_connection) as connection:
+            metrics = deliver(batch_size=2)
+        connection.assert_called_once()
+        self.assertEqual(metrics['sent'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.Status.SENT).count(), 3)
+        # nothing is sent twice
+        self.assertEqual(deliver()['sent'], 0)
+
+    # Test a failed message is retried later with a growing delay, then given up
+    @override_settings(EMAIL_BACKEND='contact.tests.FailingBackend')
+    def test_deliver_retries_with_backoff(self):
+        enqueue('Hello', 'Body', 'ac@gmail.com')
+        bounce = enqueue('Please bounce', 'Body', 'ac@gmail.com')
+        metrics = deliver()
+        self.assertEqual((metrics['sent'], metrics['retried']), (1, 1))
+        bounce.refresh_from_db()
+        self.assertEqual(bounce.attempts, 1)
+        self.assertGreater(bounce.next_attempt_at, timezone.now() + retry_delay(1) * 0.9)
+        self.assertIn('SMTPRecipientsRefused', bounce.last_error)
+        # not due yet
+        self.assertEqual(deliver()['retried'], 0)
+        self.assertGreater(retry_delay(3), retry_delay(2))
+        with self.assertLogs('contact.outbox', 'ERROR'):
+            for attempt in range(2, MAX_ATTEMPTS + 1):
+                OutboxMessage.objects.filter(pk=bounce.pk).update(next_attempt_at=timezone.now())
+                metrics = deliver()
+        self.assertEqual(metrics['failed'], 1)
+        bounce.refresh_from_db()
+        self.assertEqual((bounce.status, bounce.attempts), (OutboxMessage.Status.FAILED, MAX_ATTEMPTS))
+        self.assertEqual(outbox_status()['failed'], 1)
+
+    # Test an unreachable mail server counts as a failed attempt, with backoff
+    @override_settings(EMAIL_BACKEND='contact.tests.UnreachableBackend')
+    def test_deliver_connection_refused(self):
+        message = enqueue('Hello', 'Body', 'ac@gmail.com')
+        self.assertEqual(deliver()['retried'], 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.Status.PENDING, 1))
+        self.assertGreater(message.next_attempt_at, timezone.now() + retry_delay(1) * 0.9)
+        self.assertIn('ConnectionRefusedError', message.last_error)
+        with self.assertLogs('contact.outbox', 'ERROR'):
+            for attempt in range(2, MAX_ATTEMPTS + 1):
+                OutboxMessage.objects.filter(pk=message.pk).update(next_attempt_at=timezone.now())
+                deliver()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.Status.FAILED, MAX_ATTEMPTS))
+
+    # Test nothing more is sent over a connection that was lost
+    @override_settings(EMAIL_BACKEND='contact.tests.DroppingBackend')
+    def test_deliver_connection_lost(self):
+        enqueue('Hello', 'Body', 'ac@gmail.com')
+        enqueue('Please drop', 'Body', 'ac@gmail.com')
+        enqueue('Goodbye', 'Body', 'ac@gmail.com')
+        metrics = deliver()
+        self.assertEqual((metrics['sent'], metrics['retried']), (1, 2))
+        self.assertEqual([message.subject for message in mail.outbox], ['Hello'])
+        self.assertEqual(list(OutboxMessage.objects.order_by('pk').values_list('attempts', flat=True)), [1, 1, 1])
+        self.assertEqual(outbox_status()['pending'], 2)
+
+    # Test the management command drains the outbox
+    def test_send_outbox_command(self):
+        enqueue('Hello', 'Body', 'ac@gmail.com')
+        call_command('send_outbox', stdout=open('/dev/null', 'w'))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(outbox_status()['pending'], 0)
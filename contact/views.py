@@ -1,8 +1,9 @@
-from django.core.mail import send_mail, BadHeaderError
+from django.core.mail import BadHeaderError
 from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import render, redirect
 from django.urls import reverse
 from .forms import ContactForm
+from .outbox import enqueue
 from django.contrib import messages
 
 # Contact Us Page View and validations
@@ -17,7 +18,8 @@ def contact(request):
             email = form.cleaned_data['email']
             message = name + ':\n' + form.cleaned_data['message']
             try:
-                send_mail(subject, message, email, ['myemail@mydomain.com'])
+                # saved for the outbox worker, the response does not wait for the mail server
+                enqueue(subject, message, email)
             except BadHeaderError:
                 messages.add_message(request, messages.ERROR, 'Message Not Sent') 
                 return HttpResponse("Invalid header found.")
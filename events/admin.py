@@ -1,7 +1,74 @@
-from django.contrib import admin 
+import io
+
+from django import forms
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path
+from . import bulk
 from .models import Event, Task, Person, RegisteredEvent
 
-admin.site.register(Event) 
+# errors listed on the import page, the rest are only counted
+IMPORT_ERRORS_SHOWN = 200
+
+
+class BulkImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV or JSON Lines (.jsonl), UTF-8')
+    kind = forms.ChoiceField(choices=[('events', 'Events'), ('tasks', 'Tasks')], initial='events')
+    dry_run = forms.BooleanField(required=False, help_text='Validate the file without importing anything')
+
+
+# Events are imported from an uploaded file and exported as a download on pages
+# linked from the event list, see events.bulk
+class EventAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/events/event/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='events_event_import'),
+            path('export/', self.admin_site.admin_view(self.export_view), name='events_event_export'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        result = None
+        form = BulkImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            run = bulk.import_tasks if form.cleaned_data['kind'] == 'tasks' else bulk.import_events
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+            try:
+                result = run(stream, bulk.format_for(upload.name), dry_run=form.cleaned_data['dry_run'])
+            except UnicodeDecodeError:
+                form.add_error('file', 'The file is not UTF-8 encoded.')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import events',
+            'form': form,
+            'result': result,
+            'errors': result.errors[:IMPORT_ERRORS_SHOWN] if result else [],
+            'dry_run': form.cleaned_data.get('dry_run') if result else False,
+        }
+        return TemplateResponse(request, 'admin/events/event/import.html', context)
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        format = request.GET.get('format', 'csv')
+        if format not in bulk.FORMATS:
+            format = 'csv'
+        kind = 'tasks' if request.GET.get('kind') == 'tasks' else 'events'
+        export = bulk.export_tasks if kind == 'tasks' else bulk.export_events
+        response = StreamingHttpResponse(export(format),
+            content_type='text/csv' if format == 'csv' else 'application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (kind, format)
+        return response
+
+
+admin.site.register(Event, EventAdmin)
 admin.site.register(Task)
 admin.site.register(Person)
 admin.site.register(RegisteredEvent)
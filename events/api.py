@@ -0,0 +1,108 @@
+import hashlib
+
+from django.db.models import Q
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from rest_framework import permissions, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+
+from .models import Event, Person, RegisteredEvent, Task
+from .pagination import MAX_PAGE_SIZE, PAGE_SIZE
+from .permissions import is_admin
+from .serializers import (EventSerializer, PersonSerializer, RegisteredEventSerializer,
+                          TaskSerializer, requested_fields, wants)
+
+# Read-only JSON API, mounted at /api/v1/. Lists are cursor paginated on an indexed
+# ordering (?cursor=...&size=...), every response carries an ETag of its body and a
+# request whose If-None-Match matches gets an empty 304 instead.
+
+
+class APICursorPagination(CursorPagination):
+    page_size = PAGE_SIZE
+    page_size_query_param = 'size'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ('id',)
+
+
+class EventCursorPagination(APICursorPagination):
+    ordering = ('date', 'id')
+
+
+class TaskCursorPagination(APICursorPagination):
+    ordering = ('deadline', 'id')
+
+
+class PersonCursorPagination(APICursorPagination):
+    ordering = ('name', 'id')
+
+
+class ReadOnlyAPIViewSet(viewsets.ReadOnlyModelViewSet):
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = APICursorPagination
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', requested_fields(self.request))
+        return super().get_serializer(*args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+            return response
+        # the body differs per user and per Accept header, so the ETag does too
+        patch_vary_headers(response, ['Accept', 'Cookie', 'Authorization'])
+        response.render()
+        etag = '"%s"' % hashlib.sha1(response.content).hexdigest()
+        response['ETag'] = etag
+        return get_conditional_response(request, etag=etag, response=response)
+
+
+class EventViewSet(ReadOnlyAPIViewSet):
+    serializer_class = EventSerializer
+    pagination_class = EventCursorPagination
+
+    def get_queryset(self):
+        # published events and the events this user manages
+        user = self.request.user
+        events = Event.objects.all()
+        if not is_admin(user):
+            events = events.filter(Q(publish=True) | Q(author=user))
+        if wants(self.request, 'author'):
+            events = events.select_related('author')
+        # tasks are only sent when asked for
+        if requested_fields(self.request) is not None and wants(self.request, 'tasks'):
+            events = events.prefetch_related(EventSerializer.tasks_prefetch(user, is_admin(user)))
+        return events
+
+
+class TaskViewSet(ReadOnlyAPIViewSet):
+    serializer_class = TaskSerializer
+    pagination_class = TaskCursorPagination
+
+    def get_queryset(self):
+        # tasks of the events this user manages, ?event=<id> for a single event
+        tasks = Task.objects.filter(event__in=Event.objects.visible_to(self.request.user, is_admin(self.request.user)))
+        event = self.request.query_params.get('event')
+        if event is not None:
+            if not event.isdigit():
+                raise ValidationError({'event': 'expected an event id'})
+            tasks = tasks.filter(event=event)
+        if wants(self.request, 'person'):
+            tasks = tasks.select_related('person')
+        return tasks
+
+
+class PersonViewSet(ReadOnlyAPIViewSet):
+    serializer_class = PersonSerializer
+    pagination_class = PersonCursorPagination
+    queryset = Person.objects.all()
+
+
+class RegisteredEventViewSet(ReadOnlyAPIViewSet):
+    serializer_class = RegisteredEventSerializer
+
+    def get_queryset(self):
+        # the user's own registrations
+        registrations = RegisteredEvent.objects.filter(member=self.request.user)
+        if wants(self.request, 'event'):
+            registrations = registrations.select_related('event', 'event__author')
+        return registrations
@@ -0,0 +1,12 @@
+from rest_framework.routers import DefaultRouter
+
+from . import api
+
+# /api/v1/
+router = DefaultRouter()
+router.register('events', api.EventViewSet, basename='api-event')
+router.register('tasks', api.TaskViewSet, basename='api-task')
+router.register('people', api.PersonViewSet, basename='api-person')
+router.register('registrations', api.RegisteredEventViewSet, basename='api-registration')
+
+urlpatterns = router.urls
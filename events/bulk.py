@@ -0,0 +1,281 @@
+import csv
+import io
+import json
+from contextlib import nullcontext
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, router, transaction
+
+from .feed import feed_changed
+from .models import CalendarFeed, Event, Person, Task
+from .search import reindex
+
+# Bulk import and export of events and tasks as CSV or JSON Lines.
+#
+# Rows are read from the stream and validated BATCH_SIZE at a time with the same
+# checks as the forms: the model's field validators and Event.clean/Task.clean,
+# except that dates in the past are accepted where clean() allows them, so past
+# events can be migrated.
+# Foreign keys are given by name (author username, event title, person name) and
+# looked up once per batch, as is the uniqueness of event titles. The valid rows
+# of a batch are inserted with one bulk_create in their own transaction; invalid
+# rows are reported with their line number and skipped.
+#
+# bulk_create sends no signals, so the import does what the signal receivers
+# would: it indexes new events for search, gives the events of new tasks and the
+# authors' calendar feeds a new version and gives the public feed a new version.
+#
+# Exports read the table with iterator(), so memory stays flat however many rows
+# are written, and the files they write can be imported again.
+
+FORMATS = ('csv', 'jsonl')
+BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+
+EVENT_FIELDS = ['title', 'description', 'date', 'publish', 'capacity', 'author']
+TASK_FIELDS = ['title', 'description', 'deadline', 'complete', 'event', 'person']
+BOOLEANS = {'true': True, 'yes': True, 't': True, '1': True, 'false': False, 'no': False, 'f': False, '0': False}
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        # (line number, message)
+        self.errors = []
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+class Rollback(Exception):
+    pass
+
+
+def format_for(name, default='csv'):
+    # the format of a file name, by its extension
+    extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    return 'csv' if extension == 'csv' else default
+
+
+def describe(error):
+    if not hasattr(error, 'error_dict'):
+        return '; '.join(error.messages)
+    return '; '.join(message if field == NON_FIELD_ERRORS else '%s: %s' % (field, message)
+        for field, errors in error.message_dict.items() for message in errors)
+
+
+#----------- IMPORT -----------#
+
+def read_rows(stream, format):
+    # (line number, row) for each row of a text stream; a row that cannot be
+    # read is a ValidationError in place of the row
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # empty cells are missing values
+            yield reader.line_num, {name: value for name, value in row.items() if name is not None and value != ''}
+    elif format == 'jsonl':
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as e:
+                yield line, ValidationError('Invalid JSON: %s' % e)
+                continue
+            if not isinstance(row, dict):
+                yield line, ValidationError('Expected a JSON object')
+                continue
+            if any(isinstance(value, (dict, list)) for value in row.values()):
+                yield line, ValidationError('Values must be strings, numbers, booleans or null')
+                continue
+            yield line, {name: value for name, value in row.items() if value is not None and value != ''}
+    else:
+        raise ValueError('Unknown format %r, expected one of %s' % (format, ', '.join(FORMATS)))
+
+
+def import_events(stream, format='csv', batch_size=BATCH_SIZE, dry_run=False):
+    return run_import(stream, format, batch_size, dry_run, build_events, insert_events)
+
+
+def import_tasks(stream, format='csv', batch_size=BATCH_SIZE, dry_run=False):
+    return run_import(stream, format, batch_size, dry_run, build_tasks, insert_tasks)
+
+
+def run_import(stream, format, batch_size, dry_run, build, insert):
+    # a dry run inserts the rows like a real one inside a transaction that is
+    # rolled back, so it reports the same errors
+    result = ImportResult()
+    rows = read_rows(stream, format)
+    try:
+        with transaction.atomic(using=router.db_for_write(Event)) if dry_run else nullcontext():
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                readable = []
+                for line, row in batch:
+                    if isinstance(row, ValidationError):
+                        result.error(line, describe(row))
+                    else:
+                        readable.append((line, row))
+                valid = build(readable, result)
+                if valid:
+                    insert_batch(valid, insert, result)
+            if dry_run:
+                raise Rollback()
+    except Rollback:
+        pass
+    result.errors.sort(key=lambda error: error[0])
+    return result
+
+
+def insert_batch(valid, insert, result):
+    try:
+        with transaction.atomic(using=router.db_for_write(Event)):
+            insert([instance for line, instance in valid])
+    except DatabaseError as e:
+        # written by someone else since the batch was validated, nothing of the batch is kept
+        for line, instance in valid:
+            result.error(line, 'Not imported, the batch failed: %s' % e)
+        return
+    result.created += len(valid)
+
+
+def field_values(model, names, row):
+    # the row's values for these fields, in the form the forms would give them:
+    # missing values are the default or empty text and yes/no words are booleans
+    values = {}
+    for name in names:
+        field, value = model._meta.get_field(name), row.get(name)
+        if value is None and field.has_default():
+            value = field.get_default()
+        elif value is None and not field.null and field.empty_strings_allowed:
+            value = ''
+        elif isinstance(value, str) and field.get_internal_type() == 'BooleanField':
+            value = BOOLEANS.get(value.strip().lower(), value)
+        values[name] = value
+    return values
+
+
+def parse_dates(instance, names):
+    # only the format of these date fields is checked: their validators refuse past
+    # dates, which a back catalogue is mostly made of, clean() keeps the model's rules
+    errors = {}
+    for name in names:
+        field = instance._meta.get_field(name)
+        value = getattr(instance, field.attname)
+        if value in field.empty_values:
+            errors[name] = [field.error_messages['blank']]
+            continue
+        try:
+            setattr(instance, field.attname, field.to_python(value))
+        except ValidationError as e:
+            errors[name] = e.messages
+    if errors:
+        raise ValidationError(errors)
+
+
+def validate(line, instance, exclude, dates, result):
+    # the field validators and clean() of the form, foreign keys are looked up by the caller
+    try:
+        parse_dates(instance, dates)
+        instance.full_clean(exclude=[*exclude, *dates], validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        result.error(line, describe(e))
+        return False
+    return True
+
+
+def build_events(rows, result):
+    titles = [row['title'] for line, row in rows if isinstance(row.get('title'), str)]
+    taken = set(Event.objects.filter(title__in=titles).values_list('title', flat=True))
+    usernames = {row['author'] for line, row in rows if 'author' in row}
+    authors = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+    valid = []
+    for line, row in rows:
+        author = row.get('author')
+        if author is not None and author not in authors:
+            result.error(line, 'author: Unknown user "%s"' % author)
+            continue
+        event = Event(**field_values(Event, EVENT_FIELDS[:-1], row), author_id=authors.get(author))
+        if not validate(line, event, ['author'], ['date'], result):
+            continue
+        if event.title in taken:
+            result.error(line, 'title: Event with this Title already exists.')
+            continue
+        taken.add(event.title)
+        valid.append((line, event))
+    return valid
+
+
+def insert_events(events):
+    Event.objects.bulk_create(events)
+    reindex(events)
+    CalendarFeed.objects.filter(user__in={event.author_id for event in events if event.author_id}).changed()
+    transaction.on_commit(feed_changed)
+
+
+def build_tasks(rows, result):
+    titles = {row['event'] for line, row in rows if 'event' in row}
+    events = {event.title: event for event in Event.objects.filter(title__in=titles).only('id', 'title', 'date')}
+    names = {row['person'] for line, row in rows if 'person' in row}
+    # the oldest person of a name when several share it
+    people = dict(Person.objects.filter(name__in=names).order_by('-id').values_list('name', 'id'))
+    valid = []
+    for line, row in rows:
+        event, person = events.get(row.get('event')), row.get('person')
+        if event is None:
+            result.error(line, 'event: Unknown event "%s"' % row.get('event', ''))
+            continue
+        if person is not None and person not in people:
+            result.error(line, 'person: Unknown person "%s"' % person)
+            continue
+        task = Task(**field_values(Task, TASK_FIELDS[:-2], row), event=event, person_id=people.get(person))
+        if validate(line, task, ['event', 'person'], ['deadline'], result):
+            valid.append((line, task))
+    return valid
+
+
+def insert_tasks(tasks):
+    Task.objects.bulk_create(tasks)
+    # what the task_changed receiver does for saved tasks
+    Event.objects.filter(pk__in={task.event_id for task in tasks}).touch()
+
+
+#----------- EXPORT -----------#
+
+def export_events(format='csv', queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    queryset = Event.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('pk').values_list('title', 'description', 'date', 'publish', 'capacity', 'author__username')
+    return write_rows(rows.iterator(chunk_size=chunk_size), EVENT_FIELDS, format)
+
+
+def export_tasks(format='csv', queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    queryset = Task.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('pk').values_list('title', 'description', 'deadline', 'complete', 'event__title', 'person__name')
+    return write_rows(rows.iterator(chunk_size=chunk_size), TASK_FIELDS, format)
+
+
+def write_rows(rows, fields, format):
+    # the lines of the file, one string per row (after a header for CSV)
+    if format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for row in rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(['' if value is None else value for value in row])
+        yield buffer.getvalue()
+    elif format == 'jsonl':
+        for row in rows:
+            yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n'
+    else:
+        raise ValueError('Unknown format %r, expected one of %s' % (format, ', '.join(FORMATS)))
@@ -0,0 +1,52 @@
+from django.db.models import Exists, OuterRef, Q
+from django.urls import reverse
+
+from . import ical
+from .models import Event, RegisteredEvent, Task
+
+# A user's calendar feed: the published events they registered for, the events
+# they authored and the deadlines of those events' open tasks, as all-day
+# events. Calendar apps poll the feed URL every few minutes; CalendarFeed.version
+# changes whenever any of this does (events.signals, EventQuerySet.touch), so a
+# poll with the current ETag is answered 304 after reading one row.
+
+
+def feed_etag(feed):
+    return '"%s"' % feed.version.hex
+
+
+def feed_calendar(feed, request):
+    # the iCalendar text of the feed
+    user_id = feed.user_id
+    domain = request.get_host().split(':')[0]
+    stamp = ical.datetime_value(feed.modified)
+    registered = RegisteredEvent.objects.filter(member_id=user_id)
+    statuses = dict(registered.filter(event__publish=True).values_list('event_id', 'status'))
+    events = (Event.objects.filter(Q(Exists(registered.filter(event=OuterRef('pk'))), publish=True) | Q(author_id=user_id))
+        .order_by('date', 'pk'))
+    tasks = (Task.objects.filter(event__author_id=user_id, complete=False)
+        .order_by('deadline', 'pk').values_list('pk', 'title', 'description', 'deadline', 'event__title'))
+    parts = [ical.begin_calendar('Events')]
+    for event in events.only('title', 'description', 'date', 'author_id'):
+        waitlisted = statuses.get(event.pk) == RegisteredEvent.Status.WAITLISTED
+        url = request.build_absolute_uri(reverse('events_detail', kwargs={'pk': event.pk})) if event.author_id == user_id else None
+        parts.append(ical.component('VEVENT', [
+            ('UID', 'event-%d@%s' % (event.pk, domain)),
+            ('DTSTAMP', stamp),
+            ('DTSTART;VALUE=DATE', ical.date_value(event.date)),
+            ('SUMMARY', ical.escape(event.title + (' (waitlisted)' if waitlisted else ''))),
+            ('DESCRIPTION', ical.escape(event.description)),
+            ('STATUS', 'TENTATIVE' if waitlisted else 'CONFIRMED'),
+            ('URL', url),
+        ]))
+    for pk, title, description, deadline, event_title in tasks:
+        parts.append(ical.component('VEVENT', [
+            ('UID', 'task-%d@%s' % (pk, domain)),
+            ('DTSTAMP', stamp),
+            ('DTSTART;VALUE=DATE', ical.date_value(deadline)),
+            ('SUMMARY', ical.escape('Due: %s (%s)' % (title, event_title))),
+            ('DESCRIPTION', ical.escape(description)),
+            ('TRANSP', 'TRANSPARENT'),
+        ]))
+    parts.append(ical.end_calendar())
+    return ''.join(parts)
@@ -0,0 +1,152 @@
+import csv
+import io
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from . import ical
+from .models import RegisteredEvent
+
+# Downloads of an event's task list and registrants as CSV or iCalendar.
+#
+# Rows are read with iterator(chunk_size=EXPORT_CHUNK_SIZE) (a server-side
+# cursor on PostgreSQL) and written out as they arrive, so an export of any size
+# holds one chunk in memory. The ASGI server needs an async iterator to stream,
+# under WSGI a sync one; stream() gives the one the server can send.
+
+FORMATS = ('csv', 'ics')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ics': 'text/calendar; charset=utf-8'}
+EXPORT_CHUNK_SIZE = 2000
+# rows sent to the client in one write
+ROWS_PER_WRITE = 200
+
+
+# what is exported: the header and rows for CSV, the components for iCalendar
+class Export:
+    header = []
+
+    def __init__(self, event, domain):
+        self.event = event
+        # UIDs are unique under the site's domain
+        self.domain = domain
+        self.stamp = ical.datetime_value(timezone.now())
+
+    def end_calendar(self):
+        return ''
+
+
+class TaskExport(Export):
+    header = ['title', 'description', 'deadline', 'complete', 'person']
+
+    def rows(self):
+        return (self.event.task_set.order_by('deadline', 'id')
+            .values_list('id', 'title', 'description', 'deadline', 'complete', 'person__name'))
+
+    def csv_row(self, row):
+        pk, title, description, deadline, complete, person = row
+        return [title, description, deadline, complete, person or '']
+
+    def begin_calendar(self):
+        return ical.begin_calendar('%s tasks' % self.event.title)
+
+    def calendar_row(self, row):
+        pk, title, description, deadline, complete, person = row
+        return ical.component('VTODO', [
+            ('UID', 'task-%d@%s' % (pk, self.domain)),
+            ('DTSTAMP', self.stamp),
+            ('SUMMARY', ical.escape(title)),
+            ('DESCRIPTION', ical.escape(description)),
+            ('DUE;VALUE=DATE', ical.date_value(deadline)),
+            ('STATUS', 'COMPLETED' if complete else 'NEEDS-ACTION'),
+            ('CONTACT', ical.escape(person) if person else None),
+        ])
+
+
+# registrations of deleted users are left out
+class RegistrantExport(Export):
+    header = ['username', 'first_name', 'last_name', 'email', 'status']
+
+    def rows(self):
+        return (RegisteredEvent.objects.filter(event=self.event, member__isnull=False).order_by('pk')
+            .values_list('member__username', 'member__first_name', 'member__last_name', 'member__email', 'status'))
+
+    def csv_row(self, row):
+        return list(row)
+
+    def begin_calendar(self):
+        # the event itself, its registrants are its attendees
+        event = self.event
+        return ical.begin_calendar(event.title) + ''.join(ical.fold(line) for line in [
+            'BEGIN:VEVENT',
+            'UID:event-%d@%s' % (event.pk, self.domain),
+            'DTSTAMP:' + self.stamp,
+            'DTSTART;VALUE=DATE:' + ical.date_value(event.date),
+            'SUMMARY:' + ical.escape(event.title),
+            'DESCRIPTION:' + ical.escape(event.description),
+        ])
+
+    def calendar_row(self, row):
+        username, first_name, last_name, email, status = row
+        name = ' '.join(part for part in (first_name, last_name) if part) or username
+        # waitlisted members have no spot yet
+        partstat = 'ACCEPTED' if status == RegisteredEvent.Status.ADMITTED else 'TENTATIVE'
+        value = 'mailto:%s' % email if email else 'urn:x-username:%s' % username
+        return ical.fold('ATTENDEE;CN=%s;PARTSTAT=%s:%s' % (ical.param(name), partstat, value))
+
+    def end_calendar(self):
+        return ical.fold('END:VEVENT')
+
+
+EXPORTS = {'tasks': TaskExport, 'registrants': RegistrantExport}
+
+
+def csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(['' if value is None else value for value in values])
+    return buffer.getvalue()
+
+
+def begin(export, format):
+    return csv_line(export.header) if format == 'csv' else export.begin_calendar()
+
+
+def line(export, format, row):
+    return csv_line(export.csv_row(row)) if format == 'csv' else export.calendar_row(row)
+
+
+def end(export, format):
+    if format == 'csv':
+        return ''
+    return export.end_calendar() + ical.end_calendar()
+
+
+def lines(export, format, chunk_size=EXPORT_CHUNK_SIZE):
+    written = [begin(export, format)]
+    for row in export.rows().iterator(chunk_size=chunk_size):
+        written.append(line(export, format, row))
+        if len(written) >= ROWS_PER_WRITE:
+            yield ''.join(written)
+            written = []
+    written.append(end(export, format))
+    yield ''.join(written)
+
+
+async def alines(export, format, chunk_size=EXPORT_CHUNK_SIZE):
+    # the same cursor, read a chunk at a time in the thread that opened it
+    # (aiterator() runs values_list() queries on the event loop in Django 4.2)
+    rows = export.rows().iterator(chunk_size=chunk_size)
+    next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    written = [begin(export, format)]
+    while chunk := await next_chunk():
+        for row in chunk:
+            written.append(line(export, format, row))
+            if len(written) >= ROWS_PER_WRITE:
+                yield ''.join(written)
+                written = []
+    written.append(end(export, format))
+    yield ''.join(written)
+
+
+def stream(export, format, asynchronous, chunk_size=EXPORT_CHUNK_SIZE):
+    return (alines if asynchronous else lines)(export, format, chunk_size)
@@ -0,0 +1,28 @@
+import hashlib
+import uuid
+
+from django.core.cache import cache
+
+FEED_VERSION_KEY = 'events:feed:version'
+FEED_CACHE_TIMEOUT = 60 * 5
+
+# The public feed of published upcoming events is the same for every anonymous
+# visitor, so rendered pages are cached under the current feed version. Saving,
+# deleting or publishing an event gives the feed a new version (events.signals,
+# PublishEvent) once it is committed, and the old pages are no longer read. Other
+# worker processes see the new version only through a shared cache (see
+# EventPlanner.caches).
+
+
+def feed_version():
+    return cache.get_or_set(FEED_VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def feed_changed():
+    cache.set(FEED_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def feed_cache_key(request, today):
+    # only the parameters the page reads, so arbitrary query strings share entries
+    params = '&'.join('%s=%s' % (name, request.GET.get(name, '')) for name in ('cursor', 'size', 'format'))
+    return 'events:feed:%s:%s:%s' % (feed_version(), today.isoformat(), hashlib.sha1(params.encode()).hexdigest())
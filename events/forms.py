@@ -1,4 +1,7 @@
 from django import forms 
+from django.core.cache import cache
+from django.urls import reverse_lazy
+from django.utils.safestring import mark_safe
 from .models import *
 
 class EventForm(forms.ModelForm):
@@ -6,7 +9,7 @@ class EventForm(forms.ModelForm):
     class Meta:
     # specify model to be used
         model = Event
-        fields = ['title', 'description', 'date', 'author']
+        fields = ['title', 'description', 'date', 'capacity', 'author']
         widgets = {
             'title': forms.TextInput(attrs={
             'class': 'form-control',
@@ -22,9 +25,46 @@ class EventForm(forms.ModelForm):
             'class': 'form-control',
             'placeholder': 'yyyy-mm-dd',
             }),
+            'capacity': forms.NumberInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'No limit',
+            'min': 1,
+            }),
             'author': forms.HiddenInput(),
         }
 
+# Largest person table still rendered as a <select> on the task form
+PERSON_SELECT_LIMIT = 500
+PERSON_CHOICES_CACHE_KEY = 'events:person_choices'
+# bounds how long another process can show old choices with the per-process cache
+PERSON_CHOICES_CACHE_TIMEOUT = 60 * 5
+
+# (id, name) pairs for the person field, cached until a person is saved or deleted
+# (see events.signals). At most PERSON_SELECT_LIMIT + 1 are kept, enough to tell
+# whether the table is too big for a <select>. Other worker processes see the
+# change at once only with a shared cache (see EventPlanner.caches).
+def person_choices():
+  choices = cache.get(PERSON_CHOICES_CACHE_KEY)
+  if choices is None:
+    choices = list(Person.objects.order_by('name', 'id').values_list('id', 'name')[:PERSON_SELECT_LIMIT + 1])
+    cache.set(PERSON_CHOICES_CACHE_KEY, choices, PERSON_CHOICES_CACHE_TIMEOUT)
+  return choices
+
+# Text input filled from the person autocomplete endpoint through a <datalist>
+class PersonAutocompleteInput(forms.TextInput):
+  def __init__(self, attrs=None):
+    super().__init__(attrs={
+      'class': 'form-control person-autocomplete',
+      'list': 'person-options',
+      'autocomplete': 'off',
+      'placeholder': 'Start typing a name',
+      'data-autocomplete-url': reverse_lazy('person_autocomplete'),
+      **(attrs or {}),
+    })
+
+  def render(self, name, value, attrs=None, renderer=None):
+    return super().render(name, value, attrs, renderer) + mark_safe('<datalist id="person-options"></datalist>')
+
 class TaskForm(forms.ModelForm):
 # create meta class
  class Meta:
@@ -47,10 +87,18 @@ class TaskForm(forms.ModelForm):
             'placeholder': 'yyyy-mm-dd',
     }),
   'event': forms.HiddenInput(),
-  'person': forms.Select(
-               choices=Person.objects.all()
-            )
   }
 
+ def __init__(self, *args, **kwargs):
+  super().__init__(*args, **kwargs)
+  # people are read when the form is built, not when this module is imported
+  choices = person_choices()
+  field = self.fields['person']
+  if len(choices) > PERSON_SELECT_LIMIT:
+   # too many people for a <select>, type a name and pick from the autocomplete list
+   field.widget = PersonAutocompleteInput()
+  else:
+   field.choices = [('', field.empty_label)] + choices
+
   
   
\ No newline at end of file
@@ -0,0 +1,66 @@
+from datetime import timezone
+
+# iCalendar (RFC 5545) text, written a line at a time so exports and feeds can
+# stream calendars of any size. Lines end in CRLF and are folded at 75 octets.
+
+PRODID = '-//EventPlanner//Events//EN'
+LINE_OCTETS = 75
+
+
+def escape(text):
+    # a TEXT value
+    return (str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n'))
+
+
+def param(text):
+    # a parameter value, quoted; DQUOTE cannot be escaped and is left out
+    return '"%s"' % str(text).replace('"', '').replace('\r', ' ').replace('\n', ' ')
+
+
+def fold(line):
+    # the content line with CRLF, longer lines split between characters with a
+    # CRLF and a space
+    encoded = line.encode('utf-8')
+    if len(encoded) <= LINE_OCTETS:
+        return line + '\r\n'
+    parts = []
+    start, limit = 0, LINE_OCTETS
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # back off to the start of a UTF-8 character
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode('utf-8'))
+        # continuation lines lose one octet to the leading space
+        start, limit = end, LINE_OCTETS - 1
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def date_value(day):
+    return day.strftime('%Y%m%d')
+
+
+def datetime_value(moment):
+    # an aware datetime in UTC form
+    return moment.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def begin_calendar(name=None):
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:' + PRODID, 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH']
+    if name:
+        lines.append('X-WR-CALNAME:' + escape(name))
+    return ''.join(fold(line) for line in lines)
+
+
+def end_calendar():
+    return fold('END:VCALENDAR')
+
+
+def component(name, properties):
+    # a component from (property, value) pairs, values already escaped;
+    # pairs with a value of None are left out
+    lines = ['BEGIN:' + name]
+    lines += ['%s:%s' % (prop, value) for prop, value in properties if value is not None]
+    lines.append('END:' + name)
+    return ''.join(fold(line) for line in lines)
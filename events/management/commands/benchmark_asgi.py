@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from events.models import Event, Person, Task
+
+
+# Compares how many of the JSON endpoints (complete, publish, register) a WSGI
+# deployment with --workers threads and an ASGI deployment on one event loop serve
+# with --concurrency requests in flight. --db-latency adds a round trip to every
+# query, as with a database server on the network, which is where a WSGI worker
+# sits idle. The benchmark user, events and tasks are deleted afterwards.
+#   python manage.py benchmark_asgi --concurrency 8,32,128 --workers 4 --db-latency 2
+class Command(BaseCommand):
+    help = 'Benchmark the JSON endpoints served through WSGI worker threads and through ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='8,32,128')
+        parser.add_argument('--requests', type=int, default=600)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--db-latency', type=float, default=2, help='milliseconds added to every query')
+
+    # the test clients send Host: testserver
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **options):
+        latency = options['db_latency'] / 1000
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_query)
+
+        user, events, tasks = self.create_data()
+        try:
+            client = Client()
+            client.force_login(user)
+            self.cookies = client.cookies
+            self.paths = self.requests(user, events, tasks)
+            connections.close_all()
+            if latency:
+                connection_created.connect(add_latency)
+            self.stdout.write('%-6s %12s %12s %12s %12s' % ('server', 'concurrency', 'req/s', 'p50 ms', 'p95 ms'))
+            for concurrency in [int(count) for count in options['concurrency'].split(',')]:
+                for server, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                    start = time.perf_counter()
+                    timings = run(options['requests'], concurrency, options['workers'])
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write('%-6s %12d %12.1f %12.3f %12.3f' % (
+                        server, concurrency, len(timings) / elapsed, statistics.median(timings), self.percentile(timings, 95)))
+        finally:
+            connection_created.disconnect(add_latency)
+            connections.close_all()
+            Event.objects.filter(pk__in=[event.pk for event in events]).delete()
+            Person.objects.filter(name='bench-asgi').delete()
+            user.delete()
+
+    def create_data(self):
+        day = timezone.now().date() + timedelta(days=30)
+        user = User.objects.create(username='bench-asgi', email='bench-asgi@example.com')
+        person = Person.objects.create(name='bench-asgi')
+        events = Event.objects.bulk_create(
+            [Event(title='bench-asgi-%d' % i, description='benchmark', date=day, author=user) for i in range(20)])
+        tasks = Task.objects.bulk_create(
+            [Task(title='bench-asgi', description='benchmark', deadline=day, event=event, person=person) for event in events])
+        return user, events, tasks
+
+    def requests(self, user, events, tasks):
+        # (method, path, data) round robin over the three endpoints
+        paths = []
+        for event, task in zip(events, tasks):
+            paths.append(('post', reverse('complete_task'), {'task_id': task.pk}))
+            paths.append(('post', reverse('publish_ajax_event'), {'event_id': event.pk}))
+            paths.append(('get', reverse('register_event'), {'event_id': event.pk, 'user_id': user.pk}))
+        return itertools.cycle(paths)
+
+    def run_wsgi(self, count, concurrency, workers):
+        # requests queue for one of the worker threads, as in a threaded WSGI server,
+        # and the time spent in the queue counts
+        slots = threading.BoundedSemaphore(concurrency)
+        timings = []
+
+        def request(start, method, path, data):
+            try:
+                client = Client()
+                client.cookies = self.cookies
+                getattr(client, method)(path, data)
+                timings.append((time.perf_counter() - start) * 1000)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for _ in range(count):
+                slots.acquire()
+                pool.submit(request, time.perf_counter(), *next(self.paths))
+        return timings
+
+    def run_asgi(self, count, concurrency, workers):
+        # up to concurrency requests in flight on one event loop
+        async def request(semaphore, method, path, data):
+            async with semaphore:
+                start = time.perf_counter()
+                client = AsyncClient()
+                client.cookies = self.cookies
+                # a thread for each request's database work, as in ASGIHandler
+                async with ThreadSensitiveContext():
+                    await getattr(client, method)(path, data)
+                return (time.perf_counter() - start) * 1000
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*[request(semaphore, *next(self.paths)) for _ in range(count)])
+
+        timings = asyncio.run(run())
+        connections.close_all()
+        return timings
+
+    def percentile(self, timings, pct):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
@@ -0,0 +1,123 @@
+import json
+import random
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test import RequestFactory
+from django.utils import timezone
+from datetime import timedelta
+from events.models import Event, RegisteredEvent
+from home.views import RegisterEvents
+
+# SQLite settings compared against the configured ones: the rollback journal and
+# full syncs SQLite uses out of the box
+SQLITE_DEFAULT_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000, 'mmap_size': 0}
+
+
+# Runs RegisterEvents from several threads at once and reports registrations per
+# second for the configured database. On SQLite the same run is repeated with
+# SQLite's default journal, so WAL and the other pragmas can be compared; run it
+# again with DATABASE_ENGINE=postgresql to compare against PostgreSQL.
+# The benchmark users, events and registrations are deleted afterwards.
+#   python manage.py benchmark_concurrency --threads 1,4,8 --seconds 5
+class Command(BaseCommand):
+    help = 'Benchmark concurrent registration throughput for the database configuration'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', default='1,4,8')
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--events', type=int, default=20)
+        parser.add_argument('--users', type=int, default=500)
+
+    def handle(self, *args, **options):
+        self.factory = RequestFactory()
+        # the view is async, each worker thread runs it to completion; its queries run
+        # in that worker thread, on the thread's own connection
+        self.view = async_to_sync(RegisterEvents.as_view())
+        settings_dict = connections.settings['default']
+        profiles = [('configured', settings_dict.get('PRAGMAS', {}))]
+        if connection.vendor == 'sqlite':
+            profiles.insert(0, ('sqlite default', SQLITE_DEFAULT_PRAGMAS))
+        configured = settings_dict.get('PRAGMAS')
+        users, events = self.create_data(options['users'], options['events'])
+        try:
+            self.stdout.write('%-16s %8s %12s %12s %12s %8s' % ('profile', 'threads', 'regs/s', 'p50 ms', 'p95 ms', 'errors'))
+            for name, pragmas in profiles:
+                # new connections, including the worker threads', read these pragmas
+                settings_dict['PRAGMAS'] = pragmas
+                for threads in [int(count) for count in options['threads'].split(',')]:
+                    connection.close()
+                    RegisteredEvent.objects.filter(event__in=events).delete()
+                    timings, errors, registered = self.run(threads, options['seconds'], users, events)
+                    count = RegisteredEvent.objects.filter(event__in=events).count()
+                    if count != registered:
+                        raise CommandError('%d registrations, the view reported %d' % (count, registered))
+                    self.stdout.write('%-16s %8d %12.1f %12.3f %12.3f %8d' % (
+                        name, threads, len(timings) / options['seconds'],
+                        statistics.median(timings) if timings else 0,
+                        self.percentile(timings, 95), errors))
+        finally:
+            if configured is None:
+                settings_dict.pop('PRAGMAS', None)
+            else:
+                settings_dict['PRAGMAS'] = configured
+            connection.close()
+            # the configured journal mode is set again by the next connection
+            Event.objects.filter(pk__in=[event.pk for event in events]).delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def create_data(self, user_count, event_count):
+        day = timezone.now().date() + timedelta(days=30)
+        users = User.objects.bulk_create(
+            [User(username='bench-concurrency-%d' % i, email='bench-concurrency-%d@example.com' % i) for i in range(user_count)])
+        events = Event.objects.bulk_create(
+            [Event(title='bench-concurrency-%d' % i, description='benchmark', date=day, publish=True) for i in range(event_count)])
+        return users, events
+
+    def run(self, threads, seconds, users, events):
+        timings = []
+        errors = []
+        registered = []
+        deadline = time.perf_counter() + seconds
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            close_old_connections()
+            local_timings = []
+            local_errors = 0
+            local_registered = 0
+            barrier.wait()
+            while time.perf_counter() < deadline:
+                user, event = random.choice(users), random.choice(events)
+                request = self.factory.get('/home/register', {'event_id': event.pk, 'user_id': user.pk})
+                start = time.perf_counter()
+                try:
+                    response = self.view(request)
+                except OperationalError:
+                    # "database is locked" once the busy timeout has run out
+                    local_errors += 1
+                    continue
+                local_timings.append((time.perf_counter() - start) * 1000)
+                local_registered += json.loads(response.content)['register_success']
+            connection.close()
+            timings.extend(local_timings)
+            errors.append(local_errors)
+            registered.append(local_registered)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return timings, sum(errors), sum(registered)
+
+    def percentile(self, timings, pct):
+        if not timings:
+            return 0
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
@@ -0,0 +1,93 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from datetime import timedelta
+from events.models import Event, RegisteredEvent
+from home.views import RegisterEvents
+
+
+class Rollback(Exception):
+    pass
+
+
+# Times the RegisterEvents view while the RegisteredEvent table grows.
+# Everything is created inside a transaction that is rolled back at the end,
+# so the command can be pointed at a development database.
+#   python manage.py benchmark_registrations --sizes 1000,10000,100000,1000000
+class Command(BaseCommand):
+    help = 'Benchmark registration latency as the number of registrations grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+        parser.add_argument('--samples', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        self.factory = RequestFactory()
+        # the view is async, run to completion on each call
+        self.view = async_to_sync(RegisterEvents.as_view())
+        try:
+            with transaction.atomic():
+                self.run(sizes, options['samples'], options['batch_size'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def run(self, sizes, samples, batch_size):
+        # rows are laid out as a grid of members x events, the grid side is
+        # big enough to hold the largest size plus the sampled registrations
+        side = int((sizes[-1] + samples * len(sizes)) ** 0.5) + 1
+        day = timezone.now().date() + timedelta(days=30)
+        users = User.objects.bulk_create(
+            [User(username='bench-user-%d' % i, email='bench-user-%d@example.com' % i) for i in range(side)], batch_size=batch_size)
+        events = Event.objects.bulk_create(
+            [Event(title='bench-event-%d' % i, description='benchmark', date=day, publish=True) for i in range(side)],
+            batch_size=batch_size)
+        pairs = ((user, event) for user in users for event in events)
+
+        self.stdout.write('%12s %12s %12s %12s' % ('rows', 'new p50 ms', 'new p95 ms', 'dup p50 ms'))
+        created = 0
+        for size in sizes:
+            rows = []
+            while created < size:
+                user, event = next(pairs)
+                rows.append(RegisteredEvent(member=user, event=event))
+                created += 1
+            RegisteredEvent.objects.bulk_create(rows, batch_size=batch_size)
+
+            # registering new (member, event) pairs, then repeating one that exists
+            fresh = [next(pairs) for _ in range(samples)]
+            new_timings = [self.time_register(user, event) for user, event in fresh]
+            created += samples
+            dup_timings = [self.time_register(*fresh[0], expect_created=False) for _ in range(samples)]
+            # every sample registered, no duplicate did
+            count = RegisteredEvent.objects.filter(event__in=events).count()
+            if count != created:
+                raise CommandError('%d registrations, expected %d' % (count, created))
+            self.stdout.write('%12d %12.3f %12.3f %12.3f' % (
+                count,
+                statistics.median(new_timings),
+                self.percentile(new_timings, 95),
+                statistics.median(dup_timings),
+            ))
+
+    def time_register(self, user, event, expect_created=True):
+        request = self.factory.get('/home/register', {'event_id': event.pk, 'user_id': user.pk})
+        start = time.perf_counter()
+        response = self.view(request)
+        elapsed = (time.perf_counter() - start) * 1000
+        if json.loads(response.content)['register_success'] != expect_created:
+            raise CommandError('unexpected response %s for user %d, event %d' % (response.content.decode(), user.pk, event.pk))
+        return elapsed
+
+    def percentile(self, timings, pct):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
@@ -0,0 +1,80 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.contrib.auth.models import AnonymousUser
+from django.utils import timezone
+from datetime import timedelta
+from events import search
+from events.models import Event
+from events.views import search_events
+
+
+class Rollback(Exception):
+    pass
+
+
+# a vocabulary with word frequencies falling off as in natural text
+VOCABULARY = ['%s%s' % (prefix, suffix) for prefix in (
+    'rugby hockey dinner party launch meetup concert festival workshop social quiz gala charity auction brunch '
+    'picnic lecture tour hike swim market fair wedding reunion').split() for suffix in ('', 's', 'er', 'ing', 'day',
+    'night', 'club', 'team', 'hall', 'park', 'week', 'fest', 'time', 'side', 'land', 'town', 'cup', 'run', 'way', 'line')]
+WEIGHTS = [1 / rank for rank in range(1, len(VOCABULARY) + 1)]
+
+
+def words(count):
+    return ' '.join(random.choices(VOCABULARY, WEIGHTS, k=count))
+
+
+# Times the search endpoint with --events events in the index. Everything is
+# created inside a transaction that is rolled back at the end, so the command
+# can be pointed at a development database.
+#   python manage.py benchmark_search --events 1000000 --samples 200
+class Command(BaseCommand):
+    help = 'Benchmark the event search endpoint on a large index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1000000)
+        parser.add_argument('--samples', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.create_events(options['events'], options['batch_size'])
+                view = search_events
+                factory = RequestFactory()
+                self.stdout.write('%-24s %12s %12s %12s' % ('query', 'p50 ms', 'p95 ms', 'max ms'))
+                for label, make_query in (
+                        ('common word', lambda: VOCABULARY[random.randrange(5)]),
+                        ('any word', lambda: words(1)),
+                        ('two words', lambda: words(2)),
+                        ('prefix', lambda: words(1)[:3]),
+                        ('rare title', lambda: 'benchmark%d' % random.randrange(options['events']))):
+                    timings = []
+                    for _ in range(options['samples']):
+                        request = factory.get('/events/search', {'q': make_query()})
+                        request.user = AnonymousUser()
+                        start = time.perf_counter()
+                        view(request)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    ordered = sorted(timings)
+                    self.stdout.write('%-24s %12.3f %12.3f %12.3f' % (
+                        label, statistics.median(ordered), ordered[int(len(ordered) * 0.95)], ordered[-1]))
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def create_events(self, count, batch_size):
+        day = timezone.now().date() + timedelta(days=30)
+        start = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            events = Event.objects.bulk_create([
+                Event(title='benchmark%d %s' % (i, words(2)), description=words(12), date=day, publish=i % 2 == 0)
+                for i in range(offset, min(offset + batch_size, count))])
+            # bulk_create sends no signals
+            search.reindex(events)
+        self.stdout.write('%d events indexed in %.1fs' % (count, time.perf_counter() - start))
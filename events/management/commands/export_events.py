@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from events import bulk
+
+
+# Writes every event, or with --tasks every task, as CSV or JSON Lines to
+# --output (stdout by default) in a form import_events reads back. Rows are
+# read --chunk-size at a time, so memory does not grow with the table.
+#   python manage.py export_events --output events.csv
+#   python manage.py export_events --tasks --format jsonl > tasks.jsonl
+class Command(BaseCommand):
+    help = 'Export events or tasks as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', action='store_true', help='export tasks instead of events')
+        parser.add_argument('--output', help='by default stdout')
+        parser.add_argument('--format', choices=bulk.FORMATS, help='by default taken from the output extension, csv otherwise')
+        parser.add_argument('--chunk-size', type=int, default=bulk.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        format = options['format'] or bulk.format_for(output or '')
+        export = bulk.export_tasks if options['tasks'] else bulk.export_events
+        lines = export(format, chunk_size=options['chunk_size'])
+        if output is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(output, 'w', newline='', encoding='utf-8') as stream:
+            stream.writelines(lines)
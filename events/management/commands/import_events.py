@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from events import bulk
+
+
+# Imports events, or with --tasks tasks, from a CSV or JSON Lines file (or - for
+# stdin), see events.bulk for the columns. Invalid rows are reported with their
+# line number and skipped, the valid ones are inserted --batch-size at a time.
+# Tasks are matched to events by title, so import the events first.
+#   python manage.py import_events events.csv
+#   python manage.py import_events --tasks tasks.jsonl --dry-run
+class Command(BaseCommand):
+    help = 'Import events or tasks from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--tasks', action='store_true', help='import tasks instead of events')
+        parser.add_argument('--format', choices=bulk.FORMATS, help='by default taken from the file extension, csv otherwise')
+        parser.add_argument('--batch-size', type=int, default=bulk.BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='validate and report without keeping anything')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or bulk.format_for(path)
+        run = bulk.import_tasks if options['tasks'] else bulk.import_events
+        try:
+            if path == '-':
+                result = run(sys.stdin, format, options['batch_size'], options['dry_run'])
+            else:
+                with open(path, newline='', encoding='utf-8') as stream:
+                    result = run(stream, format, options['batch_size'], options['dry_run'])
+        except OSError as e:
+            raise CommandError(e)
+        for line, message in result.errors:
+            self.stderr.write('line %d: %s' % (line, message))
+        self.stdout.write('%d %s %s, %d rows with errors' % (
+            result.created, 'tasks' if options['tasks'] else 'events',
+            'would be imported' if options['dry_run'] else 'imported', len(result.errors)))
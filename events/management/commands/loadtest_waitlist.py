@@ -0,0 +1,93 @@
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+from datetime import timedelta
+from events.models import Event, RegisteredEvent
+
+
+# Registers --registrations users for one event of --capacity spots from
+# --threads threads at once, then cancels --cancellations of the admitted
+# registrations, also concurrently, and checks the event was never
+# oversubscribed and the waitlist took up every spot that was given back, in order.
+# Fails with an error if it was not. The load test users and event are deleted
+# afterwards.
+#   python manage.py loadtest_waitlist --registrations 5000 --capacity 200 --threads 32
+class Command(BaseCommand):
+    help = 'Load test registrations and cancellations against the waitlist'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registrations', type=int, default=2000)
+        parser.add_argument('--capacity', type=int, default=100)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--cancellations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        day = timezone.now().date() + timedelta(days=30)
+        event = Event.objects.create(title='loadtest-waitlist', description='load test', date=day, capacity=options['capacity'])
+        users = User.objects.bulk_create([User(username='loadtest-waitlist-%d' % i, email='loadtest-waitlist-%d@example.com' % i)
+            for i in range(options['registrations'])])
+        try:
+            elapsed, errors = self.run(options['threads'], users, lambda user: RegisteredEvent.objects.register(user, event))
+            self.stdout.write('%d registrations in %.2fs (%.1f/s), %d errors' % (
+                len(users), elapsed, len(users) / elapsed, errors))
+            self.check_event(event, options['capacity'], len(users) - errors)
+            admitted = list(event.registeredevent_set.filter(status=RegisteredEvent.Status.ADMITTED).select_related('member'))
+            cancelled = random.sample([registration.member for registration in admitted], min(options['cancellations'], len(admitted)))
+            waitlist = list(event.registeredevent_set.filter(status=RegisteredEvent.Status.WAITLISTED).order_by('pk').values_list('pk', flat=True))
+            elapsed, errors = self.run(options['threads'], cancelled, lambda user: RegisteredEvent.objects.cancel(user, event.pk))
+            self.stdout.write('%d cancellations in %.2fs, %d errors' % (len(cancelled), elapsed, errors))
+            self.check_event(event, options['capacity'], event.registeredevent_set.count())
+            # the freed spots went to the head of the waitlist
+            promoted = set(event.registeredevent_set.filter(pk__in=waitlist, status=RegisteredEvent.Status.ADMITTED).values_list('pk', flat=True))
+            if promoted != set(waitlist[:len(promoted)]):
+                raise CommandError('the waitlist was not admitted in order')
+        finally:
+            event.delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def run(self, threads, items, action):
+        pending = iter(items)
+        lock = threading.Lock()
+        errors = []
+
+        def worker():
+            close_old_connections()
+            while True:
+                with lock:
+                    item = next(pending, None)
+                if item is None:
+                    break
+                try:
+                    action(item)
+                except OperationalError:
+                    # "database is locked" once SQLite's busy timeout has run out
+                    errors.append(item)
+            connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - start, len(errors)
+
+    def check_event(self, event, capacity, registrations):
+        event.refresh_from_db()
+        admitted = event.registeredevent_set.filter(status=RegisteredEvent.Status.ADMITTED).count()
+        waitlisted = event.registeredevent_set.filter(status=RegisteredEvent.Status.WAITLISTED).count()
+        self.stdout.write('%d admitted, %d waitlisted, registered_count %d, capacity %d' % (
+            admitted, waitlisted, event.registered_count, capacity))
+        if admitted > capacity:
+            raise CommandError('oversubscribed: %d admitted for %d spots' % (admitted, capacity))
+        if event.registered_count != admitted:
+            raise CommandError('registered_count is %d, %d are admitted' % (event.registered_count, admitted))
+        if admitted + waitlisted != registrations:
+            raise CommandError('%d registrations stored, %d were made' % (admitted + waitlisted, registrations))
+        if waitlisted and admitted < capacity:
+            raise CommandError('%d spots left with %d waiting' % (capacity - admitted, waitlisted))
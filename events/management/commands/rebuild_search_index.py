@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from events import search
+
+
+# Rebuilds the event search index from events_event, after events were written
+# around the model (bulk_create, raw SQL, a restored backup).
+#   python manage.py rebuild_search_index
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = search.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write('%d events indexed' % count)
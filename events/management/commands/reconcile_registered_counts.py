@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from events.feed import feed_changed
+from events.models import Event
+
+
+# Recounts Event.registered_count from the RegisteredEvent rows, for counters
+# that drifted through registrations written around RegisteredEventManager
+# (bulk_create, raw SQL, restored backups). Only events whose counter is wrong
+# are updated.
+#   python manage.py reconcile_registered_counts --dry-run
+class Command(BaseCommand):
+    help = 'Correct the registered_count of events whose counter has drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='report the drifted events without correcting them')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            drifted = Event.objects.all().drifted_registered_counts()
+            for pk, title, stored, counted in drifted.values_list('pk', 'title', 'registered_count', 'counted'):
+                self.stdout.write('%s (%d): %d stored, %d registered' % (title, pk, stored, counted))
+            self.stdout.write('%d events to correct' % len(drifted))
+            return
+        corrected = Event.objects.all().reconcile_registered_counts()
+        if corrected:
+            feed_changed()
+        self.stdout.write('%d events corrected' % corrected)
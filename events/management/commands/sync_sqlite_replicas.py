@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Copies the primary SQLite database into the SQLite files configured as read
+# replicas (DATABASE_REPLICAS), so replica routing can be tried locally. The copy
+# is a snapshot: run it again to let the replicas catch up.
+#   DATABASE_REPLICAS=replica1.sqlite3,replica2.sqlite3 python manage.py sync_sqlite_replicas
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the SQLite read replicas'
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('the primary database is not SQLite')
+        replicas = [alias for alias in settings.REPLICA_DATABASES if connections[alias].vendor == 'sqlite']
+        if not replicas:
+            raise CommandError('no SQLite replicas are configured, see DATABASE_REPLICAS')
+        primary.ensure_connection()
+        for alias in replicas:
+            # the replica's own connection would block the copy
+            connections[alias].close()
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write('%s: copied to %s' % (alias, connections[alias].settings_dict['NAME']))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+def remove_duplicate_registrations(apps, schema_editor):
+    # keep the first registration of each (member, event) pair so the
+    # unique constraint can be created on existing databases
+    RegisteredEvent = apps.get_model('events', 'RegisteredEvent')
+    seen = set()
+    duplicates = []
+    for pk, member_id, event_id in RegisteredEvent.objects.order_by('pk').values_list('pk', 'member_id', 'event_id').iterator():
+        if member_id is None or event_id is None:
+            continue
+        if (member_id, event_id) in seen:
+            duplicates.append(pk)
+        else:
+            seen.add((member_id, event_id))
+    RegisteredEvent.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0029_alter_event_date_alter_task_deadline'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_registrations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='registeredevent',
+            constraint=models.UniqueConstraint(fields=('member', 'event'), name='unique_member_event'),
+        ),
+    ]
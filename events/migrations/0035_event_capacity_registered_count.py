@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_registrations(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    RegisteredEvent = apps.get_model('events', 'RegisteredEvent')
+    Event.objects.update(registered_count=Coalesce(Subquery(RegisteredEvent.objects
+        .filter(event=OuterRef('pk')).order_by().values('event').annotate(total=Count('pk')).values('total')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0034_person_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='registered_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_registrations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0035_event_capacity_registered_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registeredevent',
+            name='status',
+            field=models.CharField(choices=[('admitted', 'Admitted'), ('waitlisted', 'Waitlisted')], default='admitted', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='registeredevent',
+            index=models.Index(fields=['event', 'status', 'id'], name='events_regi_event_i_16e4c8_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # see events.search; no foreign key, so flushing events_event is not blocked,
+    # the search only returns ids that are still in events_event. Prefixes up to 8
+    # characters are indexed, longer ones read every term they start
+    connection = schema_editor.connection
+    Event = apps.get_model('events', 'Event')
+    rows = list(Event.objects.using(connection.alias).values_list('id', 'title', 'description'))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "CREATE VIRTUAL TABLE events_event_fts USING fts5("
+                "title, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6 7 8')")
+            cursor.executemany('INSERT INTO events_event_fts (rowid, title, description) VALUES (%s, %s, %s)', rows)
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                'CREATE TABLE events_event_search ('
+                'event_id bigint PRIMARY KEY, '
+                'document tsvector NOT NULL)')
+            cursor.execute('CREATE INDEX events_event_search_document ON events_event_search USING gin (document)')
+            cursor.executemany(
+                'INSERT INTO events_event_search (event_id, document) VALUES (%s, '
+                "setweight(to_tsvector('english', %s), 'A') || setweight(to_tsvector('english', %s), 'B'))", rows)
+
+
+def drop_search_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        if schema_editor.connection.vendor == 'sqlite':
+            cursor.execute('DROP TABLE IF EXISTS events_event_fts')
+        elif schema_editor.connection.vendor == 'postgresql':
+            cursor.execute('DROP TABLE IF EXISTS events_event_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0036_registeredevent_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,11 +1,108 @@
+import secrets
+import uuid
+from asgiref.sync import sync_to_async
 from django.db import models
 from django.contrib.auth.models import User
-from datetime import date
+from datetime import date, timedelta
+from django.db import IntegrityError, router, transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 
+# NOT field, written with Case/When so it works on every database
+def flipped(field):
+   return Case(When(**{field: True}, then=Value(False)), default=Value(True))
+
+# Flip a boolean column of the rows in queryset with a single UPDATE (no read-modify-save,
+# so concurrent toggles cannot overwrite each other) and return the new value, read back
+# inside the same transaction. Other columns can be changed in the same UPDATE.
+# Returns None when no row matched.
+def toggle_flag(queryset, field, **changes):
+   # the UPDATE and the read back run on the database that takes writes
+   queryset = queryset.using(router.db_for_write(queryset.model))
+   with transaction.atomic(using=queryset.db):
+      if not queryset.update(**{field: flipped(field)}, **changes):
+         return None
+      return queryset.values_list(field, flat=True).first()
+
+# the number of admitted registrations of the outer event
+def registration_count():
+   return Coalesce(Subquery(RegisteredEvent.objects
+      .filter(event=OuterRef('pk'), status=RegisteredEvent.Status.ADMITTED).order_by().values('event').annotate(total=Count('pk')).values('total')), 0)
+
+# the dashboard counts a bucket's events up to this many, and shows more as "1000+"
+DASHBOARD_COUNT_LIMIT = 1000
+
+# Events a user can manage, the date buckets shown on the events dashboard and
+# version changes for cached fragments
+class EventQuerySet(models.QuerySet):
+   def visible_to(self, user, admin=False):
+      # admins manage every event, other users only the events they authored
+      if admin:
+         return self
+      return self.filter(author=user)
+
+   def touch(self, **changes):
+      # give these events a new version, together with any other changes in the same UPDATE,
+      # so fragments cached for the old version are no longer used; the authors' calendar
+      # feeds show the events' tasks and change with them
+      CalendarFeed.objects.filter(user__in=self.values('author')).changed()
+      return self.update(version=uuid.uuid4(), **changes)
+
+   async def atouch(self, **changes):
+      await CalendarFeed.objects.filter(user__in=self.values('author')).achanged()
+      return await self.aupdate(version=uuid.uuid4(), **changes)
+
+   def with_spots(self):
+      # events that can take another registration
+      return self.filter(Q(capacity__isnull=True) | Q(registered_count__lt=F('capacity')))
+
+   def drifted_registered_counts(self):
+      # these events whose counter does not match their registrations, with the
+      # registrations counted as "counted"
+      return self.annotate(counted=registration_count()).exclude(registered_count=F('counted'))
+
+   def reconcile_registered_counts(self):
+      # recount the drifted events, returns the number of events corrected
+      drifted = list(self.drifted_registered_counts().values_list('pk', flat=True))
+      return self.model.objects.filter(pk__in=drifted).update(registered_count=registration_count())
+
+   def dashboard(self, today):
+      # past events, events within a week and events over a week away: the first event of
+      # each bucket in (date, id) order, as the listings show them, and the bucket sizes up
+      # to DASHBOARD_COUNT_LIMIT, in one query. Every bucket is read as a date range on the
+      # (date, id) indexes and no further than the limit, however many events there are.
+      week = today + timedelta(days=7)
+      buckets = {
+         'past': self.filter(date__lt=today),
+         'week': self.filter(date__gte=today, date__lte=week),
+         'future': self.filter(date__gt=week),
+      }
+      first = Q()
+      counts = {}
+      for name, bucket in buckets.items():
+         first |= Q(pk=Subquery(bucket.order_by('date', 'id').values('pk')[:1]))
+         sql, params = bucket.order_by().values('pk')[:DASHBOARD_COUNT_LIMIT + 1].query.sql_with_params()
+         counts[name + '_count'] = RawSQL('SELECT COUNT(*) FROM (%s)' % sql, params)
+      # no rows when there are no events at all
+      events = list(self.model.objects.filter(first).annotate(**counts))
+      totals = {name + '_count': getattr(events[0], name + '_count') if events else 0 for name in buckets}
+      firsts = {
+         'past': next((event for event in events if event.date < today), None),
+         'week': next((event for event in events if today <= event.date <= week), None),
+         'future': next((event for event in events if event.date > week), None),
+      }
+      return {name: {
+         'count': min(totals[name + '_count'], DASHBOARD_COUNT_LIMIT),
+         'more': totals[name + '_count'] > DASHBOARD_COUNT_LIMIT,
+         'first': firsts[name],
+      } for name in buckets}
+
 #Event
 class Event(models.Model):
  title = models.CharField(blank=False, max_length = 128, unique=True)
@@ -13,6 +110,26 @@ class Event(models.Model):
  date = models.DateField(blank=False, validators=[MinValueValidator(limit_value=date.today)])
  publish = models.BooleanField(default=False, null=False)
  author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=False)
+ # changes whenever the event or its tasks change, used in cache keys
+ version = models.UUIDField(default=uuid.uuid4, editable=False)
+ # empty for no limit
+ capacity = models.PositiveIntegerField(null=True, blank=True)
+ # number of admitted registrations, kept by RegisteredEventManager and the
+ # registration signals, see the reconcile_registered_counts command
+ registered_count = models.PositiveIntegerField(default=0, editable=False)
+
+ objects = EventQuerySet.as_manager()
+
+ def save(self, *args, **kwargs):
+   self.version = uuid.uuid4()
+   if kwargs.get('update_fields') is None and not self._state.adding and not kwargs.get('force_insert'):
+      # registered_count is only written by the conditional UPDATEs of RegisteredEventManager,
+      # an edit of an instance loaded before the latest registrations must not overwrite it
+      kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+         if not field.primary_key and field.name != 'registered_count']
+   elif kwargs.get('update_fields') is not None:
+      kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+   super().save(*args, **kwargs)
 
  def clean(self):
    e_date = self.date
@@ -21,15 +138,24 @@ class Event(models.Model):
       raise ValidationError("Cannot publish event in the past")
    return e_date
 
+ @property
+ def spots_left(self):
+   if self.capacity is None:
+      return None
+   return max(self.capacity - self.registered_count, 0)
+
  def __str__(self): 
    return self.title
 
  class Meta:
-   indexes = [models.Index(fields=['title'])]
-   indexes = [models.Index(fields=['description'])]
-   indexes = [models.Index(fields=['date'])]
-   indexes = [models.Index(fields=['publish'])]
-   indexes = [models.Index(fields=['author'])]
+   indexes = [
+      # listings and cursors ordered by (date, id)
+      models.Index(fields=['date', 'id']),
+      # a user's own events within a date range
+      models.Index(fields=['author', 'date']),
+      # the public feed only ever reads published events
+      models.Index(fields=['date', 'id'], condition=Q(publish=True), name='events_event_published_idx'),
+   ]
 
 # Person
 class Person(models.Model):
@@ -38,6 +164,12 @@ class Person(models.Model):
  def __str__(self): 
     return self.name
 
+ class Meta:
+   indexes = [
+      # the person autocomplete reads names in order
+      models.Index(fields=['name']),
+   ]
+
 # Task
 class Task(models.Model):
  title = models.CharField(blank=False, max_length = 128)
@@ -59,10 +191,85 @@ class Task(models.Model):
  def __str__(self): 
     return self.title
 
+ class Meta:
+   indexes = [
+      # an event's tasks in deadline order
+      models.Index(fields=['event', 'deadline']),
+   ]
+
+# Registering a member to an event, one lookup on the (member, event) index
+# and an insert only when the member is not registered yet.
+#
+# A registration is admitted while the event has spots left and nobody is
+# waiting, otherwise it joins the event's waitlist, served in registration
+# order. The spot is claimed with a conditional UPDATE of the event's
+# registered_count, so concurrent registrations cannot take the event over its
+# capacity; a spot given back by a cancellation goes to the head of the waitlist
+# in the same transaction (see events.signals).
+class RegisteredEventManager(models.Manager):
+   def register(self, member, event):
+      registration = self.filter(member=member, event=event).first()
+      if registration is not None:
+         return registration, False
+      try:
+         with transaction.atomic(using=router.db_for_write(self.model)):
+            waiting = self.filter(event=OuterRef('pk'), status=RegisteredEvent.Status.WAITLISTED)
+            admitted = (Event.objects.filter(pk=event.pk).with_spots().filter(~Exists(waiting))
+               .update(registered_count=F('registered_count') + 1))
+            status = RegisteredEvent.Status.ADMITTED if admitted else RegisteredEvent.Status.WAITLISTED
+            return self.create(member=member, event=event, status=status), True
+      except IntegrityError:
+         # a concurrent request registered the member first, and counted it; the
+         # unique constraint failed the insert and this spot is given back by the rollback
+         return self.get(member=member, event=event), False
+
+   async def aregister(self, member, event):
+      return await sync_to_async(self.register)(member, event)
+
+   def cancel(self, member, event_id):
+      # the post_delete receiver hands an admitted registration's spot on
+      deleted, _ = self.filter(member=member, event_id=event_id).delete()
+      return bool(deleted)
+
+   def release_spot(self, event_id):
+      Event.objects.filter(pk=event_id, registered_count__gt=0).update(registered_count=F('registered_count') - 1)
+      return self.admit_waitlisted(event_id)
+
+   def admit_waitlisted(self, event_id):
+      # admit waitlisted registrations in order while the event has spots left,
+      # returns the number admitted
+      admitted = 0
+      while True:
+         with transaction.atomic(using=router.db_for_write(self.model)):
+            if not Event.objects.filter(pk=event_id).with_spots().update(registered_count=F('registered_count') + 1):
+               return admitted
+            # a concurrent admission skips the head of the waitlist this one has locked
+            head = (self.select_for_update(skip_locked=True)
+               .filter(event_id=event_id, status=RegisteredEvent.Status.WAITLISTED).order_by('pk').first())
+            if head is None:
+               # nobody is waiting, the claimed spot is rolled back
+               transaction.set_rollback(True)
+               return admitted
+            self.filter(pk=head.pk).update(status=RegisteredEvent.Status.ADMITTED)
+            CalendarFeed.objects.filter(user=head.member_id).changed()
+         admitted += 1
+
+   def waitlist_position(self, registration):
+      # 1 for the head of the waitlist
+      return self.filter(event_id=registration.event_id, status=RegisteredEvent.Status.WAITLISTED, pk__lte=registration.pk).count()
+
 # Modeling people registering to events
 class RegisteredEvent(models.Model):
+   class Status(models.TextChoices):
+      ADMITTED = 'admitted', 'Admitted'
+      WAITLISTED = 'waitlisted', 'Waitlisted'
+
    member = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=False)
    event = models.ForeignKey(Event, on_delete=models.CASCADE, null=True, blank=False)
+   # admitted registrations hold one of the event's spots (Event.registered_count)
+   status = models.CharField(max_length=10, choices=Status.choices, default=Status.ADMITTED)
+
+   objects = RegisteredEventManager()
 
    def clean(self):
       e_date = self.event.date
@@ -70,4 +277,40 @@ class RegisteredEvent(models.Model):
          raise ValidationError("Cannot register for an event in the past!")
       return e_date
 
+   class Meta:
+      constraints = [
+         models.UniqueConstraint(fields=['member', 'event'], name='unique_member_event'),
+      ]
+      indexes = [
+         # an event's waitlist in registration order
+         models.Index(fields=['event', 'status', 'id']),
+      ]
+
+
+
+
+def calendar_token():
+   return secrets.token_urlsafe(32)
+
+class CalendarFeedQuerySet(models.QuerySet):
+   def for_events(self, events):
+      # the feeds that show these events: their authors' and their registrants'
+      return self.filter(Q(user__in=events.values('author')) | Q(user__in=RegisteredEvent.objects.filter(event__in=events).values('member')))
+
+   def changed(self):
+      # a new version, so the next poll of these feeds gets the new calendar
+      return self.update(version=uuid.uuid4(), modified=timezone.now())
+
+   async def achanged(self):
+      return await self.aupdate(version=uuid.uuid4(), modified=timezone.now())
+
+# A user's calendar subscription (see events.calendar), read by calendar apps
+# through the secret token in its URL. version and modified change whenever the
+# calendar would change, and are the feed's ETag and Last-Modified.
+class CalendarFeed(models.Model):
+   user = models.OneToOneField(User, on_delete=models.CASCADE)
+   token = models.CharField(max_length=64, unique=True, default=calendar_token)
+   version = models.UUIDField(default=uuid.uuid4)
+   modified = models.DateTimeField(default=timezone.now)
 
+   objects = CalendarFeedQuerySet.as_manager()
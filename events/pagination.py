@@ -0,0 +1,101 @@
+import base64
+import binascii
+from datetime import date
+
+from django.db.models import Q
+from django.http import JsonResponse
+from django.shortcuts import render
+
+# Keyset (cursor) pagination for event listings ordered by (date, id).
+# A cursor is the (date, id) of the last event on the previous page, so each page
+# is a range scan on the (date, id) index and a deep page costs the same as the first.
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+# largest BigAutoField id, bigger ones cannot be bound as a query parameter
+MAX_ID = 2 ** 63 - 1
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(event):
+    position = '%s:%d' % (event.date.isoformat(), event.pk)
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    # like Paginator.get_page, a missing or malformed cursor gives the first page
+    if not cursor:
+        return None
+    try:
+        position = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        day, pk = position.split(':')
+        day, pk = date.fromisoformat(day), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not 0 <= pk <= MAX_ID:
+        return None
+    return day, pk
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('size', PAGE_SIZE))
+    except ValueError:
+        return PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_page(queryset, cursor=None, size=PAGE_SIZE):
+    position = decode_cursor(cursor)
+    queryset = queryset.order_by('date', 'id')
+    if position is not None:
+        day, pk = position
+        # (date, id) > (day, pk), written with a leading date range so the index is used
+        queryset = queryset.filter(date__gte=day).filter(Q(date__gt=day) | Q(id__gt=pk))
+    # one extra row tells whether there is a next page without a COUNT query
+    items = list(queryset[:size + 1])
+    next_cursor = encode_cursor(items[size - 1]) if len(items) > size else None
+    return KeysetPage(items[:size], next_cursor, cursor if position is not None else None)
+
+
+def page_json(page):
+    return {
+        'events': [
+            {
+                'id': event.id,
+                'title': event.title,
+                'description': event.description,
+                'date': event.date.isoformat(),
+                'publish': event.publish,
+            }
+            for event in page
+        ],
+        'next_cursor': page.next_cursor,
+    }
+
+
+def paginated_response(request, queryset, template, context):
+    # the HTML page and its ?format=json variant read the same cursor
+    page = keyset_page(queryset, request.GET.get('cursor'), page_size(request))
+    if request.GET.get('format') == 'json':
+        return JsonResponse(page_json(page))
+    context['events_list'] = page
+    context['next_cursor'] = page.next_cursor
+    context['cursor'] = page.cursor
+    return render(request, template, context)
@@ -0,0 +1,54 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
+from django.db import transaction
+
+ADMIN_GROUP = 'EventsAdminUsers'
+# bounds how long another process can use an old value with the per-process cache
+ADMIN_CACHE_TIMEOUT = 60 * 5
+
+# Whether a user is an events admin is resolved once per request (memoised on the
+# user object, like ModelBackend's permission caches) and shared across requests
+# through the cache. events.signals clears the cached value when group membership
+# changes, and again once the change is committed, in case a request read the old
+# membership in between. Other worker processes see the change at once only with a
+# shared cache (see EventPlanner.caches); with the per-process default they keep
+# the old value for up to ADMIN_CACHE_TIMEOUT.
+
+def admin_cache_key(user):
+    # the join date keeps a reused SQLite id from inheriting a deleted user's entry
+    return 'events:is_admin:%s:%s' % (user.pk, user.date_joined.timestamp())
+
+
+def is_admin(user):
+    if not user.is_authenticated:
+        return False
+    if not hasattr(user, '_events_admin_cache'):
+        key = admin_cache_key(user)
+        admin = cache.get(key)
+        if admin is None:
+            admin = user.groups.filter(name=ADMIN_GROUP).exists()
+            cache.set(key, admin, ADMIN_CACHE_TIMEOUT)
+        user._events_admin_cache = admin
+    return user._events_admin_cache
+
+
+def clear_admin_cache(users):
+    keys = [admin_cache_key(user) for user in users]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+    for user in users:
+        user.__dict__.pop('_events_admin_cache', None)
+
+
+# LoginRequiredMixin for views with async handlers. The user is loaded from the
+# session in a thread, the ORM cannot run in the event loop.
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    def dispatch(self, request, *args, **kwargs):
+        return self.adispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return self.handle_no_permission()
+        # skips LoginRequiredMixin.dispatch, the user has been checked
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from collections import defaultdict
+from datetime import date
+
+from django.utils import formats
+
+# In-process publish/subscribe for the live event pages. Subscribers are async
+# (the SSE stream in EventStreamView) and each gets its own bounded queue on its
+# event loop; publish() can be called from any thread. A subscriber that falls
+# more than QUEUE_SIZE messages behind gets a single "reset" message instead,
+# telling the page to reload its task list.
+#
+# Messages only reach subscribers in the same process, a deployment with several
+# processes needs a shared broker in place of this module.
+
+QUEUE_SIZE = 100
+
+_subscriptions = defaultdict(set)
+_lock = threading.Lock()
+
+
+class Subscription:
+    def __init__(self, channel):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, message):
+        # runs on the subscriber's loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self):
+        if not self.overflowed:
+            message = await self.queue.get()
+            if not self.overflowed:
+                return message
+        # drop what is queued, the reset replaces it
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.overflowed = False
+        return {'type': 'reset'}
+
+
+def subscribe(channel):
+    subscription = Subscription(channel)
+    with _lock:
+        _subscriptions[channel].add(subscription)
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _lock:
+        subscriptions = _subscriptions.get(subscription.channel)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del _subscriptions[subscription.channel]
+
+
+def subscriber_count(channel):
+    with _lock:
+        return len(_subscriptions.get(channel, ()))
+
+
+def publish(channel, message):
+    with _lock:
+        subscriptions = list(_subscriptions.get(channel, ()))
+    for subscription in subscriptions:
+        try:
+            subscription.loop.call_soon_threadsafe(subscription.put, message)
+        except RuntimeError:
+            # the subscriber's loop has closed
+            unsubscribe(subscription)
+
+
+#----------- EVENT CHANNELS -----------#
+
+# one channel per event; messages carry only what changed, the page applies them in place
+
+def event_channel(event_id):
+    return 'event:%s' % event_id
+
+
+def display_date(value):
+    # as the templates show it
+    return formats.date_format(value) if isinstance(value, date) else str(value)
+
+
+def publish_task(event_id, action, task_id, **fields):
+    if 'deadline' in fields:
+        fields['deadline'] = display_date(fields['deadline'])
+    publish(event_channel(event_id), {'type': 'task', 'action': action, 'task': {'id': task_id, **fields}})
+
+
+def publish_event(event_id, action, **fields):
+    if 'date' in fields:
+        fields['date'] = display_date(fields['date'])
+    publish(event_channel(event_id), {'type': 'event', 'action': action, 'event': {'id': event_id, **fields}})
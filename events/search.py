@@ -0,0 +1,145 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Event
+
+# Full-text search over event titles and descriptions.
+#
+# The inverted index lives next to events_event: an FTS5 table on SQLite, a
+# tsvector table with a GIN index on PostgreSQL, both created by migration 0037
+# and keyed by the event id. Titles weigh more than descriptions in the ranking
+# and the last search term is matched as a prefix, so "rugby par" finds "Rugby
+# Party" as it is typed; prefixes of 2 to 8 characters are indexed on SQLite.
+# Only the newest MAX_CANDIDATES matches are ranked.
+# events.signals keeps the index in step with saved and deleted events; rows
+# written around the model (bulk_create, raw SQL) need reindex() or the
+# rebuild_search_index command.
+#
+# Other databases fall back to icontains, which scans the table.
+
+SQLITE_TABLE = 'events_event_fts'
+POSTGRES_TABLE = 'events_event_search'
+POSTGRES_CONFIG = 'english'
+# bm25 weights of the title and description columns
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+MAX_TERMS = 8
+# only the newest matches are ranked, which bounds the work for common words
+MAX_CANDIDATES = 2000
+
+
+def terms(query):
+    # words only, FTS5 and tsquery operators in the query are not passed on
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def is_indexed(connection):
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+#----------- INDEX -----------#
+
+def reindex(events, using=None):
+    # (re)writes the index rows of these events, an iterable of Event or of
+    # (id, title, description)
+    connection = connections[using or router.db_for_write(Event)]
+    if not is_indexed(connection):
+        return
+    rows = [(event.pk, event.title, event.description) if isinstance(event, Event) else tuple(event) for event in events]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.executemany('DELETE FROM %s WHERE rowid = %%s' % SQLITE_TABLE, [(pk,) for pk, title, description in rows])
+            cursor.executemany('INSERT INTO %s (rowid, title, description) VALUES (%%s, %%s, %%s)' % SQLITE_TABLE, rows)
+        else:
+            cursor.executemany(
+                'INSERT INTO {table} (event_id, document) VALUES (%s, '
+                "setweight(to_tsvector('{config}', %s), 'A') || setweight(to_tsvector('{config}', %s), 'B')) "
+                'ON CONFLICT (event_id) DO UPDATE SET document = EXCLUDED.document'.format(table=POSTGRES_TABLE, config=POSTGRES_CONFIG),
+                rows)
+
+
+def unindex(event_ids, using=None):
+    connection = connections[using or router.db_for_write(Event)]
+    if not is_indexed(connection):
+        return
+    column = 'rowid' if connection.vendor == 'sqlite' else 'event_id'
+    table = SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE
+    with connection.cursor() as cursor:
+        cursor.executemany('DELETE FROM %s WHERE %s = %%s' % (table, column), [(pk,) for pk in event_ids])
+
+
+def rebuild(using=None, chunk_size=2000):
+    # the whole index from events_event, returns the number of events indexed
+    using = using or router.db_for_write(Event)
+    connection = connections[using]
+    if not is_indexed(connection):
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s' % (SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE))
+    count = 0
+    chunk = []
+    for row in Event.objects.using(using).order_by().values_list('id', 'title', 'description').iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            reindex(chunk, using)
+            count += len(chunk)
+            chunk = []
+    reindex(chunk, using)
+    return count + len(chunk)
+
+
+#----------- SEARCH -----------#
+
+def search(query, queryset=None, limit=20):
+    # events of queryset matching every term of query, best match first
+    queryset = Event.objects.all() if queryset is None else queryset
+    words = terms(query)
+    if not words:
+        return []
+    connection = connections[queryset.db]
+    if not is_indexed(connection):
+        condition = Q()
+        for word in words:
+            condition &= Q(title__icontains=word) | Q(description__icontains=word)
+        return list(queryset.filter(condition).order_by('-id')[:limit])
+    # the index is joined to queryset's rows in the same query
+    visible, params = queryset.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            ids = sqlite_search(cursor, words, visible, params, limit)
+        else:
+            ids = postgres_search(cursor, words, visible, params, limit)
+    events = queryset.in_bulk(ids)
+    return [events[pk] for pk in ids if pk in events]
+
+
+def sqlite_search(cursor, words, visible, params, limit):
+    # the last word is the one being typed and matches as a prefix
+    match = ' '.join(['"%s"' % word for word in words[:-1]] + ['"%s"*' % words[-1]])
+    # FTS5 reads the matches newest first and stops at the oldest candidate, the
+    # CROSS JOIN keeps it from probing the index once per visible event
+    join = 'FROM {fts} CROSS JOIN ({visible}) visible ON visible.id = {fts}.rowid WHERE {fts} MATCH %s'.format(
+        fts=SQLITE_TABLE, visible=visible)
+    cursor.execute('SELECT {fts}.rowid {join} ORDER BY {fts}.rowid DESC LIMIT 1 OFFSET %s'.format(fts=SQLITE_TABLE, join=join),
+                   [*params, match, MAX_CANDIDATES - 1])
+    row = cursor.fetchone()
+    cursor.execute(
+        'SELECT {fts}.rowid {join} AND {fts}.rowid >= %s ORDER BY bm25({fts}, {title}, {description}), {fts}.rowid DESC LIMIT %s'.format(
+            fts=SQLITE_TABLE, join=join, title=TITLE_WEIGHT, description=DESCRIPTION_WEIGHT),
+        [*params, match, row[0] if row else 0, limit])
+    return [pk for pk, in cursor.fetchall()]
+
+
+def postgres_search(cursor, words, visible, params, limit):
+    match = ' & '.join(words[:-1] + ['%s:*' % words[-1]])
+    cursor.execute(
+        "SELECT event_id FROM (SELECT event_id, document FROM {table}, to_tsquery('{config}', %s) query "
+        'WHERE document @@ query AND event_id IN ({visible}) ORDER BY event_id DESC LIMIT %s) candidates, '
+        "to_tsquery('{config}', %s) query ORDER BY ts_rank_cd(document, query) DESC, event_id DESC LIMIT %s".format(
+            table=POSTGRES_TABLE, config=POSTGRES_CONFIG, visible=visible),
+        [match, *params, MAX_CANDIDATES, match, limit])
+    return [pk for pk, in cursor.fetchall()]
@@ -0,0 +1,81 @@
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from .models import Event, Person, RegisteredEvent, Task
+
+
+# Serializers for the read-only API. Clients can ask for a subset of fields with
+# ?fields=id,title, nested objects are trimmed the same way with dotted names
+# (?fields=id,person.name). Fields listed in expandable_fields are only sent
+# when they are asked for by name.
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    expandable_fields = ()
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            for name in self.expandable_fields:
+                self.fields.pop(name, None)
+        else:
+            self.trim(fields)
+
+    def trim(self, fields):
+        for name in set(self.fields) - {path.split('.', 1)[0] for path in fields}:
+            self.fields.pop(name)
+        for name, field in self.fields.items():
+            nested = {path.split('.', 1)[1] for path in fields if path.startswith(name + '.')}
+            serializer = getattr(field, 'child', field)
+            if nested and isinstance(serializer, DynamicFieldsModelSerializer):
+                serializer.trim(nested)
+
+
+def requested_fields(request):
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def wants(request, name):
+    # whether a field is sent, so views only join and prefetch what is serialized
+    fields = requested_fields(request)
+    return fields is None or any(path == name or path.startswith(name + '.') for path in fields)
+
+
+class PersonSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = Person
+        fields = ['id', 'name']
+
+
+class TaskSerializer(DynamicFieldsModelSerializer):
+    person = PersonSerializer(read_only=True)
+
+    class Meta:
+        model = Task
+        fields = ['id', 'title', 'description', 'deadline', 'complete', 'event', 'person']
+
+
+class EventSerializer(DynamicFieldsModelSerializer):
+    author = serializers.CharField(source='author.username', default=None, read_only=True)
+    tasks = TaskSerializer(source='task_set', many=True, read_only=True)
+    expandable_fields = ('tasks',)
+
+    class Meta:
+        model = Event
+        fields = ['id', 'title', 'description', 'date', 'publish', 'capacity', 'registered_count', 'author', 'version', 'tasks']
+
+    @staticmethod
+    def tasks_prefetch(user, admin):
+        # only the tasks of events the user manages, as /api/v1/tasks/ lists; other
+        # published events are sent with no tasks
+        tasks = Task.objects.filter(event__in=Event.objects.visible_to(user, admin))
+        return Prefetch('task_set', queryset=tasks.select_related('person').order_by('deadline', 'id'))
+
+
+class RegisteredEventSerializer(DynamicFieldsModelSerializer):
+    event = EventSerializer(read_only=True)
+
+    class Meta:
+        model = RegisteredEvent
+        fields = ['id', 'member', 'event', 'status']
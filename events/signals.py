@@ -0,0 +1,203 @@
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .feed import feed_changed
+from .forms import PERSON_CHOICES_CACHE_KEY
+from .models import CalendarFeed, Event, Person, RegisteredEvent, Task
+from .permissions import clear_admin_cache
+from .pubsub import publish_event, publish_task
+from .search import reindex, unindex
+
+
+#----------- ADMIN PERMISSION CACHE -----------#
+
+# user.groups.add()/remove()/clear() send the user as instance, group.user_set.add()
+# and friends send the group with the user ids in pk_set
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            clear_admin_cache([instance])
+    elif action == 'pre_clear':
+        # the members are gone once the clear has run, remember them for post_clear
+        instance._cleared_members = list(instance.user_set.all())
+    elif action == 'post_clear':
+        clear_admin_cache(instance.__dict__.pop('_cleared_members', []))
+    elif action in ('post_add', 'post_remove'):
+        clear_admin_cache(list(User.objects.filter(pk__in=pk_set)))
+
+
+# renaming or deleting a group changes what its members' membership means
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    clear_admin_cache(list(instance.user_set.all()))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    clear_admin_cache([instance])
+
+
+#----------- EVENT VERSIONS -----------#
+
+# a task change shows on its event's page, so the event gets a new version
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def task_changed(sender, instance, origin=None, **kwargs):
+    # tasks deleted along with their event have no page left to refresh
+    if isinstance(origin, Event) or getattr(origin, 'model', None) is Event:
+        return
+    # a queryset or cascade delete sends one signal per task, touch each event once
+    touched = origin.__dict__.setdefault('_touched_events', set()) if origin is not None else set()
+    if instance.event_id in touched:
+        return
+    touched.add(instance.event_id)
+    Event.objects.filter(pk=instance.event_id).touch()
+
+
+# person names are shown in the task lists of every event they are assigned to
+@receiver(post_save, sender=Person)
+def person_changed(sender, instance, created, **kwargs):
+    if not created:
+        Event.objects.filter(task__person=instance).touch()
+
+
+#----------- PUBLIC FEED -----------#
+
+# queryset updates send no signal, PublishEvent calls feed_changed() itself. The
+# version changes once the change is committed: a visitor reading the feed before
+# that would otherwise cache the old rows under the new version.
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def event_feed_changed(sender, instance, **kwargs):
+    transaction.on_commit(feed_changed)
+
+
+#----------- REGISTRATION COUNTS -----------#
+
+# RegisteredEventManager.register() counts new registrations as it claims the
+# spot, deleted ones hand theirs to the head of the waitlist or give it back
+@receiver(post_delete, sender=RegisteredEvent)
+def registration_deleted(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Event) or getattr(origin, 'model', None) is Event:
+        return
+    if instance.status == RegisteredEvent.Status.ADMITTED:
+        RegisteredEvent.objects.release_spot(instance.event_id)
+
+
+# a raised capacity admits the waitlist
+@receiver(post_save, sender=Event)
+def event_capacity_changed(sender, instance, created, **kwargs):
+    if not created and RegisteredEvent.objects.filter(event=instance, status=RegisteredEvent.Status.WAITLISTED).exists():
+        RegisteredEvent.objects.admit_waitlisted(instance.pk)
+
+
+# The public feed shows whether an event is full, so its cached pages are only
+# dropped when an admitted registration fills the event or gives a full event a
+# spot back; the number of spots left it shows can lag by up to FEED_CACHE_TIMEOUT.
+# Other registrations leave the cache alone, a ticket drop would otherwise
+# re-render the feed on almost every request.
+@receiver(post_save, sender=RegisteredEvent)
+@receiver(post_delete, sender=RegisteredEvent)
+def registration_feed_changed(sender, instance, created=None, origin=None, **kwargs):
+    if created is False or instance.status != RegisteredEvent.Status.ADMITTED:
+        return
+    if isinstance(origin, Event) or getattr(origin, 'model', None) is Event:
+        return
+    # events without a capacity are never full, no query when register() passed the event
+    if RegisteredEvent.event.is_cached(instance) and instance.event is not None and instance.event.capacity is None:
+        return
+    # the counter already includes a new registration and excludes a deleted one
+    spots_left = 0 if created else 1
+    if Event.objects.filter(pk=instance.event_id, capacity__isnull=False, registered_count=F('capacity') - spots_left).exists():
+        transaction.on_commit(feed_changed)
+
+
+#----------- LIVE EVENT PAGES -----------#
+
+# subscribers hear about a change once it is committed; queryset updates send no
+# signal, the views that use them publish what they changed themselves
+@receiver(post_save, sender=Task)
+def task_published(sender, instance, created, **kwargs):
+    fields = {
+        'title': instance.title,
+        'description': instance.description,
+        'complete': instance.complete,
+        'deadline': instance.deadline,
+        'person': str(instance.person) if instance.person_id else '',
+    }
+    transaction.on_commit(lambda: publish_task(instance.event_id, 'created' if created else 'updated', instance.pk, **fields))
+
+
+@receiver(post_delete, sender=Task)
+def task_unpublished(sender, instance, origin=None, **kwargs):
+    # the event's own deleted message covers its tasks
+    if isinstance(origin, Event) or getattr(origin, 'model', None) is Event:
+        return
+    event_id, task_id = instance.event_id, instance.pk
+    transaction.on_commit(lambda: publish_task(event_id, 'deleted', task_id))
+
+
+@receiver(post_save, sender=Event)
+def event_published(sender, instance, created, **kwargs):
+    if created:
+        return
+    fields = {
+        'title': instance.title,
+        'description': instance.description,
+        'date': instance.date,
+        'publish': instance.publish,
+    }
+    transaction.on_commit(lambda: publish_event(instance.pk, 'updated', **fields))
+
+
+@receiver(post_delete, sender=Event)
+def event_unpublished(sender, instance, **kwargs):
+    event_id = instance.pk
+    transaction.on_commit(lambda: publish_event(event_id, 'deleted'))
+
+
+#----------- SEARCH INDEX -----------#
+
+@receiver(post_save, sender=Event)
+def event_indexed(sender, instance, update_fields=None, using=None, **kwargs):
+    if update_fields is None or {'title', 'description'} & set(update_fields):
+        reindex([instance], using)
+
+
+@receiver(post_delete, sender=Event)
+def event_unindexed(sender, instance, using=None, **kwargs):
+    unindex([instance.pk], using)
+
+
+#----------- CALENDAR FEEDS -----------#
+
+# task changes reach the authors' feeds through EventQuerySet.touch()
+@receiver(post_save, sender=Event)
+@receiver(pre_delete, sender=Event)
+def event_calendar_changed(sender, instance, **kwargs):
+    # before a delete, while the event's registrations are still there
+    CalendarFeed.objects.for_events(Event.objects.filter(pk=instance.pk)).changed()
+
+
+@receiver(post_save, sender=RegisteredEvent)
+@receiver(post_delete, sender=RegisteredEvent)
+def registration_calendar_changed(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Event) or getattr(origin, 'model', None) is Event:
+        return
+    CalendarFeed.objects.filter(user=instance.member_id).changed()
+
+
+#----------- PERSON CHOICES -----------#
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def person_choices_changed(sender, instance, **kwargs):
+    # again on commit, in case a form read the old people in between
+    cache.delete(PERSON_CHOICES_CACHE_KEY)
+    transaction.on_commit(lambda: cache.delete(PERSON_CHOICES_CACHE_KEY))
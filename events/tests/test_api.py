@@ -0,0 +1,131 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase
+from events.models import Event, Person, RegisteredEvent, Task, User
+from datetime import date, timedelta
+
+
+class APITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user1 = User(username='annacarter', email='anna@surrey.ac.uk')
+        user1.set_password('MyPassword123')
+        user1.save()
+        user2 = User(username='tonysmith', email='tony@surrey.ac.uk')
+        user2.set_password('MyPassword123')
+        user2.save()
+        person = Person.objects.create(name="Tony")
+        for i in range(6):
+            event = Event.objects.create(title='Event %d' % i, description="Location tbc", date=date.today()+timedelta(days=10+i//2), publish=i < 2, author=user1)
+            for j in range(3):
+                Task.objects.create(title='Task %d.%d' % (i, j), description='Task description', deadline=date.today(), event=event, person=person)
+        cls.private_event = Event.objects.create(title='Private event', description="Location tbc", date=date.today()+timedelta(days=10), author=user2)
+        Task.objects.create(title='Private task', description='Task description', deadline=date.today(), event=cls.private_event, person=person)
+        RegisteredEvent.objects.create(event=Event.objects.get(title='Event 0'), member=user1)
+        RegisteredEvent.objects.create(event=Event.objects.get(title='Event 0'), member=user2)
+
+    def setUp(self):
+        # admin flags cached by other tests
+        cache.clear()
+        self.client.login(username='annacarter', password='MyPassword123')
+
+    def walk(self, url, **params):
+        # follow the next links of a cursor paginated list
+        results = []
+        response = self.client.get(url, {'format': 'json', **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            results += data['results']
+            if data['next'] is None:
+                return results
+            response = self.client.get(data['next'])
+
+#----------- RESOURCES -----------#
+
+    ## Test - the API needs a login
+    def test_api_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/v1/events/', {'format': 'json'}).status_code, 403)
+
+    ## Test - events are listed in (date, id) order across cursor pages, without other users' private events
+    def test_events_cursor_pages(self):
+        events = self.walk('/api/v1/events/', size=4)
+        expected = list(Event.objects.exclude(pk=self.private_event.pk).order_by('date', 'id').values_list('id', flat=True))
+        self.assertEqual([event['id'] for event in events], expected)
+
+    ## Test - tasks are only listed for events the user manages
+    def test_tasks_only_managed_events(self):
+        tasks = self.walk('/api/v1/tasks/', size=5)
+        self.assertEqual(len(tasks), 18)
+        self.assertNotIn('Private task', [task['title'] for task in tasks])
+        event = Event.objects.get(title='Event 3')
+        tasks = self.walk('/api/v1/tasks/', event=event.pk)
+        self.assertEqual({task['event'] for task in tasks}, {event.pk})
+
+    ## Test - admins see every event
+    def test_admin_sees_all_events(self):
+        User.objects.get(username='tonysmith').groups.add(Group.objects.create(name='EventsAdminUsers'))
+        self.client.login(username='tonysmith', password='MyPassword123')
+        self.assertEqual(len(self.walk('/api/v1/events/')), 7)
+
+    ## Test - registrations are the user's own
+    def test_registrations_are_own(self):
+        registrations = self.walk('/api/v1/registrations/')
+        self.assertEqual(len(registrations), 1)
+        self.assertEqual(registrations[0]['event']['title'], 'Event 0')
+
+    ## Test - people are listed by name
+    def test_people(self):
+        self.assertEqual(self.walk('/api/v1/people/'), [{'id': Person.objects.get().pk, 'name': 'Tony'}])
+
+#----------- FIELD SELECTION -----------#
+
+    ## Test - ?fields= trims the payload, including nested objects
+    def test_field_selection(self):
+        tasks = self.walk('/api/v1/tasks/', fields='id,person.name')
+        self.assertEqual(set(tasks[0]), {'id', 'person'})
+        self.assertEqual(tasks[0]['person'], {'name': 'Tony'})
+
+    ## Test - tasks are only nested into events when asked for, with a fixed number of queries
+    def test_expand_tasks(self):
+        event = self.walk('/api/v1/events/')[0]
+        self.assertNotIn('tasks', event)
+        self.client.get('/api/v1/events/', {'format': 'json', 'fields': 'id'})
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/v1/events/', {'format': 'json', 'fields': 'id,tasks.title,tasks.person.name'})
+        event = response.json()['results'][0]
+        self.assertEqual(event['tasks'][0], {'title': 'Task 0.0', 'person': {'name': 'Tony'}})
+
+    ## Test - tasks nested into other users' published events are not sent
+    def test_expand_tasks_only_managed_events(self):
+        self.client.login(username='tonysmith', password='MyPassword123')
+        events = self.walk('/api/v1/events/', fields='title,tasks.title')
+        tasks = {event['title']: [task['title'] for task in event['tasks']] for event in events}
+        self.assertEqual(tasks, {'Event 0': [], 'Event 1': [], 'Private event': ['Private task']})
+
+    ## Test - listing tasks with their people is one query for the page
+    def test_tasks_constant_queries(self):
+        self.client.get('/api/v1/tasks/', {'format': 'json'})
+        with self.assertNumQueries(3):
+            self.client.get('/api/v1/tasks/', {'format': 'json', 'size': 18})
+
+#----------- CONDITIONAL GETS -----------#
+
+    ## Test - a matching If-None-Match gets an empty 304
+    def test_etag_not_modified(self):
+        response = self.client.get('/api/v1/events/', {'format': 'json'})
+        etag = response['ETag']
+        response = self.client.get('/api/v1/events/', {'format': 'json'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    ## Test - the ETag changes when a listed event changes
+    def test_etag_changes(self):
+        etag = self.client.get('/api/v1/events/', {'format': 'json'})['ETag']
+        event = Event.objects.get(title='Event 0')
+        event.description = 'Location changed'
+        event.save()
+        response = self.client.get('/api/v1/events/', {'format': 'json'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
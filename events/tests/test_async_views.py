@@ -0,0 +1,60 @@
+from django.test import TestCase
+from events.models import Event, Person, RegisteredEvent, Task, User
+from datetime import date, timedelta
+from django.urls import reverse
+
+
+# The JSON endpoints have async handlers, served here through the ASGI test client
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User(username='annacarter', email='anna@surrey.ac.uk')
+        cls.user1.set_password('MyPassword123')
+        cls.user1.save()
+        cls.event = Event.objects.create(title='Rugby Party', description="Location tbc", date=date.today()+timedelta(days=10), author=cls.user1)
+        cls.task = Task.objects.create(title='Book the venue', description='Task description', deadline=date.today(), event=cls.event, person=Person.objects.create(name="Tony"))
+
+    def setUp(self):
+        self.async_client.force_login(self.user1)
+
+    ## Test - a logged out request is sent to the login page
+    async def test_login_required(self):
+        self.async_client.cookies.clear()
+        response = await self.async_client.post(reverse('publish_ajax_event'), {'event_id': self.event.pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response.url)
+
+    ## Test - publish toggles the event
+    async def test_publish(self):
+        response = await self.async_client.post(reverse('publish_ajax_event'), {'event_id': self.event.pk})
+        self.assertEqual(response.json()['publish'], True)
+        event = await Event.objects.aget(pk=self.event.pk)
+        self.assertTrue(event.publish)
+        self.assertNotEqual(event.version, self.event.version)
+
+    ## Test - complete toggles the task and gives its event a new version
+    async def test_complete(self):
+        response = await self.async_client.post(reverse('complete_task'), {'task_id': self.task.pk})
+        self.assertEqual(response.json()['complete'], True)
+        event = await Event.objects.aget(pk=self.event.pk)
+        self.assertNotEqual(event.version, self.event.version)
+        response = await self.async_client.post(reverse('complete_task'), {'task_id': 0})
+        self.assertEqual(response.status_code, 404)
+
+    ## Test - delete removes the task once
+    async def test_delete(self):
+        response = await self.async_client.get(reverse('delete_task'), {'task_id': self.task.pk})
+        self.assertEqual(response.json()['delete_success'], True)
+        self.assertFalse(await Task.objects.filter(pk=self.task.pk).aexists())
+        response = await self.async_client.get(reverse('delete_task'), {'task_id': self.task.pk})
+        self.assertEqual(response.json()['delete_success'], False)
+
+    ## Test - registering twice stores one registration
+    async def test_register(self):
+        data = {'event_id': self.event.pk, 'user_id': self.user1.pk}
+        first = await self.async_client.get(reverse('register_event'), data)
+        second = await self.async_client.get(reverse('register_event'), data)
+        self.assertEqual([first.json()['register_success'], second.json()['register_success']], [True, False])
+        self.assertEqual(await RegisteredEvent.objects.filter(event=self.event).acount(), 1)
+        response = await self.async_client.get(reverse('register_event'), {'event_id': 0, 'user_id': self.user1.pk})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from events import bulk, search
+from events.models import Event, Person, Task, User
+from datetime import date, timedelta
+from django.urls import reverse
+
+DAY = date.today()+timedelta(days=10)
+
+
+# Bulk import and export of events and tasks
+class BulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User(username='annacarter', email='anna@surrey.ac.uk', is_staff=True, is_superuser=True)
+        cls.user1.set_password('MyPassword123')
+        cls.user1.save()
+        cls.event = Event.objects.create(title='Rugby Party', description="Location tbc", date=DAY, publish=True)
+        cls.person = Person.objects.create(name='Sandy')
+
+    def csv(self, *lines):
+        return StringIO('\n'.join(lines) + '\n')
+
+    ## Test - valid rows are imported, invalid ones reported by line and skipped
+    def test_import_events(self):
+        result = bulk.import_events(self.csv(
+            'title,description,date,publish,capacity,author',
+            'Charity Dinner,Rugby club fundraiser,%s,true,50,annacarter' % DAY,
+            'Rugby Party,Again,%s,,,' % DAY,
+            'Hockey Social,,%s,,,' % DAY,
+            'Quiz Night,Old,2001-02-30,,,',
+            'Bake Sale,Cakes,%s,,,nobody' % DAY,
+            'Charity Dinner,Twice,%s,,,' % DAY,
+            'Book Club,Books,%s,,,' % DAY,
+        ), batch_size=3)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, message in result.errors], [3, 4, 5, 6, 7])
+        self.assertIn('title: Event with this Title already exists.', result.errors[0][1])
+        self.assertIn('description: This field cannot be blank.', result.errors[1][1])
+        self.assertIn('date: ', result.errors[2][1])
+        self.assertIn('Unknown user "nobody"', result.errors[3][1])
+        dinner = Event.objects.get(title='Charity Dinner')
+        self.assertEqual((dinner.publish, dinner.capacity, dinner.author), (True, 50, self.user1))
+        self.assertFalse(Event.objects.get(title='Book Club').publish)
+        # what the signals would have done for saved events
+        self.assertEqual([event.title for event in search.search('fundraiser')], ['Charity Dinner'])
+
+    ## Test - tasks are matched to their event by title and checked against its date
+    def test_import_tasks(self):
+        result = bulk.import_tasks(StringIO('\n'.join(json.dumps(row) for row in [
+            {'title': 'Book pitch', 'description': 'Call the club', 'deadline': str(DAY), 'event': 'Rugby Party', 'person': 'Sandy'},
+            {'title': 'Order food', 'description': 'Pizza', 'deadline': str(DAY+timedelta(days=1)), 'event': 'Rugby Party'},
+            {'title': 'Order food', 'description': 'Pizza', 'deadline': str(DAY), 'event': 'Hockey Social'},
+            {'title': 'Order food', 'description': 'Pizza', 'deadline': str(DAY), 'event': 'Rugby Party', 'person': 'Nobody'},
+        ]) + '\nnot json\n'), 'jsonl')
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, message in result.errors], [2, 3, 4, 5])
+        self.assertIn('Deadline date cannot be greater than event date', result.errors[0][1])
+        self.assertIn('Invalid JSON', result.errors[3][1])
+        task = Task.objects.get()
+        self.assertEqual((task.event, task.person, task.complete), (self.event, self.person, False))
+        old_version = self.event.version
+        self.event.refresh_from_db()
+        self.assertNotEqual(self.event.version, old_version)
+
+    ## Test - a dry run reports the same errors and keeps nothing
+    def test_dry_run(self):
+        result = bulk.import_events(self.csv(
+            'title,description,date',
+            'Charity Dinner,Dinner,%s' % DAY,
+            'Charity Dinner,Twice,%s' % DAY,
+        ), dry_run=True)
+        self.assertEqual((result.created, [line for line, message in result.errors]), (1, [3]))
+        self.assertFalse(Event.objects.filter(title='Charity Dinner').exists())
+
+    ## Test - an export imports back into an empty table
+    def test_round_trip(self):
+        Task.objects.create(title='Book pitch', description='Call the club', deadline=DAY, event=self.event, person=self.person)
+        for format in bulk.FORMATS:
+            events, tasks = ''.join(bulk.export_events(format, chunk_size=1)), ''.join(bulk.export_tasks(format))
+            Event.objects.all().delete()
+            self.assertEqual(bulk.import_events(StringIO(events), format).created, 1)
+            self.assertEqual(bulk.import_tasks(StringIO(tasks), format).created, 1)
+            task = Task.objects.select_related('event').get()
+            self.assertEqual((task.title, task.person, task.event.title, task.event.publish), ('Book pitch', self.person, 'Rugby Party', True))
+            self.event = task.event
+
+    ## Test - past events, as a back catalogue holds, export and import again
+    def test_round_trip_past_events(self):
+        past = date.today()-timedelta(days=400)
+        Event.objects.bulk_create([Event(title='Summer Ball', description='Last year', date=past, publish=True)])
+        Task.objects.bulk_create([Task(title='Hire a band', description='Jazz', deadline=past, event=Event.objects.get(title='Summer Ball'))])
+        events, tasks = ''.join(bulk.export_events()), ''.join(bulk.export_tasks())
+        Event.objects.all().delete()
+        self.assertEqual(bulk.import_events(StringIO(events)).created, 2)
+        self.assertEqual(bulk.import_tasks(StringIO(tasks)).created, 1)
+        self.assertEqual(Task.objects.get().event.date, past)
+        # clean() still refuses unpublished events in the past
+        result = bulk.import_events(self.csv('title,description,date', 'Winter Ball,Last year,%s' % past))
+        self.assertEqual(result.errors, [(2, 'Cannot publish event in the past')])
+
+    ## Test - the commands read and write files
+    def test_commands(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'events.jsonl')
+            call_command('export_events', output=path)
+            Event.objects.all().delete()
+            out, err = StringIO(), StringIO()
+            call_command('import_events', path, stdout=out, stderr=err)
+            self.assertIn('1 events imported, 0 rows with errors', out.getvalue())
+            call_command('import_events', path, stdout=out, stderr=err)
+            self.assertIn('line 1: title: Event with this Title already exists.', err.getvalue())
+        out = StringIO()
+        call_command('export_events', tasks=True, stdout=out)
+        self.assertEqual(out.getvalue().strip(), ','.join(bulk.TASK_FIELDS))
+
+    ## Test - the admin imports an uploaded file and streams the export
+    def test_admin(self):
+        self.client.login(username='annacarter', password='MyPassword123')
+        upload = SimpleUploadedFile('events.csv', ('title,description,date\nCharity Dinner,Dinner,%s\n' % DAY).encode())
+        response = self.client.post(reverse('admin:events_event_import'), {'file': upload, 'kind': 'events'})
+        self.assertContains(response, '1 rows imported')
+        self.assertTrue(Event.objects.filter(title='Charity Dinner').exists())
+        response = self.client.get(reverse('admin:events_event_export'), {'format': 'jsonl'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="events.jsonl"')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+        self.assertContains(self.client.get(reverse('admin:events_event_changelist')), reverse('admin:events_event_import'))
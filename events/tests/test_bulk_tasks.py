@@ -0,0 +1,123 @@
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from events.models import Event, Person, Task, User
+from events.views import BULK_TASK_LIMIT
+from datetime import date, timedelta
+from django.urls import reverse
+
+
+class BulkTaskTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user1 = User(username='annacarter', email='anna@surrey.ac.uk')
+        user1.set_password('MyPassword123')
+        user1.save()
+        user2 = User(username='tonysmith', email='tony@surrey.ac.uk')
+        user2.set_password('MyPassword123')
+        user2.save()
+        person = Person.objects.create(name="Tony")
+        cls.event = Event.objects.create(title='Rugby Party', description="Location tbc", date=date.today()+timedelta(days=10), author=user1)
+        cls.other_event = Event.objects.create(title='Football Party', description="Location tbc", date=date.today()+timedelta(days=10), author=user2)
+        cls.tasks = [Task.objects.create(title='Task %d' % i, description='Task description', deadline=date.today(), event=cls.event, person=person) for i in range(5)]
+        cls.other_task = Task.objects.create(title='Other task', description='Task description', deadline=date.today(), event=cls.other_event, person=person)
+
+    def setUp(self):
+        self.client.login(username='annacarter', password='MyPassword123')
+
+    def post(self, name, data):
+        return self.client.post(reverse(name), json.dumps(data), content_type='application/json')
+
+    def ids(self):
+        return [task.pk for task in self.tasks]
+
+#----------- BULK COMPLETE -----------#
+
+    ## Test - bulk complete sets every task and reports one result per task
+    def test_bulk_complete(self):
+        response = self.post('bulk_complete_tasks', {'task_ids': self.ids(), 'complete': True})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'tid': tid, 'success': True, 'complete': True} for tid in self.ids()])
+        self.assertEqual(Task.objects.filter(event=self.event, complete=True).count(), 5)
+
+    ## Test - without "complete" each task is toggled
+    def test_bulk_toggle(self):
+        Task.objects.filter(pk=self.tasks[0].pk).update(complete=True)
+        results = self.post('bulk_complete_tasks', {'task_ids': self.ids()[:2]}).json()['results']
+        self.assertEqual([result['complete'] for result in results], [False, True])
+
+    ## Test - a batch of tasks is completed with a single UPDATE of the task table
+    def test_bulk_complete_single_update(self):
+        with CaptureQueriesContext(connection) as context:
+            self.post('bulk_complete_tasks', {'task_ids': self.ids(), 'complete': True})
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE "events_task"')]
+        self.assertEqual(len(updates), 1)
+
+    ## Test - tasks of other users' events and unknown ids are reported and left alone
+    def test_bulk_complete_other_users_tasks(self):
+        results = self.post('bulk_complete_tasks', {'task_ids': [self.other_task.pk, 99999], 'complete': True}).json()['results']
+        self.assertEqual([result['success'] for result in results], [False, False])
+        self.assertFalse(Task.objects.get(pk=self.other_task.pk).complete)
+
+#----------- BULK DELETE AND EDIT -----------#
+
+    ## Test - bulk delete removes the user's tasks with a single DELETE
+    def test_bulk_delete(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.post('bulk_delete_tasks', {'task_ids': self.ids()[:3] + [self.other_task.pk]})
+        self.assertEqual([result['delete_success'] for result in response.json()['results']], [True, True, True, False])
+        self.assertEqual(Task.objects.filter(event=self.event).count(), 2)
+        self.assertTrue(Task.objects.filter(pk=self.other_task.pk).exists())
+        deletes = [query['sql'] for query in context.captured_queries if query['sql'].startswith('DELETE FROM "events_task"')]
+        self.assertEqual(len(deletes), 1)
+
+    ## Test - deleting many tasks of one event rotates its version once
+    def test_bulk_delete_touches_event_once(self):
+        with CaptureQueriesContext(connection) as context:
+            self.post('bulk_delete_tasks', {'task_ids': self.ids()})
+        touches = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE "events_event"')]
+        self.assertEqual(len(touches), 1)
+
+    ## Test - bulk edit updates titles and descriptions
+    def test_bulk_edit(self):
+        edits = [{'id': tid, 'title': 'New title %d' % tid, 'description': 'New description'} for tid in self.ids()]
+        response = self.post('bulk_edit_tasks', {'tasks': edits})
+        self.assertTrue(all(result['success'] for result in response.json()['results']))
+        self.assertEqual(Task.objects.get(pk=self.tasks[2].pk).title, 'New title %d' % self.tasks[2].pk)
+
+    ## Test - an edit without a title is rejected and nothing is saved
+    def test_bulk_edit_invalid(self):
+        edits = [{'id': self.tasks[0].pk, 'title': 'New title', 'description': 'New description'}, {'id': self.tasks[1].pk, 'title': '', 'description': 'x'}]
+        response = self.post('bulk_edit_tasks', {'tasks': edits})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.get(pk=self.tasks[0].pk).title, 'Task 0')
+
+#----------- REQUEST CHECKS -----------#
+
+    ## Test - malformed bodies and oversized batches are rejected
+    def test_bad_requests(self):
+        for data in [[], {'task_ids': []}, {'task_ids': 'x'}, {'task_ids': ['x']}, {'task_ids': [1], 'complete': 'yes'}, {'task_ids': list(range(BULK_TASK_LIMIT + 1))}]:
+            with self.subTest(data=data):
+                self.assertEqual(self.post('bulk_complete_tasks', data).status_code, 400)
+        response = self.client.post(reverse('bulk_delete_tasks'), 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    ## Test - bulk endpoints need a login
+    def test_bulk_requires_login(self):
+        self.client.logout()
+        response = self.post('bulk_delete_tasks', {'task_ids': self.ids()})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Task.objects.filter(event=self.event).count(), 5)
+
+    ## Test - the cached task list on the detail page shows bulk changes
+    def test_detail_page_after_bulk_ops(self):
+        cache.clear()
+        url = reverse('events_detail', kwargs={'pk': self.event.pk})
+        self.assertContains(self.client.get(url), 'Task 4')
+        self.post('bulk_edit_tasks', {'tasks': [{'id': self.tasks[4].pk, 'title': 'Renamed task', 'description': 'x'}]})
+        self.assertContains(self.client.get(url), 'Renamed task')
+        self.post('bulk_delete_tasks', {'task_ids': [self.tasks[4].pk]})
+        self.assertNotContains(self.client.get(url), 'Renamed task')
@@ -0,0 +1,104 @@
+from django.test import TestCase
+from events.models import CalendarFeed, Event, Person, RegisteredEvent, Task, User
+from datetime import date, timedelta
+from django.urls import reverse
+
+
+# Per-user calendar feeds with conditional GET
+class CalendarFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User(username='annacarter', email='anna@surrey.ac.uk')
+        cls.user1.set_password('MyPassword123')
+        cls.user1.save()
+        cls.user2 = User.objects.create(username='tony', email='tony@surrey.ac.uk')
+        day = date.today()+timedelta(days=10)
+        cls.own = Event.objects.create(title='Rugby Party', description="Location tbc", date=day, author=cls.user1)
+        cls.other = Event.objects.create(title='Charity Dinner', description="Black tie", date=day, author=cls.user2, publish=True)
+        cls.hidden = Event.objects.create(title='Quiz Night', description="Teams of four", date=day, author=cls.user2)
+        cls.task = Task.objects.create(title='Book the venue', description='Call the club', deadline=day, event=cls.own, person=Person.objects.create(name="Tony"))
+        RegisteredEvent.objects.register(cls.user1, cls.other)
+        RegisteredEvent.objects.register(cls.user1, cls.hidden)
+        cls.feed = CalendarFeed.objects.create(user=cls.user1)
+
+    def url(self):
+        return reverse('user_calendar', kwargs={'token': self.feed.token})
+
+    def poll(self, response):
+        # the conditional GET a calendar app sends after its first fetch
+        return self.client.get(self.url(), HTTP_IF_NONE_MATCH=response['ETag'])
+
+    ## Test - the feed has the user's published registrations, own events and open task deadlines
+    def test_feed(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        content = response.content.decode()
+        self.assertIn('SUMMARY:Rugby Party\r\n', content)
+        self.assertIn('SUMMARY:Charity Dinner\r\n', content)
+        self.assertNotIn('Quiz Night', content)
+        self.assertIn('SUMMARY:Due: Book the venue (Rugby Party)\r\n', content)
+        self.assertIn('URL:http://testserver%s\r\n' % reverse('events_detail', kwargs={'pk': self.own.pk}), content)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('user_calendar', kwargs={'token': 'nope'})).status_code, 404)
+
+    ## Test - an unchanged feed is a 304 after one query
+    def test_not_modified(self):
+        response = self.client.get(self.url())
+        with self.assertNumQueries(1):
+            poll = self.poll(response)
+        self.assertEqual(poll.status_code, 304)
+        self.assertEqual(poll['ETag'], response['ETag'])
+
+    ## Test - a change in the same second as the last fetch is not hidden by If-Modified-Since
+    def test_same_second_change(self):
+        response = self.client.get(self.url())
+        CalendarFeed.objects.filter(pk=self.feed.pk).changed()
+        CalendarFeed.objects.filter(pk=self.feed.pk).update(modified=self.feed.modified)
+        poll = self.client.get(self.url(), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(poll.status_code, 200)
+        self.assertNotEqual(poll['ETag'], response['ETag'])
+
+    ## Test - changes to anything in the feed give it a new version
+    def test_changes(self):
+        def publish_hidden():
+            # published by its author, only the author can toggle it
+            self.client.force_login(self.user2)
+            self.client.post(reverse('publish_ajax_event'), {'event_id': self.hidden.pk})
+        changes = [
+            lambda: self.other.save(),
+            lambda: Task.objects.create(title='Order food', description='Pizza', deadline=self.own.date, event=self.own),
+            lambda: self.client.post(reverse('complete_task'), {'task_id': self.task.pk}),
+            lambda: RegisteredEvent.objects.cancel(self.user1, self.other.pk),
+            publish_hidden,
+            lambda: Event.objects.filter(pk=self.hidden.pk).delete(),
+        ]
+        self.client.login(username='annacarter', password='MyPassword123')
+        for change in changes:
+            response = self.client.get(self.url())
+            change()
+            self.assertEqual(self.poll(response).status_code, 200)
+
+    ## Test - other users' changes leave the feed alone
+    def test_unrelated_change(self):
+        response = self.client.get(self.url())
+        Event.objects.create(title='Hockey Social', description="Bar", date=self.own.date, author=self.user2)
+        RegisteredEvent.objects.register(self.user2, self.other)
+        self.assertEqual(self.poll(response).status_code, 304)
+
+    ## Test - a waitlisted registration shows as tentative
+    def test_waitlisted(self):
+        full = Event.objects.create(title='Hockey Social', description="Bar", date=self.own.date, publish=True, capacity=0)
+        RegisteredEvent.objects.register(self.user1, full)
+        content = self.client.get(self.url()).content.decode()
+        self.assertIn('SUMMARY:Hockey Social (waitlisted)\r\n', content)
+        self.assertIn('STATUS:TENTATIVE\r\n', content)
+
+    ## Test - a new link replaces the old one
+    def test_reset(self):
+        old_url = self.url()
+        self.client.login(username='annacarter', password='MyPassword123')
+        response = self.client.post(reverse('reset_calendar'))
+        self.assertRedirects(response, reverse('registered_events_index'))
+        self.feed.refresh_from_db()
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        self.assertContains(self.client.get(reverse('registered_events_index')), 'http://testserver' + self.url())
@@ -0,0 +1,120 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from events.feed import feed_version
+from events.forms import EventForm
+from events.models import Event, RegisteredEvent, User
+from datetime import date, timedelta
+from django.urls import reverse
+
+
+# Event capacity and the registered_count counter
+class CapacityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username='member%d' % i, email='member%d@surrey.ac.uk' % i) for i in range(3)]
+        cls.event = Event.objects.create(title='Rugby Party', description="Location tbc", date=date.today()+timedelta(days=10), publish=True, capacity=2)
+
+    def setUp(self):
+        cache.clear()
+
+    def count(self):
+        return Event.objects.values_list('registered_count', flat=True).get(pk=self.event.pk)
+
+    ## Test - registrations are counted once and stop at the capacity
+    def test_register_counts(self):
+        RegisteredEvent.objects.register(self.users[0], self.event)
+        RegisteredEvent.objects.register(self.users[0], self.event)
+        RegisteredEvent.objects.register(self.users[1], self.event)
+        self.assertEqual(self.count(), 2)
+        registration, created = RegisteredEvent.objects.register(self.users[2], self.event)
+        self.assertEqual(registration.status, RegisteredEvent.Status.WAITLISTED)
+        self.assertEqual(self.count(), 2)
+
+    ## Test - editing an event loaded before its registrations keeps their count
+    def test_stale_edit_keeps_count(self):
+        stale = Event.objects.get(pk=self.event.pk)
+        RegisteredEvent.objects.register(self.users[0], self.event)
+        RegisteredEvent.objects.register(self.users[1], self.event)
+        data = {'title': 'Rugby Party', 'description': 'At the club', 'date': stale.date, 'capacity': 2, 'author': self.users[0].pk}
+        form = EventForm(data, instance=stale)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self.count(), 2)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).description, 'At the club')
+        registration, created = RegisteredEvent.objects.register(self.users[2], self.event)
+        self.assertEqual(registration.status, RegisteredEvent.Status.WAITLISTED)
+
+    ## Test - events without a capacity take any number of registrations
+    def test_no_capacity(self):
+        Event.objects.filter(pk=self.event.pk).update(capacity=None)
+        for user in self.users:
+            RegisteredEvent.objects.register(user, self.event)
+        self.assertEqual(self.count(), 3)
+
+    ## Test - a deleted registration gives its spot back
+    def test_delete_frees_spot(self):
+        RegisteredEvent.objects.register(self.users[0], self.event)
+        registration, created = RegisteredEvent.objects.register(self.users[1], self.event)
+        registration.delete()
+        self.assertEqual(self.count(), 1)
+        RegisteredEvent.objects.filter(event=self.event).delete()
+        self.assertEqual(self.count(), 0)
+        RegisteredEvent.objects.register(self.users[2], self.event)
+        self.assertEqual(self.count(), 1)
+
+    ## Test - the register endpoint reports a full event's waitlist position
+    def test_register_view_full(self):
+        Event.objects.filter(pk=self.event.pk).update(capacity=0)
+        response = self.client.get(reverse('register_event'), {'event_id': self.event.pk, 'user_id': self.users[0].pk})
+        self.assertEqual(response.json(), {'register_success': True, 'waitlisted': True, 'position': 1})
+        response = self.client.get(reverse('register_event'), {'event_id': self.event.pk, 'user_id': self.users[1].pk})
+        self.assertEqual(response.json()['position'], 2)
+
+    ## Test - the reconcile command recounts drifted events only
+    def test_reconcile(self):
+        RegisteredEvent.objects.register(self.users[0], self.event)
+        other = Event.objects.create(title='Hockey Social', description="Location tbc", date=date.today()+timedelta(days=10))
+        RegisteredEvent.objects.bulk_create([RegisteredEvent(member=user, event=other) for user in self.users])
+        Event.objects.filter(pk=self.event.pk).update(registered_count=5)
+        out = StringIO()
+        call_command('reconcile_registered_counts', '--dry-run', stdout=out)
+        self.assertIn('2 events to correct', out.getvalue())
+        self.assertEqual(self.count(), 5)
+        call_command('reconcile_registered_counts', stdout=out)
+        self.assertIn('2 events corrected', out.getvalue())
+        self.assertEqual(dict(Event.objects.values_list('pk', 'registered_count')), {self.event.pk: 1, other.pk: 3})
+
+    ## Test - the cached feed is only dropped when an event fills up or has a spot again
+    def test_feed_changes_when_full(self):
+        def register(user):
+            with self.captureOnCommitCallbacks(execute=True):
+                RegisteredEvent.objects.register(user, self.event)
+            return feed_version()
+        version = feed_version()
+        self.assertEqual(register(self.users[0]), version)
+        full = register(self.users[1])
+        self.assertNotEqual(full, version)
+        # waitlisted
+        self.assertEqual(register(self.users[2]), full)
+        # the waitlist takes the spot given back, the event stays full
+        with self.captureOnCommitCallbacks(execute=True):
+            RegisteredEvent.objects.cancel(self.users[0], self.event.pk)
+        self.assertEqual(feed_version(), full)
+        with self.captureOnCommitCallbacks(execute=True):
+            RegisteredEvent.objects.cancel(self.users[1], self.event.pk)
+        self.assertNotEqual(feed_version(), full)
+
+    ## Test - the public feed shows the spots left without a query per card
+    def test_feed_spots_left(self):
+        RegisteredEvent.objects.register(self.users[0], self.event)
+        for i in range(5):
+            Event.objects.create(title='Event %d' % i, description="Location tbc", date=date.today()+timedelta(days=10), publish=True, capacity=50)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '1/2 spots left')
+        self.assertContains(response, '50/50 spots left', count=5)
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.client.get(reverse('home'))
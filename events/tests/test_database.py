@@ -0,0 +1,70 @@
+from pathlib import Path
+from unittest import skipUnless
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase
+from EventPlanner.caches import cache_config
+from EventPlanner.db import database_config
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    databases = {'default'}
+
+    ## Test - SQLite is the default, with the connection pragmas
+    def test_sqlite_default(self):
+        config = database_config(Path('/srv/app'), {})
+        self.assertEqual(config['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(config['NAME'], Path('/srv/app/db.sqlite3'))
+        self.assertEqual(config['PRAGMAS']['journal_mode'], 'WAL')
+        self.assertEqual(config['PRAGMAS']['synchronous'], 'NORMAL')
+        self.assertEqual(database_config(Path('/srv/app'), {'SQLITE_BUSY_TIMEOUT': '100'})['PRAGMAS']['busy_timeout'], 100)
+
+    ## Test - PostgreSQL keeps health checked persistent connections
+    def test_postgresql(self):
+        config = database_config(Path('/srv/app'), {'DATABASE_ENGINE': 'postgresql', 'DATABASE_NAME': 'events', 'DATABASE_CONN_MAX_AGE': '300'})
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(config['NAME'], 'events')
+        self.assertEqual(config['CONN_MAX_AGE'], 300)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+    ## Test - a pool replaces persistent connections, where Django supports it
+    def test_postgresql_pool(self):
+        environ = {'DATABASE_ENGINE': 'postgresql', 'DATABASE_POOL_MAX_SIZE': '10'}
+        if django.VERSION < (5, 1):
+            with self.assertRaises(ImproperlyConfigured):
+                database_config(Path('/srv/app'), environ)
+            return
+        config = database_config(Path('/srv/app'), environ)
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool']['max_size'], 10)
+
+    ## Test - unknown engines and malformed numbers are configuration errors
+    def test_invalid_settings(self):
+        with self.assertRaises(ImproperlyConfigured):
+            database_config(Path('/srv/app'), {'DATABASE_ENGINE': 'oracle'})
+        with self.assertRaises(ImproperlyConfigured):
+            database_config(Path('/srv/app'), {'SQLITE_MMAP_SIZE': 'lots'})
+
+    ## Test - new SQLite connections get the configured pragmas
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite pragmas')
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], connection.settings_dict['PRAGMAS']['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class CacheConfigTests(SimpleTestCase):
+
+    ## Test - the per-process cache is the default, shared backends are chosen by name
+    def test_cache_config(self):
+        self.assertEqual(cache_config({})['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        config = cache_config({'CACHE_BACKEND': 'redis', 'CACHE_LOCATION': 'redis://cache:6379/1'})
+        self.assertEqual(config, {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/1'})
+        config = cache_config({'CACHE_BACKEND': 'memcached', 'CACHE_LOCATION': 'cache1:11211, cache2:11211'})
+        self.assertEqual(config['LOCATION'], ['cache1:11211', 'cache2:11211'])
+        with self.assertRaises(ImproperlyConfigured):
+            cache_config({'CACHE_BACKEND': 'filesystem'})
@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from events import ical
+from events.models import Event, Person, RegisteredEvent, Task, User
+from datetime import date, timedelta
+from django.urls import reverse
+
+
+# Streaming CSV and iCalendar downloads of an event's tasks and registrants
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User(username='annacarter', email='anna@surrey.ac.uk', first_name='Anna', last_name='Carter')
+        cls.user1.set_password('MyPassword123')
+        cls.user1.save()
+        cls.user2 = User.objects.create(username='tony', email='')
+        cls.event = Event.objects.create(title='Rugby Party', description="Location tbc", date=date(2030, 5, 4), author=cls.user1, capacity=1)
+        person = Person.objects.create(name="Tony")
+        Task.objects.create(title='Order food', description='Pizza, chips; drinks', deadline=date(2030, 5, 2), event=cls.event, person=person)
+        Task.objects.create(title='Book the venue', description='x' * 100, deadline=date(2030, 5, 1), event=cls.event, complete=True)
+        RegisteredEvent.objects.register(cls.user1, cls.event)
+        RegisteredEvent.objects.register(cls.user2, cls.event)
+
+    def setUp(self):
+        self.client.login(username='annacarter', password='MyPassword123')
+        self.async_client.force_login(self.user1)
+
+    def download(self, kind, format):
+        response = self.client.get(reverse('event_export', kwargs={'pk': self.event.pk, 'kind': kind, 'format': format}))
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    ## Test - the task list as CSV, in deadline order
+    def test_tasks_csv(self):
+        response, content = self.download('tasks', 'csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="event-%d-tasks.csv"' % self.event.pk)
+        self.assertEqual(content.splitlines(), [
+            'title,description,deadline,complete,person',
+            'Book the venue,%s,2030-05-01,True,' % ('x' * 100),
+            'Order food,"Pizza, chips; drinks",2030-05-02,False,Tony',
+        ])
+
+    ## Test - the task list as to-dos, escaped and folded
+    def test_tasks_ics(self):
+        response, content = self.download('tasks', 'ics')
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertTrue(content.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(content.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(content.count('BEGIN:VTODO'), 2)
+        self.assertIn('DUE;VALUE=DATE:20300501\r\nSTATUS:COMPLETED\r\n', content)
+        self.assertIn('DESCRIPTION:Pizza\\, chips\\; drinks\r\n', content)
+        self.assertIn('CONTACT:Tony\r\n', content)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in content.split('\r\n')))
+        self.assertIn('DESCRIPTION:' + 'x' * 63 + '\r\n ' + 'x' * 37 + '\r\n', content)
+
+    ## Test - registrants, waitlisted ones as tentative attendees
+    def test_registrants(self):
+        response, content = self.download('registrants', 'csv')
+        self.assertEqual(content.splitlines(), [
+            'username,first_name,last_name,email,status',
+            'annacarter,Anna,Carter,anna@surrey.ac.uk,admitted',
+            'tony,,,,waitlisted',
+        ])
+        response, content = self.download('registrants', 'ics')
+        self.assertEqual(content.count('BEGIN:VEVENT'), 1)
+        self.assertIn('DTSTART;VALUE=DATE:20300504\r\n', content)
+        self.assertIn('ATTENDEE;CN="Anna Carter";PARTSTAT=ACCEPTED:mailto:anna@surrey.ac.uk\r\n', content)
+        self.assertIn('ATTENDEE;CN="tony";PARTSTAT=TENTATIVE:urn:x-username:tony\r\n', content)
+
+    ## Test - rows are written as they are read
+    def test_streamed(self):
+        with patch('events.exports.ROWS_PER_WRITE', 1):
+            response = self.client.get(reverse('event_export', kwargs={'pk': self.event.pk, 'kind': 'tasks', 'format': 'csv'}))
+            self.assertEqual(len(list(response.streaming_content)), 3)
+
+    ## Test - only the author or an admin can download, and only known exports
+    def test_permissions(self):
+        url = reverse('event_export', kwargs={'pk': self.event.pk, 'kind': 'tasks', 'format': 'csv'})
+        self.assertEqual(self.client.get(url.replace('tasks', 'people')).status_code, 404)
+        self.assertEqual(self.client.get(url.replace('csv', 'pdf')).status_code, 404)
+        self.client.force_login(self.user2)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    ## Test - the ASGI server gets an async stream
+    async def test_async_stream(self):
+        response = await self.async_client.get(reverse('event_export', kwargs={'pk': self.event.pk, 'kind': 'registrants', 'format': 'csv'}))
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('tony,,,,waitlisted', content)
+
+    ## Test - long lines are folded between characters
+    def test_fold(self):
+        line = 'SUMMARY:' + 'é' * 80
+        folded = ical.fold(line)
+        self.assertTrue(all(len(part.encode()) <= 75 for part in folded.split('\r\n')))
+        self.assertEqual(folded.replace('\r\n ', '')[:-2], line)
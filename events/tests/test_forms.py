@@ -5,6 +5,8 @@ from django.db import transaction, IntegrityError
 from django.urls import reverse
 from events.forms import *
 from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from unittest.mock import patch
 
 class FormTests(TestCase):
     @classmethod
@@ -335,4 +337,49 @@ class FormTests(TestCase):
         self.assertFalse(form.is_valid())
         response = self.client.post(reverse('create_task', kwargs={'nid': event.pk}), data=data)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(Task.objects.count(), db_count)
\ No newline at end of file
+        self.assertEqual(Task.objects.count(), db_count)
+
+    #----------- TASK PERSON CHOICES -----------#
+
+    ## Test - person choices are read once and then served from the cache
+    def test_task_form_person_choices_cached(self):
+        cache.clear()
+        with self.assertNumQueries(1):
+            TaskForm()
+        with self.assertNumQueries(0):
+            form = TaskForm()
+        self.assertIn((1, 'Tony'), form.fields['person'].choices)
+
+    ## Test - saving or deleting a person refreshes the choices
+    def test_task_form_person_choices_invalidated(self):
+        cache.clear()
+        TaskForm()
+        person = Person.objects.create(name="Sandy")
+        self.assertIn((person.pk, 'Sandy'), TaskForm().fields['person'].choices)
+        person.name = "Sandra"
+        person.save()
+        self.assertIn((person.pk, 'Sandra'), TaskForm().fields['person'].choices)
+        person.delete()
+        self.assertNotIn((person.pk, 'Sandra'), TaskForm().fields['person'].choices)
+
+    ## Test - a large person table is picked through the autocomplete input instead of a select
+    def test_task_form_person_autocomplete_widget(self):
+        cache.clear()
+        Person.objects.bulk_create([Person(name='Person %d' % i) for i in range(5)])
+        with patch('events.forms.PERSON_SELECT_LIMIT', 3):
+            cache.clear()
+            form = TaskForm()
+        html = str(form['person'])
+        self.assertIn('list="person-options"', html)
+        self.assertIn('data-autocomplete-url="/events/people/autocomplete"', html)
+        self.assertNotIn('<option', html)
+
+    ## Test - the autocomplete endpoint returns people whose name starts with the text
+    def test_person_autocomplete(self):
+        login = self.client.login(username='annacarter', password='MyPassword123') 
+        Person.objects.create(name="Tom")
+        Person.objects.create(name="Sandy")
+        response = self.client.get(reverse('person_autocomplete'), {'q': 'to'})
+        self.assertEqual([person['name'] for person in response.json()['people']], ['Tom', 'Tony'])
+        response = self.client.get(reverse('person_autocomplete'), {'q': ''})
+        self.assertEqual(response.json()['people'], [])
@@ -0,0 +1,142 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group
+from django.test import SimpleTestCase, TestCase
+from events import pubsub
+from events.models import Event, Person, Task, User
+from events.permissions import ADMIN_GROUP
+from datetime import date, timedelta
+from django.urls import reverse
+
+
+# In-process publish/subscribe behind the live event pages
+class PubSubTests(SimpleTestCase):
+
+    ## Test - a subscriber gets the messages published on its channel only
+    async def test_publish(self):
+        subscription = pubsub.subscribe('event:1')
+        try:
+            pubsub.publish('event:2', {'type': 'task'})
+            pubsub.publish('event:1', {'type': 'event'})
+            self.assertEqual(await asyncio.wait_for(subscription.get(), 1), {'type': 'event'})
+        finally:
+            pubsub.unsubscribe(subscription)
+        self.assertEqual(pubsub.subscriber_count('event:1'), 0)
+
+    ## Test - a subscriber that falls behind gets one reset in place of the dropped messages
+    async def test_overflow_resets(self):
+        subscription = pubsub.subscribe('event:1')
+        try:
+            for number in range(pubsub.QUEUE_SIZE + 5):
+                pubsub.publish('event:1', {'type': 'task', 'number': number})
+            await asyncio.sleep(0)
+            self.assertEqual(await subscription.get(), {'type': 'reset'})
+            self.assertTrue(subscription.queue.empty())
+            pubsub.publish('event:1', {'type': 'event'})
+            self.assertEqual(await asyncio.wait_for(subscription.get(), 1), {'type': 'event'})
+        finally:
+            pubsub.unsubscribe(subscription)
+
+
+class LiveEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User(username='annacarter', email='anna@surrey.ac.uk')
+        cls.user1.set_password('MyPassword123')
+        cls.user1.save()
+        cls.user2 = User.objects.create(username='tonysmith', email='tony@surrey.ac.uk')
+        cls.event = Event.objects.create(title='Rugby Party', description="Location tbc", date=date.today()+timedelta(days=10), author=cls.user1)
+        cls.person = Person.objects.create(name="Tony")
+        cls.task = Task.objects.create(title='Book the venue', description='Task description', deadline=date.today(), event=cls.event, person=cls.person)
+
+    def setUp(self):
+        self.async_client.force_login(self.user1)
+
+    async def read_stream(self, response, publish=None):
+        # the messages written until the stream closes itself
+        chunks = response.streaming_content.__aiter__()
+        first = await chunks.__anext__()
+        if publish:
+            publish()
+        rest = [chunk async for chunk in chunks]
+        return [first.decode()] + [chunk.decode() for chunk in rest]
+
+    ## Test - the stream sends the event's changes as server-sent events
+    @patch('events.views.STREAM_MAX_SECONDS', 0.2)
+    @patch('events.views.STREAM_KEEPALIVE_SECONDS', 0.05)
+    async def test_stream(self):
+        response = await self.async_client.get(reverse('event_stream', args=[self.event.pk]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        chunks = await self.read_stream(response, lambda: pubsub.publish_task(self.event.pk, 'updated', self.task.pk, complete=True))
+        self.assertTrue(chunks[0].startswith('retry: '))
+        message = [chunk for chunk in chunks if chunk.startswith('event: task')]
+        self.assertEqual(len(message), 1)
+        data = json.loads(message[0].split('data: ', 1)[1])
+        self.assertEqual(data, {'type': 'task', 'action': 'updated', 'task': {'id': self.task.pk, 'complete': True}})
+        self.assertIn(': keepalive\n\n', chunks)
+        # closing the stream ends the subscription
+        self.assertEqual(pubsub.subscriber_count(pubsub.event_channel(self.event.pk)), 0)
+
+    ## Test - only the author or an admin can follow an event
+    async def test_stream_permissions(self):
+        event = await Event.objects.acreate(title='Tony Party', description="Location tbc", date=date.today()+timedelta(days=10), author=self.user2)
+        response = await self.async_client.get(reverse('event_stream', args=[event.pk]))
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get(reverse('event_stream', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.async_client.cookies.clear()
+        response = await self.async_client.get(reverse('event_stream', args=[self.event.pk]))
+        self.assertEqual(response.status_code, 302)
+
+    ## Test - an admin can follow any event, under WSGI there is no stream
+    def test_stream_under_wsgi(self):
+        self.user2.groups.add(Group.objects.get_or_create(name=ADMIN_GROUP)[0])
+        self.client.force_login(self.user2)
+        response = self.client.get(reverse('event_stream', args=[self.event.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    ## Test - saved and deleted tasks and events are published once committed
+    def test_signals_publish(self):
+        with patch('events.signals.publish_task') as publish_task, patch('events.signals.publish_event') as publish_event:
+            with self.captureOnCommitCallbacks(execute=True):
+                task = Task.objects.create(title='Order food', description='For 20', deadline=date.today(), event=self.event, person=self.person)
+                publish_task.assert_not_called()
+            publish_task.assert_called_once_with(
+                self.event.pk, 'created', task.pk, title='Order food', description='For 20', complete=False, deadline=task.deadline, person='Tony')
+            task_id = task.pk
+            with self.captureOnCommitCallbacks(execute=True):
+                task.delete()
+            publish_task.assert_called_with(self.event.pk, 'deleted', task_id)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.event.title = 'Rugby Night'
+                self.event.save()
+            self.assertEqual(publish_event.call_args.args, (self.event.pk, 'updated'))
+            self.assertEqual(publish_event.call_args.kwargs['title'], 'Rugby Night')
+            publish_task.reset_mock()
+            event_id = self.event.pk
+            with self.captureOnCommitCallbacks(execute=True):
+                self.event.delete()
+            # the tasks go with the event, one message covers them
+            publish_task.assert_not_called()
+            publish_event.assert_called_with(event_id, 'deleted')
+
+    ## Test - views that update with a queryset publish what they changed
+    def test_views_publish(self):
+        self.client.force_login(self.user1)
+        with patch('events.views.publish_task') as publish_task:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('bulk_complete_tasks'), json.dumps({'task_ids': [self.task.pk]}), content_type='application/json')
+            publish_task.assert_called_once_with(self.event.pk, 'updated', self.task.pk, complete=True)
+        with patch('events.views.publish_event') as publish_event:
+            self.client.post(reverse('publish_ajax_event'), {'event_id': self.event.pk})
+            publish_event.assert_called_once_with(self.event.pk, 'updated', publish=True)
+
+    ## Test - the task list fragment the live page reloads
+    def test_task_list_fragment(self):
+        self.client.force_login(self.user1)
+        response = self.client.get(reverse('task_list', args=[self.event.pk]))
+        self.assertContains(response, 'id="task-%d"' % self.task.pk)
+        self.assertContains(response, 'editTask(%d, %d)' % (self.task.pk, self.event.pk))
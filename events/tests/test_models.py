@@ -243,7 +243,8 @@ class ModelTests(TestCase):
     def test_registered_event_save(self):
         db_count = RegisteredEvent.objects.all().count() 
         user=User.objects.get(pk=1)
-        event=Event.objects.get(pk=1)
+        # user 1 is already registered to event 1 in the test data
+        event=Event.objects.get(pk=2)
         re = RegisteredEvent(event=event, member=user) 
         re.save()
         self.assertEqual(db_count+1, RegisteredEvent.objects.all().count())
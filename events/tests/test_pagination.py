@@ -0,0 +1,104 @@
+import base64
+
+from django.test import TestCase
+from events.models import Event, User
+from events.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, keyset_page
+from datetime import date, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user1 = User(username='annacarter', email='anna@surrey.ac.uk')
+        user1.set_password('MyPassword123')
+        user1.save()
+        # 12 events over a week away, several on the same date so the id breaks ties
+        for i in range(12):
+            Event.objects.create(title='Future event %d' % i, description="Location tbc", date=date.today()+timedelta(days=10+i//3), publish=True, author=user1)
+
+    def setUp(self):
+        self.client.login(username='annacarter', password='MyPassword123')
+
+    def future_ids(self):
+        return list(Event.objects.filter(date__gt=date.today()+timedelta(days=7)).order_by('date', 'id').values_list('id', flat=True))
+
+#----------- CURSOR TESTS -----------#
+
+    ## Test - a cursor round trips the (date, id) of an event
+    def test_cursor_round_trip(self):
+        event = Event.objects.get(title='Future event 4')
+        self.assertEqual(decode_cursor(encode_cursor(event)), (event.date, event.pk))
+
+    ## Test - a malformed cursor gives the first page
+    def test_invalid_cursor_gives_first_page(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        page = keyset_page(Event.objects.all(), 'not-a-cursor', 5)
+        self.assertEqual([event.pk for event in page], self.future_ids()[:5])
+
+    ## Test - a cursor with an id too big for the database gives the first page
+    def test_out_of_range_cursor_gives_first_page(self):
+        cursor = base64.urlsafe_b64encode(('%s:%d' % (date.today().isoformat(), 10 ** 30)).encode()).decode()
+        self.assertIsNone(decode_cursor(cursor))
+        response = self.client.get(reverse('future_events'), {'format': 'json', 'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+
+    ## Test - following next cursors walks every event once, in (date, id) order
+    def test_json_pages_walk_all_events(self):
+        ids = []
+        cursor = ''
+        while True:
+            response = self.client.get(reverse('future_events'), {'format': 'json', 'size': 5, 'cursor': cursor})
+            data = response.json()
+            self.assertLessEqual(len(data['events']), 5)
+            ids += [event['id'] for event in data['events']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(ids, self.future_ids())
+
+    ## Test - the HTML page and the JSON variant return the same events for the same cursor
+    def test_html_and_json_share_cursor(self):
+        first = self.client.get(reverse('future_events'), {'format': 'json', 'size': 5}).json()
+        cursor = first['next_cursor']
+        data = self.client.get(reverse('future_events'), {'format': 'json', 'size': 5, 'cursor': cursor}).json()
+        response = self.client.get(reverse('future_events'), {'size': 5, 'cursor': cursor})
+        self.assertEqual([event.id for event in response.context['events_list']], [event['id'] for event in data['events']])
+        self.assertEqual(response.context['next_cursor'], data['next_cursor'])
+        self.assertContains(response, '?cursor=%s&size=5">Next</a>' % data['next_cursor'], status_code=200)
+
+    ## Test - page size is limited
+    def test_page_size_is_limited(self):
+        user1 = User.objects.get(username='annacarter')
+        Event.objects.bulk_create([Event(title='Bulk event %d' % i, description="Location tbc", date=date.today()+timedelta(days=20), author=user1) for i in range(MAX_PAGE_SIZE + 10)])
+        data = self.client.get(reverse('future_events'), {'format': 'json', 'size': 100000}).json()
+        self.assertEqual(len(data['events']), MAX_PAGE_SIZE)
+        self.assertIsNotNone(data['next_cursor'])
+
+    ## Test - a deep page runs the same queries as the first page
+    def test_deep_page_same_query_count(self):
+        with CaptureQueriesContext(connection) as first:
+            data = self.client.get(reverse('future_events'), {'format': 'json', 'size': 2}).json()
+        cursor = data['next_cursor']
+        for _ in range(4):
+            cursor = self.client.get(reverse('future_events'), {'format': 'json', 'size': 2, 'cursor': cursor}).json()['next_cursor']
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(reverse('future_events'), {'format': 'json', 'size': 2, 'cursor': cursor})
+        self.assertEqual(len(first), len(deep))
+
+    ## Test - the public homepage pages through upcoming events with the same cursor
+    def test_home_json_pages(self):
+        self.client.logout()
+        data = self.client.get(reverse('home'), {'format': 'json', 'size': 5}).json()
+        self.assertEqual(len(data['events']), 5)
+        data = self.client.get(reverse('home'), {'format': 'json', 'size': 5, 'cursor': data['next_cursor']}).json()
+        self.assertEqual([event['id'] for event in data['events']], self.future_ids()[5:10])
+
+    ## Test - the public JSON feed lists published events only
+    def test_home_json_published_only(self):
+        self.client.logout()
+        hidden = Event.objects.create(title='Hidden event', description="Location tbc", date=date.today()+timedelta(days=10))
+        data = self.client.get(reverse('home'), {'format': 'json', 'size': MAX_PAGE_SIZE}).json()
+        self.assertNotIn(hidden.pk, [event['id'] for event in data['events']])
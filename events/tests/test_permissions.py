@@ -0,0 +1,90 @@
+from django.contrib.auth.models import AnonymousUser, Group
+from django.core.cache import cache
+from django.test import TestCase
+from events.models import Event, User
+from events.permissions import admin_cache_key, is_admin
+from django.urls import reverse
+
+
+class PermissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user1 = User(username='annacarter', email='anna@surrey.ac.uk')
+        user1.set_password('MyPassword123')
+        user1.save()
+        Group.objects.create(name='EventsAdminUsers')
+
+    def setUp(self):
+        cache.clear()
+
+    def fresh_user(self):
+        # a new instance, as a new request would load it
+        return User.objects.get(username='annacarter')
+
+#----------- CACHED ADMIN CHECK -----------#
+
+    ## Test - the admin check is memoised for the request and cached across requests
+    def test_is_admin_cached(self):
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertFalse(is_admin(user))
+            self.assertFalse(is_admin(user))
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertFalse(is_admin(user))
+
+    ## Test - anonymous users are never admins and cost no queries
+    def test_anonymous_not_admin(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(is_admin(AnonymousUser()))
+
+    ## Test - adding the user to the admin group takes effect at once
+    def test_group_add_invalidates(self):
+        user = self.fresh_user()
+        self.assertFalse(is_admin(user))
+        user.groups.add(Group.objects.get(name='EventsAdminUsers'))
+        self.assertTrue(is_admin(user))
+        self.assertTrue(is_admin(self.fresh_user()))
+
+    ## Test - a value cached from the old membership before the commit is cleared on commit
+    def test_group_add_invalidates_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fresh_user().groups.add(Group.objects.get(name='EventsAdminUsers'))
+            # a concurrent request that read the membership before the commit
+            cache.set(admin_cache_key(self.fresh_user()), False)
+        self.assertTrue(is_admin(self.fresh_user()))
+
+    ## Test - removing the user through the group takes effect at once
+    def test_reverse_remove_invalidates(self):
+        group = Group.objects.get(name='EventsAdminUsers')
+        group.user_set.add(self.fresh_user())
+        self.assertTrue(is_admin(self.fresh_user()))
+        group.user_set.remove(self.fresh_user())
+        self.assertFalse(is_admin(self.fresh_user()))
+
+    ## Test - clearing the group's members takes effect at once
+    def test_reverse_clear_invalidates(self):
+        group = Group.objects.get(name='EventsAdminUsers')
+        group.user_set.add(self.fresh_user())
+        self.assertTrue(is_admin(self.fresh_user()))
+        group.user_set.clear()
+        self.assertFalse(is_admin(self.fresh_user()))
+
+    ## Test - deleting the admin group takes effect at once
+    def test_group_delete_invalidates(self):
+        self.fresh_user().groups.add(Group.objects.get(name='EventsAdminUsers'))
+        self.assertTrue(is_admin(self.fresh_user()))
+        Group.objects.get(name='EventsAdminUsers').delete()
+        self.assertFalse(is_admin(self.fresh_user()))
+
+    ## Test - an admin sees other users' events on the past events page without extra admin queries
+    def test_admin_view_uses_cache(self):
+        author = User.objects.create(username='testuser', email='testuser@surrey.ac.uk')
+        Event.objects.create(title='Old Fair', description="Location tbc", date="2022-11-10", author=author)
+        self.fresh_user().groups.add(Group.objects.get(name='EventsAdminUsers'))
+        self.client.login(username='annacarter', password='MyPassword123')
+        response = self.client.get(reverse('past_events'))
+        self.assertContains(response, 'Old Fair', status_code=200)
+        # session, user and the listing; the admin check is served from the cache
+        with self.assertNumQueries(3):
+            self.client.get(reverse('past_events'))
@@ -0,0 +1,84 @@
+import re
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from events.models import Event, User
+from datetime import date, timedelta
+from django.urls import reverse
+from EventPlanner import profiling
+
+
+def server_timing(response):
+    # {metric: (milliseconds, description)}
+    return {name: (float(duration), description) for name, duration, description in
+        re.findall(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', response['Server-Timing'])}
+
+
+# Sampled per-view query counts and timings
+@override_settings(PROFILING_SAMPLE_RATE=1)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User(username='annacarter', email='anna@surrey.ac.uk', is_staff=True, is_superuser=True)
+        cls.admin.set_password('MyPassword123')
+        cls.admin.save()
+        cls.event = Event.objects.create(title='Rugby Party', description="Location tbc", date=date.today()+timedelta(days=10), publish=True)
+
+    def setUp(self):
+        cache.clear()
+        profiling.reset()
+
+    ## Test - a profiled response reports its queries and render time
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'))
+        timing = server_timing(response)
+        self.assertEqual(timing['db'][1], '%d queries' % len(queries))
+        self.assertGreater(timing['render'][0], 0)
+        self.assertGreaterEqual(timing['total'][0], timing['db'][0] + timing['render'][0])
+        view = profiling.metrics()[0]
+        self.assertEqual((view.name, view.total_ms.total, view.queries.max), ('home', 1, len(queries)))
+        self.assertLessEqual(len(view.slowest), profiling.SLOWEST_STATEMENTS)
+
+    ## Test - queries of async views run in other threads and are counted too
+    async def test_async_view(self):
+        response = await self.async_client.get(reverse('register_event'), {'event_id': self.event.pk, 'user_id': self.admin.pk})
+        self.assertEqual(response.json()['register_success'], True)
+        self.assertNotEqual(server_timing(response)['db'][1], '0 queries')
+
+    ## Test - unsampled requests are left alone
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get(reverse('home'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(profiling.metrics(), [])
+
+    ## Test - the metrics page shows the views to staff and can be cleared
+    def test_metrics_page(self):
+        self.client.get(reverse('home'))
+        response = self.client.get(reverse('profiling_metrics'))
+        self.assertEqual(response.status_code, 302)
+        self.client.login(username='annacarter', password='MyPassword123')
+        response = self.client.get(reverse('profiling_metrics'))
+        self.assertContains(response, '<h2>home <small>(1 sampled)</small></h2>', html=False)
+        self.client.post(reverse('profiling_metrics'))
+        self.assertEqual([view.name for view in profiling.metrics()], ['profiling_metrics'])
+
+    ## Test - a profile keeps only the slowest statements
+    def test_slowest_statements(self):
+        profile = profiling.Profile()
+        for i in range(100):
+            profile.query('SELECT %d' % i, i / 1000)
+        self.assertEqual(profile.queries, 100)
+        slowest = ['SELECT %d' % i for i in range(100 - profiling.SLOWEST_STATEMENTS, 100)]
+        self.assertEqual(sorted(sql for seconds, sql in profile.statements), slowest)
+
+    ## Test - percentiles are read from the histogram buckets
+    def test_histogram(self):
+        histogram = profiling.Histogram([1, 2, 5, 10])
+        for value in [0.5] * 50 + [3] * 45 + [8] * 4 + [30]:
+            histogram.add(value)
+        self.assertEqual([histogram.percentile(p) for p in (50, 90, 99, 100)], [1, 5, 10, 30])
+        self.assertEqual(histogram.bars()[0], (1, 1.0))
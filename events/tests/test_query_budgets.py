@@ -0,0 +1,140 @@
+import json
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+from events.models import CalendarFeed, Event, Person, RegisteredEvent, Task, User
+from datetime import date, timedelta
+
+# Query budgets: the most queries each route may run. Every named route of
+# events.urls, home.urls and contact.urls needs an entry, and is requested with
+# the data seeded at each of SIZES; a route fails when it runs more queries than
+# its budget, or more queries for more data.
+#
+# A budget is route(queries, method, kwargs, data): kwargs and data take the
+# seeded objects and give the URL arguments and the GET or POST parameters
+# (a JSON body for json=True). Requests are made by the author of the seeded
+# events, with an empty cache.
+
+SIZES = (2, 25)
+URLCONFS = ('events.urls', 'home.urls', 'contact.urls')
+
+
+def route(queries, method='get', kwargs=None, data=None, json=False):
+    return SimpleNamespace(queries=queries, method=method, kwargs=kwargs or (lambda s: {}), data=data or (lambda s: {}), json=json)
+
+
+def task_ids(s):
+    return {'task_ids': [task.pk for task in s.tasks]}
+
+
+BUDGETS = {
+    # events.urls
+    'events_index': route(5),
+    'events_detail': route(4, kwargs=lambda s: {'pk': s.event.pk}),
+    'event_stream': route(3, kwargs=lambda s: {'pk': s.event.pk}),
+    'event_export': route(5, kwargs=lambda s: {'pk': s.event.pk, 'kind': 'registrants', 'format': 'ics'}),
+    'user_calendar': route(4, kwargs=lambda s: {'token': s.feed.token}),
+    'reset_calendar': route(6, 'post'),
+    'past_events': route(4),
+    'thisweek_events': route(4),
+    'future_events': route(4),
+    'registered_events_index': route(5),
+    'events_new': route(2),
+    'events_update': route(4, kwargs=lambda s: {'nid': s.event.pk}),
+    'events_delete': route(11, kwargs=lambda s: {'nid': s.event.pk}),
+    'publish_ajax_event': route(8, 'post', data=lambda s: {'event_id': s.event.pk}),
+    'task_list': route(3, kwargs=lambda s: {'nid': s.event.pk}),
+    'create_task': route(4, kwargs=lambda s: {'nid': s.event.pk}),
+    'complete_task': route(10, 'post', data=lambda s: {'task_id': s.tasks[0].pk}),
+    'delete_task': route(6, data=lambda s: {'task_id': s.tasks[0].pk}),
+    'task_ajax_update': route(6, 'post', data=lambda s: {
+        'taskId': s.tasks[0].pk, 'taskTitle': 'Order food', 'taskDescription': 'Pizza', 'eventId': s.event.pk}),
+    'bulk_complete_tasks': route(9, 'post', data=task_ids, json=True),
+    'bulk_delete_tasks': route(10, 'post', data=task_ids, json=True),
+    'bulk_edit_tasks': route(9, 'post', json=True, data=lambda s: {
+        'tasks': [{'id': task.pk, 'title': 'Order food', 'description': 'Pizza'} for task in s.tasks]}),
+    'person_autocomplete': route(3, data=lambda s: {'q': 'Per'}),
+    'search_events': route(6, data=lambda s: {'q': 'party'}),
+    # home.urls
+    'home': route(3),
+    'signup_user': route(2),
+    'register_event': route(8, data=lambda s: {'event_id': s.event.pk, 'user_id': s.newcomer.pk}),
+    'cancel_registration': route(12, 'post', data=lambda s: {'event_id': s.event.pk}),
+    # contact.urls
+    'contact': route(2),
+}
+
+
+def route_names(urlconf):
+    return [pattern.name for pattern in get_resolver(urlconf).url_patterns if isinstance(pattern, URLPattern) and pattern.name]
+
+
+# Every route within its query budget, at every data size
+class QueryBudgetTests(TestCase):
+
+    def seed(self, size):
+        # size of everything: the author's events in each date range, the tasks,
+        # registrations and people of the event under test, other registrations
+        today = date.today()
+        author = User(username='annacarter', email='anna@surrey.ac.uk')
+        author.set_password('MyPassword123')
+        author.save()
+        members = User.objects.bulk_create([User(username='member%d' % i, email='member%d@surrey.ac.uk' % i) for i in range(size)])
+        newcomer = User.objects.create(username='newcomer', email='newcomer@surrey.ac.uk')
+        events = []
+        for offset, label in ((-30, 'Past'), (3, 'Week'), (30, 'Future')):
+            events += [Event.objects.create(title='%s Party %d' % (label, i), description='Party number %d' % i,
+                date=today + timedelta(days=offset), author=author, publish=True) for i in range(size)]
+        event = events[-1]
+        people = Person.objects.bulk_create([Person(name='Person %d' % i) for i in range(size)])
+        tasks = [Task.objects.create(title='Task %d' % i, description='Task number %d' % i, deadline=event.date, event=event,
+            person=people[i]) for i in range(size)]
+        for member in members:
+            RegisteredEvent.objects.register(member, event)
+        for other in events[size:]:
+            RegisteredEvent.objects.register(author, other)
+        feed = CalendarFeed.objects.create(user=author)
+        return SimpleNamespace(author=author, event=event, tasks=tasks, newcomer=newcomer, feed=feed)
+
+    def request(self, name, budget, s):
+        url = reverse(name, kwargs=budget.kwargs(s))
+        data = budget.data(s)
+        if budget.json:
+            return getattr(self.client, budget.method)(url, json.dumps(data), content_type='application/json')
+        return getattr(self.client, budget.method)(url, data)
+
+    def measure(self, size):
+        # queries per route, each request on freshly seeded data that is rolled back after it
+        counts = {}
+        for name, budget in BUDGETS.items():
+            with transaction.atomic():
+                s = self.seed(size)
+                self.client.force_login(s.author)
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.request(name, budget, s)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 400, name)
+                counts[name] = len(queries)
+                transaction.set_rollback(True)
+        return counts
+
+    ## Test - every route has a budget
+    def test_every_route_has_a_budget(self):
+        names = [name for urlconf in URLCONFS for name in route_names(urlconf)]
+        self.assertEqual(sorted(set(names) - set(BUDGETS)), [])
+        self.assertEqual(sorted(set(BUDGETS) - set(names)), [])
+
+    ## Test - no route goes over its budget or runs more queries for more data
+    def test_budgets(self):
+        small, large = (self.measure(size) for size in SIZES)
+        for name, budget in BUDGETS.items():
+            with self.subTest(route=name):
+                self.assertLessEqual(small[name], budget.queries, '%s ran %d queries, its budget is %d' % (name, small[name], budget.queries))
+                self.assertEqual(large[name], small[name], '%s ran %d queries with %d rows, %d with %d' % (
+                    name, small[name], SIZES[0], large[name], SIZES[1]))
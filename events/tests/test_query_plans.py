@@ -0,0 +1,108 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from events.models import Event, Person, RegisteredEvent, Task, User
+from datetime import date, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+# "SCAN events_event", with or without "USING (COVERING) INDEX", is SQLite reading every
+# row of the table or of one of its indexes
+FULL_SCAN = re.compile(r'^SCAN (events_\w+)\b')
+# scan steps a view may run, only ever in a query bounded by a LIMIT
+ALLOWED_SCANS = set()
+LIMIT = re.compile(r'\bLIMIT\b')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'query plans are read with SQLite EXPLAIN QUERY PLAN')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user1 = User(username='annacarter', email='anna@surrey.ac.uk')
+        user1.set_password('MyPassword123')
+        user1.save()
+        admin = User(username='testadminuser', email='testadminuser@surrey.ac.uk')
+        admin.set_password('MyPassword123')
+        admin.save()
+        admin.groups.add(Group.objects.create(name='EventsAdminUsers'))
+
+        person = Person.objects.create(name="Tony")
+        for i in range(20):
+            event = Event.objects.create(title='Event %d' % i, description="Location tbc", date=date.today()+timedelta(days=i*2-10), publish=i % 2 == 0, author=user1 if i % 3 else admin)
+            Task.objects.create(title='Task %d' % i, description='Task description', deadline=event.date, event=event, person=person)
+            RegisteredEvent.objects.create(event=event, member=user1)
+        cls.event = Event.objects.get(title='Event 13')
+
+    def scans(self, url):
+        # EXPLAIN every query the view ran against the events tables
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        scans = []
+        for query in context.captured_queries:
+            sql = query['sql']
+            if sql.startswith('SELECT') and '"events_' in sql:
+                scans += [(step, sql) for step in self.full_scans(sql)]
+        return scans
+
+    def full_scans(self, sql, allowed=ALLOWED_SCANS):
+        # an allowed step is still reported when the query has no LIMIT
+        if not LIMIT.search(sql):
+            allowed = set()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall() if FULL_SCAN.match(row[-1]) and row[-1] not in allowed]
+
+    def assertNoFullScan(self, url):
+        self.assertEqual(self.scans(url), [])
+
+    ## Test - an unindexed filter is reported as a full scan
+    def test_full_scan_is_detected(self):
+        queryset = Event.objects.filter(description__icontains='tbc')
+        with CaptureQueriesContext(connection) as context:
+            list(queryset)
+        self.assertEqual(self.full_scans(context.captured_queries[0]['sql']), ['SCAN events_event'])
+
+    ## Test - reading a whole index is a full scan too, allowed only for a query with a LIMIT
+    def test_index_scan_is_detected(self):
+        with CaptureQueriesContext(connection) as context:
+            list(Event.objects.order_by('date', 'id'))
+            list(Event.objects.order_by('date', 'id')[:5])
+        unbounded, bounded = [query['sql'] for query in context.captured_queries]
+        steps = self.full_scans(unbounded)
+        self.assertEqual(len(steps), 1)
+        self.assertRegex(steps[0], r'^SCAN events_event USING (COVERING )?INDEX ')
+        self.assertEqual(self.full_scans(unbounded, allowed=set(steps)), steps)
+        self.assertEqual(self.full_scans(bounded), steps)
+        self.assertEqual(self.full_scans(bounded, allowed=set(steps)), [])
+
+#----------- USER VIEWS -----------#
+
+    ## Test - views of a user's own events read through indexes
+    def test_user_views_use_indexes(self):
+        self.client.login(username='annacarter', password='MyPassword123')
+        for name in ['events_index', 'past_events', 'thisweek_events', 'future_events', 'registered_events_index']:
+            with self.subTest(view=name):
+                self.assertNoFullScan(reverse(name))
+
+    ## Test - the event detail page and task list read tasks through an index
+    def test_detail_views_use_indexes(self):
+        self.client.login(username='annacarter', password='MyPassword123')
+        self.assertNoFullScan(reverse('events_detail', kwargs={'pk': self.event.pk}))
+        self.assertNoFullScan(reverse('task_list', kwargs={'nid': self.event.pk}))
+
+    ## Test - the public homepage reads upcoming events through an index
+    def test_home_view_uses_indexes(self):
+        self.assertNoFullScan(reverse('home'))
+
+#----------- ADMIN VIEWS -----------#
+
+    ## Test - listings of every event still seek on the (date, id) index
+    def test_admin_views_use_indexes(self):
+        self.client.login(username='testadminuser', password='MyPassword123')
+        for name in ['events_index', 'past_events', 'thisweek_events', 'future_events']:
+            with self.subTest(view=name):
+                self.assertNoFullScan(reverse(name))
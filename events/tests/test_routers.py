@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+from contextvars import Context
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from events.models import Event, User
+from datetime import date, timedelta
+from django.urls import reverse
+from EventPlanner.routers import PIN_COOKIE, PrimaryReplicaRouter
+
+REPLICAS = ['replica1', 'replica2']
+
+
+# Two SQLite files stand in for the replicas, copied from the test database
+# with sync_sqlite_replicas, so rows written afterwards only exist on the primary
+@override_settings(REPLICA_DATABASES=REPLICAS)
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        for alias in REPLICAS:
+            config = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(Path(self.directory) / (alias + '.sqlite3'))}
+            connections.settings[alias] = connections.configure_settings({'default': {}, alias: config})[alias]
+        user1 = User(username='annacarter', email='anna@surrey.ac.uk')
+        user1.set_password('MyPassword123')
+        user1.save()
+        self.event = Event.objects.create(title='Rugby Party', description="Location tbc", date=date.today()+timedelta(days=10), author=user1)
+        self.client.login(username='annacarter', password='MyPassword123')
+        call_command('sync_sqlite_replicas', stdout=open('/dev/null', 'w'))
+        # only on the primary
+        Event.objects.create(title='Football Party', description="Location tbc", date=date.today()+timedelta(days=10), author=user1)
+
+    def tearDown(self):
+        for alias in REPLICAS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        shutil.rmtree(self.directory)
+
+    def titles(self):
+        return [event['title'] for event in self.client.get(reverse('future_events'), {'format': 'json'}).json()['events']]
+
+    def replica_queries(self, function):
+        with CaptureQueriesContext(connections['replica1']) as first, CaptureQueriesContext(connections['replica2']) as second:
+            with CaptureQueriesContext(connections['default']) as primary:
+                function()
+        return len(first) + len(second), len(primary)
+
+#----------- ROUTING -----------#
+
+    ## Test - listing pages read from a replica
+    def test_reads_use_replicas(self):
+        replica, primary = self.replica_queries(self.titles)
+        self.assertGreater(replica, 0)
+        self.assertEqual(primary, 0)
+        self.assertEqual(self.titles(), ['Rugby Party'])
+
+    ## Test - after a write the user reads from the primary until the pin cookie expires
+    def test_read_your_writes(self):
+        response = self.client.post(reverse('publish_ajax_event'), {'event_id': self.event.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+        replica, primary = self.replica_queries(self.titles)
+        self.assertEqual(replica, 0)
+        self.assertEqual(self.titles(), ['Rugby Party', 'Football Party'])
+        # a client without the cookie still reads the replica
+        self.client.cookies.pop(PIN_COOKIE)
+        self.assertEqual(self.titles(), ['Rugby Party'])
+
+    ## Test - reads after a write in the same request or script go to the primary
+    def test_write_pins_reads(self):
+        router = PrimaryReplicaRouter()
+        # a new context, as in a new thread, has not written anything yet
+
+        def read_write_read():
+            before = router.db_for_read(Event)
+            router.db_for_write(Event)
+            return before, router.db_for_read(Event)
+
+        before, after = Context().run(read_write_read)
+        self.assertIn(before, REPLICAS)
+        self.assertEqual(after, 'default')
+        self.assertIn(Context().run(router.db_for_read, Event), REPLICAS)
+
+    ## Test - migrations only run on the primary
+    def test_migrations_skip_replicas(self):
+        router = PrimaryReplicaRouter()
+        self.assertTrue(router.allow_migrate('default', 'events'))
+        self.assertFalse(router.allow_migrate('replica1', 'events'))
@@ -0,0 +1,83 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from events import search
+from events.models import Event, User
+from datetime import date, timedelta
+from django.urls import reverse
+
+
+# Full-text search over event titles and descriptions
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User(username='annacarter', email='anna@surrey.ac.uk')
+        cls.user1.set_password('MyPassword123')
+        cls.user1.save()
+        day = date.today()+timedelta(days=10)
+        cls.rugby = Event.objects.create(title='Rugby Party', description="Location tbc", date=day, publish=True)
+        cls.dinner = Event.objects.create(title='Charity Dinner', description="Rugby club fundraiser", date=day, publish=True)
+        cls.private = Event.objects.create(title='Rugby Training', description="Team only", date=day, author=cls.user1)
+
+    def titles(self, query, **kwargs):
+        return [event.title for event in search.search(query, **kwargs)]
+
+    ## Test - every term must match, the last as a prefix; titles rank above descriptions, then newer events
+    def test_search(self):
+        self.assertEqual(self.titles('rugby'), ['Rugby Training', 'Rugby Party', 'Charity Dinner'])
+        self.assertEqual(self.titles('rugby par'), ['Rugby Party'])
+        self.assertEqual(self.titles('rugb party'), [])
+        self.assertEqual(self.titles('RUGBY fundraiser'), ['Charity Dinner'])
+        self.assertEqual(self.titles('hockey'), [])
+        self.assertEqual(self.titles('rugby', limit=1), ['Rugby Training'])
+
+    ## Test - query syntax is not passed on to the index
+    def test_operators_ignored(self):
+        self.assertEqual(self.titles('"rugby" OR NOT* (party'), [])
+        self.assertEqual(self.titles('rugby:* & party'), ['Rugby Party'])
+        self.assertEqual(self.titles('  '), [])
+
+    ## Test - saved and deleted events are kept in the index
+    def test_index_follows_saves(self):
+        self.rugby.title = 'Hockey Party'
+        self.rugby.save()
+        self.assertEqual(self.titles('hockey'), ['Hockey Party'])
+        self.assertNotIn('Hockey Party', self.titles('rugby'))
+        self.rugby.delete()
+        self.assertEqual(self.titles('hockey'), [])
+
+    ## Test - the search is limited to the given events
+    def test_queryset(self):
+        self.assertEqual(self.titles('rugby', queryset=Event.objects.filter(publish=True)), ['Rugby Party', 'Charity Dinner'])
+
+    ## Test - only the newest matches are ranked
+    def test_candidates(self):
+        with patch('events.search.MAX_CANDIDATES', 2):
+            self.assertEqual(self.titles('rugby'), ['Rugby Training', 'Charity Dinner'])
+
+    ## Test - the endpoint shows published events, and the user's own
+    def test_search_view(self):
+        response = self.client.get(reverse('search_events'), {'q': 'rugby'})
+        results = response.json()['results']
+        self.assertEqual([result['title'] for result in results], ['Rugby Party', 'Charity Dinner'])
+        self.assertIsNone(results[0]['url'])
+        self.client.login(username='annacarter', password='MyPassword123')
+        response = self.client.get(reverse('search_events'), {'q': 'training'})
+        results = response.json()['results']
+        self.assertEqual([result['title'] for result in results], ['Rugby Training'])
+        self.assertEqual(results[0]['url'], reverse('events_detail', kwargs={'pk': self.private.pk}))
+        # session and user, the oldest candidate, the ranking and the events
+        with self.assertNumQueries(5):
+            self.client.get(reverse('search_events'), {'q': 'rugby', 'limit': 'x'})
+
+    ## Test - events written around the model are indexed by the rebuild command
+    def test_rebuild(self):
+        Event.objects.bulk_create([Event(title='Hockey Social', description="Bar", date=date.today()+timedelta(days=10))])
+        self.assertEqual(self.titles('hockey'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('4 events indexed', out.getvalue())
+        self.assertEqual(self.titles('hockey'), ['Hockey Social'])
+        self.assertEqual(len(self.titles('rugby')), 3)
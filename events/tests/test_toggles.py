@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import OperationalError, close_old_connections, connection
+from django.test import TestCase, TransactionTestCase
+from events.models import Event, Person, Task, User, toggle_flag
+from datetime import date, timedelta
+from django.urls import reverse
+
+
+class ToggleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user1 = User(username='annacarter', email='anna@surrey.ac.uk')
+        user1.set_password('MyPassword123')
+        user1.save()
+        cls.event = Event.objects.create(title='Rugby Party', description="Location tbc", date=date.today()+timedelta(days=10), author=user1)
+        cls.task = Task.objects.create(title='Book the venue', description='Task description', deadline=date.today(), event=cls.event, person=Person.objects.create(name="Tony"))
+
+    def setUp(self):
+        self.client.login(username='annacarter', password='MyPassword123')
+
+#----------- SINGLE UPDATE TOGGLES -----------#
+
+    ## Test - publishing is one UPDATE of the publish column and version, read back in the same transaction
+    def test_publish_single_update(self):
+        with self.assertNumQueries(4) as context:
+            publish = toggle_flag(Event.objects.filter(pk=self.event.pk), 'publish')
+        self.assertTrue(publish)
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('SET "publish" = CASE WHEN', updates[0])
+        self.assertNotIn('"description"', updates[0])
+
+    ## Test - toggling a task writes only the complete column
+    def test_complete_writes_one_column(self):
+        with self.assertNumQueries(4) as context:
+            complete = toggle_flag(Task.objects.filter(pk=self.task.pk), 'complete')
+        self.assertTrue(complete)
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"title"', updates[0])
+
+    ## Test - toggling a missing row changes nothing
+    def test_toggle_missing_row(self):
+        self.assertIsNone(toggle_flag(Task.objects.filter(pk=0), 'complete'))
+        response = self.client.post(reverse('complete_task'), data={'task_id': 0})
+        self.assertEqual(response.status_code, 404)
+
+    ## Test - another user cannot toggle an event or task they do not manage
+    def test_toggles_other_user(self):
+        user2 = User(username='bobsmith', email='bob@surrey.ac.uk')
+        user2.set_password('MyPassword123')
+        user2.save()
+        self.client.login(username='bobsmith', password='MyPassword123')
+        response = self.client.post(reverse('publish_ajax_event'), data={'event_id': self.event.pk})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(reverse('complete_task'), data={'task_id': self.task.pk})
+        self.assertEqual(response.status_code, 404)
+        self.event.refresh_from_db()
+        self.task.refresh_from_db()
+        self.assertFalse(self.event.publish)
+        self.assertFalse(self.task.complete)
+
+    ## Test - the toggle endpoints only accept POST
+    def test_toggles_require_post(self):
+        response = self.client.get(reverse('complete_task'), data={'task_id': self.task.pk})
+        self.assertEqual(response.status_code, 405)
+        response = self.client.get(reverse('publish_ajax_event'), data={'event_id': self.event.pk})
+        self.assertEqual(response.status_code, 405)
+        self.task.refresh_from_db()
+        self.assertFalse(self.task.complete)
+
+    ## Test - toggling a task shows straight away on the cached event page
+    def test_complete_refreshes_detail_page(self):
+        url = reverse('events_detail', kwargs={'pk': self.event.pk})
+        self.assertContains(self.client.get(url), 'task_prompt incomplete', status_code=200)
+        self.client.post(reverse('complete_task'), data={'task_id': self.task.pk})
+        self.assertContains(self.client.get(url), 'task_prompt complete', status_code=200)
+
+
+class ConcurrentToggleTests(TransactionTestCase):
+    TOGGLES = 25
+
+    def setUp(self):
+        user1 = User.objects.create(username='annacarter', email='anna@surrey.ac.uk')
+        self.event = Event.objects.create(title='Rugby Party', description="Location tbc", date=date.today()+timedelta(days=10), author=user1)
+        self.task = Task.objects.create(title='Book the venue', description='Task description', deadline=date.today(), event=self.event, person=Person.objects.create(name="Tony"))
+
+    def toggle(self, queryset, field):
+        # a toggle that hits a locked database is retried, as a user would click again
+        try:
+            while True:
+                try:
+                    return toggle_flag(queryset, field)
+                except OperationalError:
+                    continue
+        finally:
+            close_old_connections()
+            connection.close()
+
+    ## Test - parallel toggles each flip the flag once, an odd number of them leaves it flipped
+    def test_parallel_toggles(self):
+        for queryset, field in [(Task.objects.filter(pk=self.task.pk), 'complete'), (Event.objects.filter(pk=self.event.pk), 'publish')]:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda _: self.toggle(queryset, field), range(self.TOGGLES)))
+            # every toggle saw a different state, half of them (rounded up) turned the flag on
+            self.assertEqual(results.count(True), (self.TOGGLES + 1) // 2)
+            self.assertEqual(queryset.values_list(field, flat=True).get(), True)
@@ -1,8 +1,11 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from events.models import Event, Task, User 
 from datetime import date, timedelta
 from django.urls import reverse
 from events.forms import *
+from django.db import connection
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
 
 class ViewTests(TestCase):
     @classmethod
@@ -84,6 +87,25 @@ class ViewTests(TestCase):
         # Event > a week away - Rugby Party
         self.assertContains(response, '<h5 class="card-title">Events > Week Away</h5>\n          <ul class="list-group list-group-flush">\n            \n            <li class="list-group-item">Rugby Party</li>', status_code=200)
  
+    ## Test events index view counts each bucket and keeps a fixed number of queries as events grow
+    def test_events_index_view_constant_queries(self):
+        login = self.client.login(username='annacarter', password='MyPassword123') 
+        user1 = User.objects.get(pk=1)
+        # warm the cached admin check so both requests are measured alike
+        self.client.get(reverse('events_index'))
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(reverse('events_index'))
+        for i in range(10):
+            Event.objects.create(title='Future event %d' % i, description="Location tbc", date=date.today()+timedelta(days=30), author=user1)
+            Event.objects.create(title='Past event %d' % i, description="Location tbc", date=date.today()-timedelta(days=30), author=user1)
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(reverse('events_index'))
+        self.assertEqual(len(before), len(after))
+        past = Event.objects.filter(author=user1, date__lt=date.today()).order_by('date', 'id')
+        self.assertEqual(response.context['events_past_count'], past.count())
+        self.assertEqual(response.context['events_past'], past.first())
+        self.assertEqual(response.context['events_week_count'], 1)
+
     ## Test events index view logged out redirects to login page
     def test_events_index_view_not_logged_in(self):
         response = self.client.get(reverse('events_index'), follow=True)
@@ -176,6 +198,35 @@ class ViewTests(TestCase):
         # Check correct event has been loaded, ie. Charity Event is an event registered in this test
         self.assertContains(response, '<h5 class="card-title">Charity Fair</a></h5>', status_code=200)
 
+    ## Test registered events view runs the same number of queries however many registrations other users have
+    def test_registered_events_view_constant_queries(self):
+        login = self.client.login(username='annacarter', password='MyPassword123') 
+        author = User.objects.get(pk=2)
+        e6 = Event.objects.create(title='Charity Fair', description="Location tbc", date = "2024-11-10", publish = True, author=author) 
+        RegisteredEvent.objects.create(event=e6, member=User.objects.get(pk=1))
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(reverse('registered_events_index'))
+        for i in range(30):
+            other = User.objects.create(username='member%d' % i, email='member%d@surrey.ac.uk' % i)
+            RegisteredEvent.objects.create(event=e6, member=other)
+            RegisteredEvent.objects.create(event=Event.objects.get(pk=2), member=other)
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(reverse('registered_events_index'))
+        self.assertEqual(len(before), len(after))
+        self.assertContains(response, '<h5 class="card-title">Charity Fair</a></h5>', count=1, status_code=200)
+
+    ## Test registered events view only lists the logged in user's published registrations
+    def test_registered_events_view_only_own_registrations(self):
+        login = self.client.login(username='testuser', password='MyPassword123') 
+        author = User.objects.get(pk=2)
+        e6 = Event.objects.create(title='Charity Fair', description="Location tbc", date = "2024-11-10", publish = True, author=author) 
+        e7 = Event.objects.create(title='Bake Sale', description="Location tbc", date = "2024-11-10", publish = True, author=author) 
+        RegisteredEvent.objects.create(event=e6, member=User.objects.get(pk=3))
+        RegisteredEvent.objects.create(event=e7, member=User.objects.get(pk=1))
+        response = self.client.get(reverse('registered_events_index'))
+        self.assertContains(response, 'Charity Fair', status_code=200)
+        self.assertNotContains(response, 'Bake Sale', status_code=200)
+
     ## Test events detail page when logged in
     def test_events_detail_view_logged_in(self):
         login = self.client.login(username='annacarter', password='MyPassword123') 
@@ -188,6 +239,42 @@ class ViewTests(TestCase):
         # Check correct event has been loaded, ie. Rugby Party event with pk=1
         self.assertContains(response, '<h2>Rugby Party</h2><hr>\n<p> Location tbc</p>\n<hr>\n<p>Date: Nov. 21, 2024<p>', status_code=200)
 
+    ## Test events detail page runs a fixed number of queries however many tasks the event has
+    def test_events_detail_view_constant_queries(self):
+        login = self.client.login(username='annacarter', password='MyPassword123') 
+        event = Event.objects.get(pk=2)
+        with override_settings(EVENT_TASKS_CACHE_TIMEOUT=0):
+            with CaptureQueriesContext(connection) as before:
+                self.client.get(reverse('events_detail', kwargs={'pk': event.pk}))
+            for i in range(200):
+                Task.objects.create(title='Task %d' % i, description='Task description', deadline=date.today(), event=event, person=Person.objects.create(name='Person %d' % i))
+            with CaptureQueriesContext(connection) as after:
+                response = self.client.get(reverse('events_detail', kwargs={'pk': event.pk}))
+        self.assertEqual(len(before), len(after))
+        self.assertContains(response, '<td class="taskPerson taskData" name="person">Person 199</td>', status_code=200)
+
+    ## Test events detail page serves the cached task list until the event's tasks change
+    def test_events_detail_view_task_list_cache(self):
+        login = self.client.login(username='annacarter', password='MyPassword123') 
+        event = Event.objects.get(pk=1)
+        url = reverse('events_detail', kwargs={'pk': event.pk})
+        cache.clear()
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(url)
+        self.assertEqual(len(cached), len(first)-1)
+        self.assertFalse(any('"events_task"' in query['sql'] for query in cached.captured_queries))
+        # a new task, an edited task and a renamed person all show straight away
+        Task.objects.create(title='Book the venue', description='Task description', deadline=date.today(), event=event, person=Person.objects.get(pk=1))
+        self.assertContains(self.client.get(url), 'Book the venue', status_code=200)
+        self.client.post(reverse('task_ajax_update'), data={"taskId": 1, "taskTitle": "Order the food", "taskDescription": "For 20", "eventId": event.pk})
+        self.assertContains(self.client.get(url), 'Order the food', status_code=200)
+        person = Person.objects.get(pk=1)
+        person.name = 'Antony'
+        person.save()
+        self.assertContains(self.client.get(url), 'Antony', status_code=200)
+
     ## Test events detail view logged out redirects to login page
     def test_events_detail_view_not_logged_in(self):
         event = Event.objects.get(pk=1)
@@ -224,13 +311,13 @@ class ViewTests(TestCase):
     ## Test events publish change to publish from false to true view logged in
     def test_events_publish_ajax_false_to_tue_and_validation_logged_in(self):
         login = self.client.login(username='annacarter', password='MyPassword123') 
-        author = User.objects.get(pk=2)
+        author = User.objects.get(pk=1)
         # event publish set to false
         event = Event.objects.create(title='Charity Fair', description="Location tbc", date = "2024-11-10", publish = False, author=author) 
         data = {
             'event_id': event.pk
         }
-        response = self.client.get(reverse('publish_ajax_event'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
+        response = self.client.post(reverse('publish_ajax_event'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
         data = response.json()
         self.assertEqual(response.status_code, 200)
         self.assertEqual(data['publish'], True)
@@ -238,13 +325,13 @@ class ViewTests(TestCase):
     ## Test events publish change to publish from true to false view logged in
     def test_events_publish_ajax_true_to_false_and_validation_logged_in(self):
         login = self.client.login(username='annacarter', password='MyPassword123') 
-        author = User.objects.get(pk=2)
+        author = User.objects.get(pk=1)
         # event publish set to false
         event = Event.objects.create(title='Charity Fair', description="Location tbc", date = "2024-11-10", publish = True, author=author) 
         data = {
             'event_id': event.pk
         }
-        response = self.client.get(reverse('publish_ajax_event'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
+        response = self.client.post(reverse('publish_ajax_event'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
         data = response.json()
         self.assertEqual(response.status_code, 200)
         self.assertEqual(data['publish'], False)
@@ -260,7 +347,7 @@ class ViewTests(TestCase):
         self.assertContains(response, '<table id="taskTable"', status_code=200)
         # Check correct edit form has been loaded, ie. Task of event with pk=1
         self.assertContains(response, '<td class="taskTitle taskData" name="title">This is the task title</td>', status_code=200)
-        self.assertContains(response, '<button class="task_edit_button" onClick=\'editTask(2, );', status_code=200)
+        self.assertContains(response, '<button class="task_edit_button" onClick=\'editTask(2, 1);', status_code=200)
 
     ## Test - task form view create new task
     def test_task_create_new_logged_in(self):
@@ -309,7 +396,7 @@ class ViewTests(TestCase):
         data = {
             "task_id": task.pk
         }
-        response = self.client.get(reverse('complete_task'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
+        response = self.client.post(reverse('complete_task'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
         data = response.json()
         self.assertEqual(response.status_code, 200)
         self.assertEqual(data['complete'], True)
@@ -320,7 +407,7 @@ class ViewTests(TestCase):
         data = {
             "task_id": task.pk
         }
-        response = self.client.get(reverse('complete_task'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
+        response = self.client.post(reverse('complete_task'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
         self.assertEqual(response.status_code, 200)
 
     # Test - task can be set to uncomplete with ajax function when user is logged in.
@@ -332,7 +419,7 @@ class ViewTests(TestCase):
         data = {
             "task_id": task.pk
         }
-        response = self.client.get(reverse('complete_task'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
+        response = self.client.post(reverse('complete_task'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
         data = response.json()
         self.assertEqual(response.status_code, 200)
         self.assertEqual(data['complete'], False)
@@ -344,7 +431,7 @@ class ViewTests(TestCase):
         data = {
             "task_id": task.pk
         }
-        response = self.client.get(reverse('complete_task'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
+        response = self.client.post(reverse('complete_task'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest', follow=True)
         self.assertEqual(response.status_code, 200)
 
     # Test - task can be edited with ajax function when user is logged in.
@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from events.models import Event, RegisteredEvent, User
+from datetime import date, timedelta
+from django.urls import reverse
+
+ADMITTED = RegisteredEvent.Status.ADMITTED
+WAITLISTED = RegisteredEvent.Status.WAITLISTED
+
+
+# Registrations past an event's capacity wait in order for a spot
+class WaitlistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username='member%d' % i, email='member%d@surrey.ac.uk' % i) for i in range(5)]
+        cls.users[0].set_password('MyPassword123')
+        cls.users[0].save()
+        cls.event = Event.objects.create(title='Rugby Party', description="Location tbc", date=date.today()+timedelta(days=10), publish=True, capacity=2)
+
+    def setUp(self):
+        cache.clear()
+
+    def register_all(self):
+        return [RegisteredEvent.objects.register(user, self.event)[0] for user in self.users]
+
+    def statuses(self):
+        return list(RegisteredEvent.objects.filter(event=self.event).order_by('pk').values_list('status', flat=True))
+
+    ## Test - registrations past the capacity are waitlisted in order
+    def test_waitlist_order(self):
+        registrations = self.register_all()
+        self.assertEqual(self.statuses(), [ADMITTED, ADMITTED, WAITLISTED, WAITLISTED, WAITLISTED])
+        self.assertEqual([RegisteredEvent.objects.waitlist_position(registration) for registration in registrations[2:]], [1, 2, 3])
+
+    ## Test - cancelling an admitted registration admits the head of the waitlist
+    def test_cancel_promotes(self):
+        self.register_all()
+        self.assertTrue(RegisteredEvent.objects.cancel(self.users[0], self.event.pk))
+        self.assertEqual(self.statuses(), [ADMITTED, ADMITTED, WAITLISTED, WAITLISTED])
+        self.assertEqual(RegisteredEvent.objects.get(member=self.users[2]).status, ADMITTED)
+        # a waitlisted cancellation frees no spot
+        RegisteredEvent.objects.cancel(self.users[3], self.event.pk)
+        self.assertEqual(RegisteredEvent.objects.get(member=self.users[4]).status, WAITLISTED)
+        self.assertFalse(RegisteredEvent.objects.cancel(self.users[3], self.event.pk))
+        self.assertEqual(Event.objects.get(pk=self.event.pk).registered_count, 2)
+
+    ## Test - nobody skips the waitlist while people are waiting
+    def test_no_queue_jumping(self):
+        self.register_all()
+        Event.objects.filter(pk=self.event.pk).update(capacity=10)
+        registration, created = RegisteredEvent.objects.register(User.objects.create(username='late', email='late@surrey.ac.uk'), self.event)
+        self.assertEqual(registration.status, WAITLISTED)
+
+    ## Test - raising the capacity admits the waitlist
+    def test_capacity_raised(self):
+        self.register_all()
+        self.event.refresh_from_db()
+        self.event.capacity = 4
+        self.event.save()
+        self.assertEqual(self.statuses(), [ADMITTED] * 4 + [WAITLISTED])
+        self.assertEqual(Event.objects.get(pk=self.event.pk).registered_count, 4)
+
+    ## Test - the cancel endpoint cancels the logged in user's registration
+    def test_cancel_view(self):
+        self.register_all()
+        self.client.login(username='member0', password='MyPassword123')
+        response = self.client.post(reverse('cancel_registration'), {'event_id': self.event.pk})
+        self.assertEqual(response.json(), {'cancel_success': True})
+        response = self.client.post(reverse('cancel_registration'), {'event_id': self.event.pk})
+        self.assertEqual(response.json(), {'cancel_success': False})
+        self.assertEqual(RegisteredEvent.objects.get(member=self.users[2]).status, ADMITTED)
+
+    ## Test - the registered events page marks waitlisted registrations
+    def test_registered_events_page(self):
+        self.event.capacity = 0
+        self.event.save()
+        RegisteredEvent.objects.register(self.users[0], self.event)
+        self.client.login(username='member0', password='MyPassword123')
+        response = self.client.get(reverse('registered_events_index'))
+        self.assertContains(response, 'On the waitlist')
+
+
+# Concurrent registrations and cancellations through the load test command
+class WaitlistLoadTests(TransactionTestCase):
+
+    ## Test - the load test finds no oversubscription
+    def test_loadtest(self):
+        # the command fails on an oversubscribed event or a waitlist served out of order;
+        # the in-memory test database gives up on some locked writes, those are reported
+        out = StringIO()
+        call_command('loadtest_waitlist', registrations=200, capacity=20, threads=4, cancellations=10, stdout=out)
+        self.assertIn('registered_count', out.getvalue())
+        self.assertFalse(Event.objects.filter(title='loadtest-waitlist').exists())
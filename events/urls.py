@@ -6,6 +6,10 @@ urlpatterns = [
     path('', views.events_index_view, name='events_index'),
     # events/id
     path('<int:pk>', views.EventDetailView.as_view(), name='events_detail'),
+    # events/id/stream
+    path('<int:pk>/stream', views.EventStreamView.as_view(), name='event_stream'),
+    # events/id/export/tasks.csv, registrants.ics, ...
+    path('<int:pk>/export/<str:kind>.<str:format>', views.event_export, name='event_export'),
     # events/past
     path('past', views.index_past_events, name="past_events"),
     # events/nextweek
@@ -14,6 +18,10 @@ urlpatterns = [
     path('future', views.index_future_events, name="future_events"),
     # events/registered
     path('registered', views.index_registered_events, name="registered_events_index"),
+    # events/calendar/token.ics
+    path('calendar/<str:token>.ics', views.user_calendar, name='user_calendar'),
+    # events/calendar/reset
+    path('calendar/reset', views.reset_calendar, name='reset_calendar'),
     # events/new
     path('new', views.events_create_view, name='events_new'),
     #events/edit/id
@@ -32,4 +40,14 @@ urlpatterns = [
     path('deletetask', views.DeleteTaskView.as_view(), name='delete_task'),
     #/events/edittask
     path('edittask', views.EditTaskView.as_view(), name='task_ajax_update'),
+    #/events/tasks/bulk/complete
+    path('tasks/bulk/complete', views.BulkCompleteTaskView.as_view(), name='bulk_complete_tasks'),
+    #/events/tasks/bulk/delete
+    path('tasks/bulk/delete', views.BulkDeleteTaskView.as_view(), name='bulk_delete_tasks'),
+    #/events/tasks/bulk/edit
+    path('tasks/bulk/edit', views.BulkEditTaskView.as_view(), name='bulk_edit_tasks'),
+    #/events/people/autocomplete
+    path('people/autocomplete', views.person_autocomplete, name='person_autocomplete'),
+    #/events/search?q=
+    path('search', views.search_events, name='search_events'),
 ]
\ No newline at end of file
@@ -1,21 +1,48 @@
+import json
+import uuid
 from django.shortcuts import render
 from .models import *
 from django.contrib import messages
 from django.views.generic import ListView, CreateView, DetailView
 from django.shortcuts import (get_object_or_404, render, redirect)
 from .forms import EventForm, TaskForm
-from django.urls import reverse_lazy
+from .feed import feed_changed
+from .pagination import paginated_response
+from .search import search
+from . import exports
+from .calendar_feed import feed_calendar, feed_etag
+from .pubsub import event_channel, publish_event, publish_task, subscribe, unsubscribe
+from .permissions import AsyncLoginRequiredMixin, is_admin
+from django.urls import reverse, reverse_lazy
+from django.db.models import Q
 from django.views.generic import View 
-from django.http import JsonResponse, HttpResponseRedirect
+from django.http import JsonResponse, HttpResponse, HttpResponseRedirect, Http404, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from datetime import timedelta
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST, require_safe
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
 from django.utils import timezone
+from django.core.paginator import Paginator
+from django.conf import settings
+from django.db import transaction
+from asgiref.sync import sync_to_async
+import asyncio
 
 
-def is_admin(user):
-    return user.groups.filter(name='EventsAdminUsers').exists()
+REGISTERED_EVENTS_PER_PAGE = 24
+BULK_TASK_LIMIT = 500
+PERSON_AUTOCOMPLETE_LIMIT = 20
+SEARCH_RESULTS_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+# the live event stream: browser reconnect delay, keepalive comment interval and
+# how long one stream stays open before the browser reconnects
+STREAM_RETRY_MS = 3000
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_MAX_SECONDS = 300
 
 #----------- EVENTS VIEW -----------#
 
@@ -23,65 +50,59 @@ def is_admin(user):
 @login_required
 def events_index_view(request):
     context = {}
-    if is_admin(request.user): 
-        context["events_past"] = Event.objects.filter(date__lt = timezone.now())
-        context["events_week"] = Event.objects.filter(date__range = [timezone.now(), timezone.now()+timedelta(days=7)])
-        context["events_future"] = Event.objects.filter(date__gt = timezone.now()+timedelta(days=7))
-    else:
-        context["events_past"] = Event.objects.filter(author=request.user, date__lt = timezone.now())
-        context["events_week"] = Event.objects.filter(author=request.user, date__range = [timezone.now(), timezone.now()+timedelta(days=7)])
-        context["events_future"] = Event.objects.filter(author=request.user, date__gt = timezone.now()+timedelta(days=7))
+    events = Event.objects.visible_to(request.user, is_admin(request.user))
+    buckets = events.dashboard(timezone.localdate())
+    for name in ('past', 'week', 'future'):
+        context["events_" + name] = buckets[name]['first']
+        context["events_" + name + "_count"] = buckets[name]['count']
+        context["events_" + name + "_more"] = buckets[name]['more']
     return render(request, 'events/index.html', context)
 
 #  view past events
 @login_required
 def index_past_events(request):
     context = {}
-    if is_admin(request.user): 
-        context["events_list"] = Event.objects.filter(date__lt = timezone.now())
-    else:
-        context["events_list"] = Event.objects.filter(date__lt = timezone.now(), author=request.user)
-        context["title"] = "PAST EVENTS"
-    return render(request, 'events/events_view.html', context)
+    events = Event.objects.visible_to(request.user, is_admin(request.user))
+    context["title"] = "PAST EVENTS"
+    return paginated_response(request, events.filter(date__lt = timezone.localdate()), 'events/events_view.html', context)
 
 #  view events next week
 @login_required
 def index_nextweek_events(request):
     context = {}
-    if is_admin(request.user): 
-        context["events_list"] = Event.objects.filter(date__range = [timezone.now(), timezone.now()+timedelta(days=7)])
-        context['today'] = timezone.now()
-    else:
-        context["events_list"] = Event.objects.filter(date__range = [timezone.now(), timezone.now()+timedelta(days=7)], author=request.user)
-        context['today'] = timezone.now()
+    today = timezone.localdate()
+    events = Event.objects.visible_to(request.user, is_admin(request.user))
+    context['today'] = today
     context["title"] = "EVENTS WITHIN A WEEK"
-    return render(request, 'events/events_view.html', context)
+    return paginated_response(request, events.filter(date__range = [today, today+timedelta(days=7)]), 'events/events_view.html', context)
 
 #  view events > a week from today
 @login_required
 def index_future_events(request):
     context = {}
-    if is_admin(request.user): 
-        context["events_list"] = Event.objects.filter(date__gt = timezone.now()+timedelta(days=7))
-        context['today'] = timezone.now()
-    else:
-        context["events_list"] = Event.objects.filter(date__gt = timezone.now()+timedelta(days=7), author=request.user)
-        context['today'] = timezone.now()
+    today = timezone.localdate()
+    events = Event.objects.visible_to(request.user, is_admin(request.user))
+    context['today'] = today
     context["title"] = "EVENTS IN OVER A WEEK"
-    return render(request, 'events/events_view.html', context)
+    return paginated_response(request, events.filter(date__gt = today+timedelta(days=7)), 'events/events_view.html', context)
 
 # event detail view
 class EventDetailView(LoginRequiredMixin, DetailView): 
     model = Event
     template_name = 'events/detail_view.html'
+
+    def get_queryset(self):
+        # the event and its author in one query
+        return Event.objects.select_related('author')
+
     def get_context_data(self, **kwargs):
-        event = Event.objects.get(id=self.kwargs['pk'])
-        context = {}
-        if(self.request.user == event.author or is_admin(self.request.user)):
-            context['event'] = Event.objects.get(id=self.kwargs['pk']) 
-            context['task_list'] = Task.objects.filter(event__id=self.kwargs['pk'])
-        else:
+        event = self.object
+        if(self.request.user != event.author and not(is_admin(self.request.user))):
             raise PermissionDenied()
+        context = super().get_context_data(**kwargs)
+        # lazy, so a cached task list fragment for this event version skips the query
+        context['task_list'] = event.task_set.select_related('person').order_by('deadline', 'id')
+        context['task_cache_timeout'] = settings.EVENT_TASKS_CACHE_TIMEOUT
         return context
 
 # create event
@@ -133,14 +154,75 @@ def events_delete_view(request, nid):
     return redirect('events_index')
 
 # publish the event
-class PublishEvent(LoginRequiredMixin, View):
- def get(self, request):
-  eid = request.GET.get('event_id')
-  event = get_object_or_404(Event, pk=eid)
-  event.publish = not(event.publish)
-  event.save()
+class PublishEvent(AsyncLoginRequiredMixin, View):
+ async def post(self, request):
+  eid = request.POST.get('event_id')
+  # only events this user manages, any other id is not found
+  events = Event.objects.visible_to(request.user, await sync_to_async(is_admin)(request.user))
+  # flipped in the database, writing only the publish column and the event version
+  publish = await sync_to_async(toggle_flag)(events.filter(pk=eid), 'publish', version=uuid.uuid4())
+  if publish is None:
+   raise Http404()
+  # update() skips the event signals, the public feed, calendar feeds and live pages change here
+  await sync_to_async(feed_changed)()
+  await CalendarFeed.objects.for_events(Event.objects.filter(pk=eid)).achanged()
+  publish_event(int(eid), 'updated', publish=publish)
+
+  return JsonResponse({'publish': publish, 'eid': eid}, status=200)
 
-  return JsonResponse({'publish': event.publish, 'eid': eid}, status=200)
+#-----------EVENT EXPORTS-----------#
+
+# an event's tasks or registrants as a CSV or iCalendar download, streamed from
+# the database a chunk at a time, see events.exports
+@login_required
+def event_export(request, pk, kind, format):
+    if kind not in exports.EXPORTS or format not in exports.FORMATS:
+        raise Http404()
+    event = get_object_or_404(Event, pk=pk)
+    if(request.user != event.author and not(is_admin(request.user))):
+        raise PermissionDenied()
+    export = exports.EXPORTS[kind](event, request.get_host().split(':')[0])
+    response = StreamingHttpResponse(exports.stream(export, format, isinstance(request, ASGIRequest)),
+        content_type=exports.CONTENT_TYPES[format])
+    response['Content-Disposition'] = 'attachment; filename="event-%d-%s.%s"' % (event.pk, kind, format)
+    return response
+
+#-----------LIVE EVENT STREAM-----------#
+
+# Server-sent events with the event's task and event changes, see events.pubsub.
+# Only the ASGI server can hold a stream open without tying up a worker; under
+# WSGI the view answers 204, which tells EventSource not to reconnect.
+class EventStreamView(AsyncLoginRequiredMixin, View):
+ async def get(self, request, pk):
+  event = await Event.objects.filter(pk=pk).only('author_id').afirst()
+  if event is None:
+   raise Http404()
+  allowed = await sync_to_async(lambda: event.author_id == request.user.pk or is_admin(request.user))()
+  if not allowed:
+   raise PermissionDenied()
+  if not isinstance(request, ASGIRequest):
+   return HttpResponse(status=204)
+  response = StreamingHttpResponse(self.stream(event_channel(pk)), content_type='text/event-stream')
+  response['Cache-Control'] = 'no-cache'
+  # proxies must pass each message on as it is written
+  response['X-Accel-Buffering'] = 'no'
+  return response
+
+ async def stream(self, channel):
+  subscription = subscribe(channel)
+  try:
+   yield 'retry: %d\n\n' % STREAM_RETRY_MS
+   loop = asyncio.get_running_loop()
+   closes = loop.time() + STREAM_MAX_SECONDS
+   while loop.time() < closes:
+    try:
+     message = await asyncio.wait_for(subscription.get(), min(STREAM_KEEPALIVE_SECONDS, closes - loop.time()))
+    except asyncio.TimeoutError:
+     yield ': keepalive\n\n'
+     continue
+    yield 'event: %s\ndata: %s\n\n' % (message['type'], json.dumps(message))
+  finally:
+   unsubscribe(subscription)
 
 #-----------SIGNED UP EVENTS VIEW-----------#
 
@@ -148,24 +230,52 @@ class PublishEvent(LoginRequiredMixin, View):
 @login_required
 def index_registered_events(request):
     context = {}
-    # User
-    user1 = request.user
-    # Store the events the user is registered on in a list to pass into the rendering template   
-    list = []
-    for item in RegisteredEvent.objects.all():
-        # Get the event and user for each RegisterdEvent object
-        event = getattr(item,'event')
-        user = getattr(item,'member')
-        # Get the primary key attributes of event and user for each event and user object in the RegisteredEvent
-        # set of objects to check if the user is registered for that event
-        db_u_id = getattr(user, 'id')
-        if(str(db_u_id) == str(user1.id)):
-            list.append(event)
-    
-    context["registered_events"] = list
+    # Only this user's registrations, read through the (member, event) index with the
+    # event joined in the same query, so the page cost follows the user's own registrations
+    registrations = (RegisteredEvent.objects
+        .filter(member=request.user, event__publish=True)
+        .select_related('event')
+        .order_by('event__date', 'pk'))
+    page = Paginator(registrations, REGISTERED_EVENTS_PER_PAGE).get_page(request.GET.get('page'))
+    context["registered_events"] = [item.event for item in page]
+    context["waitlisted_ids"] = {item.event_id for item in page if item.status == RegisteredEvent.Status.WAITLISTED}
+    context["page_obj"] = page
+    feed = CalendarFeed.objects.filter(user=request.user).only('token').first()
+    if feed is not None:
+        context["calendar_url"] = request.build_absolute_uri(reverse('user_calendar', kwargs={'token': feed.token}))
 
     return render(request, "events/registered_events.html", context)
 
+#-----------CALENDAR FEED-----------#
+
+# A user's calendar (see events.calendar_feed), fetched by calendar apps with the
+# token in the URL instead of a session. Polls that send the current ETag or
+# Last-Modified get a 304 after one indexed lookup.
+@require_safe
+def user_calendar(request, token):
+    feed = CalendarFeed.objects.filter(token=token).only('user_id', 'version', 'modified').first()
+    if feed is None:
+        raise Http404()
+    etag, last_modified = feed_etag(feed), int(feed.modified.timestamp())
+    # only the ETag decides a 304: Last-Modified has whole seconds, and a change in the
+    # same second as a client's last fetch would leave it with the old calendar
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(feed_calendar(feed, request), content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # the token is the only credential, shared caches must not keep the feed
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+# a new calendar link, the old one stops working
+@login_required
+@require_POST
+def reset_calendar(request):
+    CalendarFeed.objects.update_or_create(user=request.user, defaults={'token': calendar_token()})
+    messages.add_message(request, messages.SUCCESS, 'New calendar link created')
+    return redirect('registered_events_index')
+
 
 #-----------TASK VIEWS-----------#
 
@@ -176,7 +286,13 @@ class TaskListView(LoginRequiredMixin, ListView):
  context_object_name = 'task_list'
 
  def get_queryset(self):
-  return Task.objects.filter(event__id=self.kwargs['nid'])
+  # in the detail page's order, the live page reloads it to add new tasks
+  return Task.objects.filter(event__id=self.kwargs['nid']).select_related('person').order_by('deadline', 'id')
+
+ def get_context_data(self, **kwargs):
+  context = super().get_context_data(**kwargs)
+  context['nid'] = self.kwargs['nid']
+  return context
 
 # create a task
 class CreateTaskView(LoginRequiredMixin, CreateView):
@@ -192,31 +308,154 @@ class CreateTaskView(LoginRequiredMixin, CreateView):
   return reverse_lazy('events_detail', kwargs={'pk':self.kwargs['nid']})
 
 # complete a task
-class CompleteTaskView(LoginRequiredMixin, View):
- def get(self, request):
-  tid = request.GET.get('task_id')
-  task = get_object_or_404(Task, pk=tid)
-  task.complete = not(task.complete)
-  task.save()
-  return JsonResponse({'complete': task.complete, 'tid': tid}, status=200)
+class CompleteTaskView(AsyncLoginRequiredMixin, View):
+ async def post(self, request):
+  tid = request.POST.get('task_id')
+  # only tasks of events this user manages, any other id is not found
+  events = Event.objects.visible_to(request.user, await sync_to_async(is_admin)(request.user))
+  # flipped in the database, writing only the complete column
+  complete = await sync_to_async(toggle_flag)(Task.objects.filter(pk=tid, event__in=events), 'complete')
+  if complete is None:
+   raise Http404()
+  # update() skips the task signals, refresh the event's cached task list and live page here
+  eid = await Task.objects.filter(pk=tid).values_list('event_id', flat=True).afirst()
+  await Event.objects.filter(pk=eid).atouch()
+  publish_task(eid, 'updated', int(tid), complete=complete)
+  return JsonResponse({'complete': complete, 'tid': tid}, status=200)
 
 # delete a task
-class DeleteTaskView(LoginRequiredMixin, View):
- def get(self, request):
+class DeleteTaskView(AsyncLoginRequiredMixin, View):
+ async def get(self, request):
   tid = request.GET.get('task_id')
   try:
-   task = Task.objects.get(pk=tid)
+   task = await Task.objects.aget(pk=tid)
   except Task.DoesNotExist:
    return JsonResponse({'delete_success': False, 'tid': tid}, status=200)
-  task.delete()
+  await task.adelete()
   return JsonResponse({'delete_success': True, 'tid': tid}, status=200)
 
 # edit a task
 class EditTaskView(LoginRequiredMixin, View):
      def post(self, request):
         obj = Task.objects.filter(id = request.POST.get('taskId'))
-        obj.update(title = request.POST.get('taskTitle'),description = request.POST.get('taskDescription'))
+        title, description = request.POST.get('taskTitle'), request.POST.get('taskDescription')
+        obj.update(title = title,description = description)
+        # update() skips the task signals, refresh the event's cached task list and live page here
+        Event.objects.filter(task__in=obj).touch()
+        for tid, eid in obj.values_list('id', 'event_id'):
+            transaction.on_commit(lambda tid=tid, eid=eid: publish_task(eid, 'updated', tid, title=title, description=description))
         return HttpResponseRedirect('' + request.POST.get('eventId'))
 
+#-----------BULK TASK VIEWS-----------#
+
+# Shared parsing for the bulk task endpoints. Requests are JSON bodies holding
+# at most BULK_TASK_LIMIT tasks, each batch runs in one transaction and the
+# response has one result per requested task, in request order.
+class BulkTaskView(LoginRequiredMixin, View):
+ def post(self, request):
+  try:
+   data = json.loads(request.body)
+   if not isinstance(data, dict):
+    raise ValueError('expected a JSON object')
+   with transaction.atomic():
+    results = self.run(request, data)
+  except (ValueError, TypeError) as error:
+   return JsonResponse({'error': str(error)}, status=400)
+  return JsonResponse({'results': results}, status=200)
+
+ def task_ids(self, values):
+  if not isinstance(values, list) or not values:
+   raise ValueError('expected a list of task ids')
+  if len(values) > BULK_TASK_LIMIT:
+   raise ValueError('at most %d tasks per request' % BULK_TASK_LIMIT)
+  # duplicates are handled once, keeping the request order
+  return list(dict.fromkeys(int(value) for value in values))
+
+ def tasks(self, request, ids):
+  # only tasks of events this user manages
+  tasks = Task.objects.filter(pk__in=ids)
+  if is_admin(request.user):
+   return tasks
+  return tasks.filter(event__author=request.user)
+
+# complete, uncomplete or (without "complete") toggle a list of tasks with one UPDATE
+class BulkCompleteTaskView(BulkTaskView):
+ def run(self, request, data):
+  ids = self.task_ids(data.get('task_ids'))
+  complete = data.get('complete')
+  if complete is not None and not isinstance(complete, bool):
+   raise ValueError('complete must be true, false or left out to toggle')
+  tasks = self.tasks(request, ids)
+  tasks.update(complete=flipped('complete') if complete is None else complete)
+  rows = list(tasks.values_list('id', 'complete', 'event_id'))
+  states = {tid: state for tid, state, eid in rows}
+  # update() skips the task signals, refresh the events' cached task lists and live pages here
+  Event.objects.filter(task__in=list(states)).touch()
+  transaction.on_commit(lambda: [publish_task(eid, 'updated', tid, complete=state) for tid, state, eid in rows])
+  return [{'tid': tid, 'success': tid in states, 'complete': states.get(tid)} for tid in ids]
 
+# delete a list of tasks with one DELETE
+class BulkDeleteTaskView(BulkTaskView):
+ def run(self, request, data):
+  ids = self.task_ids(data.get('task_ids'))
+  found = set(self.tasks(request, ids).values_list('id', flat=True))
+  Task.objects.filter(pk__in=found).delete()
+  return [{'tid': tid, 'delete_success': tid in found} for tid in ids]
+
+# edit the title and description of a list of tasks with one bulk_update
+class BulkEditTaskView(BulkTaskView):
+ def run(self, request, data):
+  edits = data.get('tasks')
+  if not isinstance(edits, list):
+   raise ValueError('expected a list of tasks')
+  changes = {}
+  for edit in edits:
+   if not isinstance(edit, dict):
+    raise ValueError('expected a list of tasks')
+   title, description = edit.get('title'), edit.get('description')
+   if not title or not description or not isinstance(title, str) or not isinstance(description, str):
+    raise ValueError('every task needs a title and a description')
+   if len(title) > Task._meta.get_field('title').max_length:
+    raise ValueError('task title is too long')
+   changes[int(edit.get('id'))] = (title, description)
+  ids = self.task_ids(list(changes))
+  tasks = self.tasks(request, ids).in_bulk()
+  for tid, task in tasks.items():
+   task.title, task.description = changes[tid]
+  Task.objects.bulk_update(tasks.values(), ['title', 'description'])
+  Event.objects.filter(task__in=list(tasks)).touch()
+  transaction.on_commit(lambda: [
+   publish_task(task.event_id, 'updated', tid, title=task.title, description=task.description) for tid, task in tasks.items()])
+  return [{'tid': tid, 'success': tid in tasks} for tid in ids]
+
+# person names starting with the typed text, for the task form's autocomplete
+@login_required
+def person_autocomplete(request):
+    text = request.GET.get('q', '').strip()
+    people = Person.objects.filter(name__istartswith=text).order_by('name', 'id') if text else Person.objects.none()
+    return JsonResponse({'people': [{'id': pk, 'name': name} for pk, name in people.values_list('id', 'name')[:PERSON_AUTOCOMPLETE_LIMIT]]})
 
+# events whose title or description match ?q=, best match first: published
+# events for everyone, and the user's own events (every event for admins)
+def search_events(request):
+    try:
+        limit = min(max(int(request.GET.get('limit', SEARCH_RESULTS_LIMIT)), 1), SEARCH_MAX_LIMIT)
+    except ValueError:
+        limit = SEARCH_RESULTS_LIMIT
+    events = Event.objects.all()
+    if not is_admin(request.user):
+        visible = Q(publish=True)
+        if request.user.is_authenticated:
+            visible |= Q(author=request.user)
+        events = events.filter(visible)
+    results = search(request.GET.get('q', ''), events, limit)
+    admin = is_admin(request.user)
+    return JsonResponse({'results': [{
+        'id': event.pk,
+        'title': event.title,
+        'description': event.description,
+        'date': event.date,
+        'publish': event.publish,
+        # the detail page is only open to the author and admins
+        'url': reverse('events_detail', kwargs={'pk': event.pk}) if admin or (event.author_id is not None and event.author_id == request.user.pk) else None,
+    } for event in results]})
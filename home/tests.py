@@ -1,7 +1,9 @@
 from django.test import TestCase
 from events.models import Event, User, RegisteredEvent
 from django.urls import reverse
-from datetime import date
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db import transaction, IntegrityError
 from .forms import UserCreationWithEmailForm
 import json
 
@@ -283,6 +285,48 @@ class HomeTests(TestCase):
         self.assertEqual(db_count+1, RegisteredEvent.objects.count())
 
 
+    # Registering twice for the same event only stores one registration
+    def test_register_twice_creates_one_registration(self):
+        user1=User.objects.get(pk=1)
+        event2=Event.objects.get(pk=2)
+        data={
+            "event_id": event2.pk,
+            "user_id": user1.pk
+        }
+        first = self.client.get(reverse('register_event'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        second = self.client.get(reverse('register_event'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(first.json()['register_success'], True)
+        self.assertEqual(second.json()['register_success'], False)
+        self.assertEqual(RegisteredEvent.objects.filter(event=event2, member=user1).count(), 1)
+
+    # The unique constraint rejects a duplicate registration inserted directly
+    def test_duplicate_registration_rejected_by_database(self):
+        user1=User.objects.get(pk=1)
+        event1=Event.objects.get(pk=1)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                RegisteredEvent.objects.create(event=event1, member=user1)
+
+    # Registering costs the same number of queries however many registrations exist
+    def test_register_query_count_does_not_grow(self):
+        user1=User.objects.get(pk=1)
+        event2=Event.objects.get(pk=2)
+        event3=Event.objects.get(pk=3)
+        others = [User.objects.create(username='member%d' % i, email='member%d@surrey.ac.uk' % i) for i in range(20)]
+        for other in others:
+            RegisteredEvent.objects.create(event=event2, member=other)
+            RegisteredEvent.objects.create(event=event3, member=other)
+        # event lookup, user lookup, registration lookup, then the spot claimed on the
+        # event's counter and the insert, wrapped in a savepoint, and the member's calendar feed
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('register_event'), data={"event_id": event2.pk, "user_id": user1.pk})
+        self.assertEqual(response.json()['register_success'], True)
+        # event lookup, user lookup and the registration lookup
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('register_event'), data={"event_id": event2.pk, "user_id": user1.pk})
+        self.assertEqual(response.json()['register_success'], False)
+
+
     ## View only published events on homepage
     def test_view_of_published_event(self):
         event1 = Event.objects.get(pk=1)
@@ -301,3 +345,64 @@ class HomeTests(TestCase):
             response = self.client.get(reverse('home'),data=data, follow=True)
             self.assertNotContains(response, event1.title, status_code=200)
 
+
+
+#----------- Public events feed -----------#
+
+class PublicFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user1 = User(username='annacarter', email='anna@surrey.ac.uk') 
+        user1.set_password('MyPassword123')
+        user1.save()
+        cls.published = Event.objects.create(title='Rugby Party', description="Location tbc", date=date.today()+timedelta(days=10), publish=True, author=user1)
+        cls.unpublished = Event.objects.create(title='Alfies 1st Birthday', description="Location tbc", date=date.today()+timedelta(days=10), author=user1)
+
+    def setUp(self):
+        cache.clear()
+
+    ## Only published events are read from the database
+    def test_feed_only_loads_published_events(self):
+        response = self.client.get(reverse('home'))
+        self.assertEqual([event.pk for event in response.context['events_list']], [self.published.pk])
+        self.assertNotContains(response, 'Alfies 1st Birthday', status_code=200)
+
+    ## A repeated anonymous visit is served from the cache without queries
+    def test_feed_cached_for_anonymous_visitors(self):
+        first = self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('home'))
+        self.assertEqual(first.content, second.content)
+        self.client.get(reverse('home'), {'format': 'json'})
+        with self.assertNumQueries(0):
+            data = self.client.get(reverse('home'), {'format': 'json'}).json()
+        self.assertEqual([event['id'] for event in data['events']], [self.published.pk])
+
+    ## Saving or deleting an event refreshes the cached feed once it is committed
+    def test_feed_refreshed_on_event_change(self):
+        self.client.get(reverse('home'))
+        self.published.title = 'Rugby Social'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.published.save()
+        self.assertNotContains(self.client.get(reverse('home')), 'Rugby Social', status_code=200)
+        for callback in callbacks:
+            callback()
+        self.assertContains(self.client.get(reverse('home')), 'Rugby Social', status_code=200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.published.delete()
+        self.assertNotContains(self.client.get(reverse('home')), 'Rugby Social', status_code=200)
+
+    ## Publishing an event refreshes the cached feed
+    def test_feed_refreshed_on_publish(self):
+        self.assertNotContains(self.client.get(reverse('home')), 'Alfies 1st Birthday', status_code=200)
+        self.client.login(username='annacarter', password='MyPassword123')
+        self.client.post(reverse('publish_ajax_event'), {'event_id': self.unpublished.pk})
+        self.client.logout()
+        self.assertContains(self.client.get(reverse('home')), 'Alfies 1st Birthday', status_code=200)
+
+    ## Logged in users get their own register buttons, not the cached page
+    def test_feed_not_cached_for_users(self):
+        self.client.get(reverse('home'))
+        self.client.login(username='annacarter', password='MyPassword123')
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '<button id="register-button-login"', status_code=200)
@@ -5,4 +5,5 @@ urlpatterns = [
     path('', views.show_all_events, name='home'),
     path('signup', views.RegisterUser.as_view(), name='signup_user'),
     path('home/register', views.RegisterEvents.as_view(), name='register_event'),
+    path('home/cancel', views.CancelRegistration.as_view(), name='cancel_registration'),
 ]
\ No newline at end of file
@@ -3,9 +3,16 @@ from django.views.generic import CreateView
 from django.contrib.auth.models import User
 from django.urls import reverse_lazy
 from events.models import Event, RegisteredEvent
-from django.http import JsonResponse
+from events.permissions import AsyncLoginRequiredMixin
+from asgiref.sync import sync_to_async
+from events.pagination import paginated_response
+from events.feed import FEED_CACHE_TIMEOUT, feed_cache_key
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404, HttpResponse, JsonResponse
 from django.views.generic import View 
-from django.shortcuts import (get_object_or_404, render)
+from django.shortcuts import render
 from django.utils import timezone
 
 # Create your views here.
@@ -25,36 +32,53 @@ class RegisterUser(CreateView):
 # show events view
 def show_all_events(request):
     context = {}
-    context["events_list"] = Event.objects.filter(date__gt = timezone.now())
-    return render(request, 'home/home.html', context)
+    today = timezone.localdate()
+    # anonymous visitors all get the same page, served from the cache until an event
+    # changes, pages showing a flash message or a logged in user are rendered every time
+    cacheable = not request.user.is_authenticated and not len(messages.get_messages(request))
+    if cacheable:
+        key = feed_cache_key(request, today)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+    # only published events, read through the partial (date, id) index
+    events = Event.objects.filter(publish=True, date__gt=today)
+    if cacheable:
+        # the page is cached under the newest feed version, read it from the primary
+        # so a replica that has not caught up yet is not cached for everyone
+        events = events.using(DEFAULT_DB_ALIAS)
+    response = paginated_response(request, events, 'home/home.html', context)
+    if cacheable and response.status_code == 200:
+        cache.set(key, (response.content, response['Content-Type']), FEED_CACHE_TIMEOUT)
+    return response
 
 # user register to events
 class RegisterEvents(View):
-    def get(self, request):
+    async def get(self, request):
     # get the event and user from the request
         e_id = request.GET.get('event_id')
         u_id = request.GET.get('user_id')
-        # Flag used to check if user is already registered to an event
-        flag = False
-        for item in RegisteredEvent.objects.all():
-            # Get the event and user for each RegisterdEvent object
-            event = getattr(item,'event')
-            user = getattr(item,'member')
-            # Get the primary key attributes of event and user for each event and user object in the RegisteredEvent
-            # query set of objects to check if the user wanting to register for that event has already 
-            # registerd
-            db_e_id = getattr(event, 'pk')
-            db_u_id = getattr(user, 'pk')
-            # if statement to check if the user wanting to register for that event has already 
-            # registerd
-            if(e_id == str(db_e_id) and u_id == str(db_u_id)):
-                flag = True
+        try:
+            event = await Event.objects.aget(pk=e_id)
+            user = await User.objects.aget(pk=u_id)
+        except (Event.DoesNotExist, User.DoesNotExist):
+            raise Http404()
+        # Single indexed lookup on (member, event), the registration is only
+        # inserted when the user is not registered for that event yet; a full
+        # event puts it on the waitlist
+        register, created = await RegisteredEvent.objects.aregister(member=user, event=event)
+        data = {'register_success': created, 'waitlisted': register.status == RegisteredEvent.Status.WAITLISTED}
+        if data['waitlisted']:
+            data['position'] = await sync_to_async(RegisteredEvent.objects.waitlist_position)(register)
+        return JsonResponse(data, status=200)
 
-        if(flag==True):
-            return JsonResponse({'register_success': False}, status=200)
-        else:
-            event = get_object_or_404(Event, pk=e_id)
-            user = get_object_or_404(User, pk=u_id)
-            register = RegisteredEvent.objects.create(event=event, member=user)
-            register.save()
-            return JsonResponse({'register_success': True}, status=200)
\ No newline at end of file
+# user cancels their registration, an admitted registration's spot goes to the waitlist
+class CancelRegistration(AsyncLoginRequiredMixin, View):
+    async def post(self, request):
+        try:
+            e_id = int(request.POST.get('event_id'))
+        except (TypeError, ValueError):
+            raise Http404()
+        cancelled = await sync_to_async(RegisteredEvent.objects.cancel)(request.user, e_id)
+        return JsonResponse({'cancel_success': cancelled}, status=200)
@@ -1,42 +1,92 @@
-// Toggle for task, red to green, incomplete to complete functionality
-async function togglecomplete(task_id){ 
+// Send the CSRF token with every POST, read from the csrftoken cookie or the form token on the page
+function getCsrfToken() {
+    var match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : $('input[name="csrfmiddlewaretoken"]').val();
+}
+$.ajaxSetup({
+    beforeSend: function(xhr, settings) {
+        if (!/^(GET|HEAD|OPTIONS|TRACE)$/i.test(settings.type)) {
+            xhr.setRequestHeader("X-CSRFToken", getCsrfToken());
+        }
+    }
+});
+
+// Task clicks are collected for a moment and sent as one batch, so clearing a
+// long checklist costs a few requests instead of one per task
+var TASK_BATCH_DELAY = 150;
+var pendingToggles = {};
+var pendingDeletes = {};
+var taskBatchTimer = null;
+
+function scheduleTaskBatch() {
+    if (taskBatchTimer === null) {
+        taskBatchTimer = setTimeout(flushTaskBatch, TASK_BATCH_DELAY);
+    }
+}
+
+function postTaskBatch(url, data, success) {
     $.ajax({
-    url: '/events/togglecomplete', 
-    type: 'get',
-    data: {
-    task_id: task_id, 
-    },
-    success: function(response){
-    if(response.complete == true) 
+    url: url,
+    type: 'post',
+    contentType: 'application/json',
+    data: JSON.stringify(data),
+    dataType: 'json',
+    success: success
+    });
+}
+
+function flushTaskBatch() {
+    taskBatchTimer = null;
+    // a task clicked an even number of times is back where it started
+    var toggles = Object.keys(pendingToggles).filter(function(task_id) {
+        return pendingToggles[task_id] % 2 == 1 && !(task_id in pendingDeletes);
+    });
+    var deletes = Object.keys(pendingDeletes);
+    pendingToggles = {};
+    pendingDeletes = {};
+    if (toggles.length > 0) {
+        postTaskBatch('/events/tasks/bulk/complete', {task_ids: toggles}, function(response) {
+            response.results.forEach(function(result) {
+                if (result.success) {
+                    setTaskComplete(result.tid, result.complete);
+                }
+            });
+        });
+    }
+    if (deletes.length > 0) {
+        postTaskBatch('/events/tasks/bulk/delete', {task_ids: deletes}, function(response) {
+            response.results.forEach(function(result) {
+                if (result.delete_success) {
+                    $("#task-"+result.tid).hide();
+                }
+            });
+        });
+    }
+}
+
+// Toggle for task, red to green, incomplete to complete functionality
+function setTaskComplete(task_id, complete) {
+    if(complete == true) 
     {
-    $("#task-"+response.tid).removeClass("incomplete");
-    $("#task-"+response.tid).addClass("complete"); 
+    $("#task-"+task_id).removeClass("incomplete");
+    $("#task-"+task_id).addClass("complete"); 
     }
     else 
     {
-    $("#task-"+response.tid).removeClass("complete");
-    $("#task-"+response.tid).addClass("incomplete"); 
+    $("#task-"+task_id).removeClass("complete");
+    $("#task-"+task_id).addClass("incomplete"); 
     }
-    } 
-    });
+}
+
+async function togglecomplete(task_id){ 
+    pendingToggles[task_id] = (pendingToggles[task_id] || 0) + 1;
+    scheduleTaskBatch();
 }
 
 // Delete task
 async function delete_t(task_id){ 
-    $.ajax({
-    url: '/events/deletetask', 
-    type: 'get',
-    data: {
-    task_id: task_id, 
-    },
-    success: function(response){
-
-    if(response.delete_success == true) 
-    {
-    $("#task-"+response.tid).hide(); 
-    }
-    } 
-    });
+    pendingDeletes[task_id] = true;
+    scheduleTaskBatch();
 }
 
 // Update task
@@ -97,7 +147,7 @@ function updateToTaskTable(task){
 async function setPublish(event_id) {
     $.ajax({
         url: 'publish',
-        type: 'get',
+        type: 'post',
         data: {
             event_id: event_id,
         },
@@ -125,13 +175,141 @@ async function register(event_id, user_id) {
             },
             dataType: 'json',
             success: function (response) {
-                if (response.register_success == true) {
+                if (response.register_success == true && response.waitlisted == true) {
+                    alert("This event is full, you are number " + response.position + " on the waitlist.");
+                } else if (response.register_success == true) {
                     alert("You have been registered! Check our 'Registered Events page'");
-                } 
+                }
                 if (response.register_success == false) { 
                     alert("You are already registered.");
                 }
             } 
         });
 }
-    
\ No newline at end of file
+    
+// Cancel a registration, the spot goes to the first person on the waitlist
+async function cancelRegistration(event_id) {
+    $.ajax({
+        url: '/home/cancel',
+        type: 'post',
+        data: {
+            event_id: event_id,
+        },
+        dataType: 'json',
+        success: function (response) {
+            if (response.cancel_success == true) {
+                $("#cancel-"+event_id).closest(".col").remove();
+            }
+        }
+    });
+}
+
+
+// Person autocomplete on the task form, fills the <datalist> with matching people
+var personSearch;
+$(document).on('input', 'input.person-autocomplete', function() {
+    var input = $(this);
+    clearTimeout(personSearch);
+    personSearch = setTimeout(function() {
+        $.ajax({
+            url: input.data('autocomplete-url'),
+            type: 'get',
+            data: {
+                q: input.val(),
+            },
+            dataType: 'json',
+            success: function(response) {
+                var list = $('#' + input.attr('list')).empty();
+                response.people.forEach(function(person) {
+                    list.append($('<option>').attr('value', person.id).text(person.name));
+                });
+            }
+        });
+    }, 250);
+});
+
+
+// Live event page, changes made elsewhere arrive over server-sent events and are
+// applied in place. The task list is reloaded for new tasks, or when the stream
+// dropped messages or reconnected.
+var eventStream;
+$(function() {
+    var list = $('#task-list');
+    // events.js is included by the page and by the task list
+    if (eventStream !== undefined || list.length == 0 || !window.EventSource) {
+        return;
+    }
+    eventStream = new EventSource(list.data('stream-url'));
+    var opened = false;
+    eventStream.onopen = function() {
+        if (opened) {
+            refreshTaskList();
+        }
+        opened = true;
+    };
+    eventStream.addEventListener('task', function(message) {
+        var data = JSON.parse(message.data);
+        if (data.action == 'created') {
+            refreshTaskList();
+        } else if (data.action == 'deleted') {
+            $("#task-" + data.task.id).remove();
+        } else {
+            applyTaskChange(data.task);
+        }
+    });
+    eventStream.addEventListener('event', function(message) {
+        var data = JSON.parse(message.data);
+        if (data.action == 'deleted') {
+            $('#event-status').text('This event has been deleted.');
+            eventStream.close();
+        } else {
+            applyEventChange(data.event);
+        }
+    });
+    eventStream.addEventListener('reset', refreshTaskList);
+});
+
+var TASK_FIELDS = {title: '.taskTitle', description: '.taskDescription', deadline: '.taskDeadline', person: '.taskPerson'};
+
+function applyTaskChange(task) {
+    var row = $("#task-" + task.id);
+    if (row.length == 0) {
+        refreshTaskList();
+        return;
+    }
+    if (task.complete !== undefined) {
+        setTaskComplete(task.id, task.complete);
+    }
+    $.each(TASK_FIELDS, function(field, selector) {
+        if (task[field] !== undefined) {
+            row.find(selector).text(task[field]);
+        }
+    });
+}
+
+function applyEventChange(event) {
+    var details = $('#event-details');
+    if (event.title !== undefined) {
+        details.children('h2').text(event.title);
+    }
+    if (event.description !== undefined) {
+        details.children('p').eq(0).text(' ' + event.description);
+    }
+    if (event.date !== undefined) {
+        details.children('p').eq(1).text('Date: ' + event.date);
+    }
+    if (event.publish !== undefined) {
+        $('#event-status').text(event.publish ? 'Published' : 'Not published');
+    }
+}
+
+function refreshTaskList() {
+    var list = $('#task-list');
+    $.get(list.data('refresh-url'), function(html) {
+        // scripts are left out, this file is already loaded
+        var table = $('<div>').append($.parseHTML(html)).find('#taskTable');
+        if (table.length) {
+            list.find('#taskTable').replaceWith(table);
+        }
+    });
+}